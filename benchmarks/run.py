@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any
+
+import typer
+
+from benchmarks.corpus import CorpusSpec, generate_jsonl, rules_payload
+from rag_sanitizer.sanitizer import (
+    RulePack,
+    compile_rule_pack,
+    default_rule_pack,
+    parse_chunk,
+    rule_pack_from_dict,
+    sanitize_chunk,
+)
+
+SCENARIOS: dict[str, CorpusSpec] = {
+    "short": CorpusSpec(chunks=20_000, lines_per_chunk=(1, 3)),
+    "long": CorpusSpec(chunks=500, lines_per_chunk=(100, 300), injection_density=0.5),
+    "markdown": CorpusSpec(chunks=10_000, fenced_code_ratio=0.5, injection_density=0.3),
+    "large_rules": CorpusSpec(chunks=5_000, extra_rules=200),
+    # A small file under a large rule pack, as in per-document job runs: startup dominates.
+    "startup": CorpusSpec(chunks=10, extra_rules=200),
+}
+BENCHMARKS = (
+    "parse_chunk",
+    "sanitize_chunk",
+    "sanitize_chunk_markdown",
+    "to_json",
+    "cli",
+    "cli_help",
+    "cli_compiled",
+)
+# Run by default only in the startup scenario, which in turn only runs these and `cli`.
+STARTUP_BENCHMARKS = ("cli_help", "cli_compiled")
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+app = typer.Typer(add_completion=False)
+
+SCENARIO_OPT = typer.Option(None, "--scenario", help="Scenario to run (repeatable)")
+BENCHMARK_OPT = typer.Option(None, "--benchmark", help="Benchmark to run (repeatable)")
+SCALE_OPT = typer.Option(1.0, "--scale", min=0.0, help="Multiply every corpus size")
+REPEAT_OPT = typer.Option(3, "--repeat", min=1, help="Report the best of N timed runs")
+JSON_OPT = typer.Option(None, "--json", help="Write results as JSON")
+BASELINE_OPT = typer.Option(BASELINE_PATH, "--baseline", help="Baseline JSON file")
+UPDATE_BASELINE_OPT = typer.Option(
+    False, "--update-baseline", help="Store these results as the new baseline"
+)
+MAX_REGRESSION_OPT = typer.Option(
+    0.25, "--max-regression", help="Fail when chunks/s drops by more than this fraction"
+)
+CHILD_OPT = typer.Option(None, "--child", hidden=True)
+
+
+@dataclass(frozen=True)
+class BenchResult:
+    scenario: str
+    benchmark: str
+    chunks: int
+    input_bytes: int
+    seconds: float
+    peak_rss_mb: float | None
+
+    @property
+    def chunks_per_s(self) -> float:
+        return self.chunks / self.seconds
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.input_bytes / self.seconds / 1e6
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            **asdict(self),
+            "chunks_per_s": round(self.chunks_per_s, 1),
+            "mb_per_s": round(self.mb_per_s, 3),
+        }
+
+
+def scenario_spec(name: str, scale: float) -> CorpusSpec:
+    spec = SCENARIOS[name]
+    return replace(spec, chunks=max(1, round(spec.chunks * scale)))
+
+
+def scenario_rules(spec: CorpusSpec) -> RulePack:
+    if spec.extra_rules == 0:
+        return default_rule_pack()
+    return rule_pack_from_dict(rules_payload(spec.extra_rules, seed=spec.seed))
+
+
+def default_benchmarks(scenario: str) -> list[str]:
+    if scenario == "startup":
+        return ["cli", *STARTUP_BENCHMARKS]
+    return [bench for bench in BENCHMARKS if bench not in STARTUP_BENCHMARKS]
+
+
+def prepare(benchmark: str, corpus: bytes, rules: RulePack) -> Callable[[], object]:
+    """Build the timed callable for an in-process benchmark; setup is not timed."""
+    lines = corpus.splitlines()
+    if benchmark == "parse_chunk":
+        return lambda: [parse_chunk(line) for line in lines]
+    chunks = [parse_chunk(line) for line in lines]
+    if benchmark == "sanitize_chunk":
+        return lambda: [sanitize_chunk(chunk, rule_pack=rules) for chunk in chunks]
+    if benchmark == "sanitize_chunk_markdown":
+        return lambda: [
+            sanitize_chunk(chunk, rule_pack=rules, markdown_aware=True) for chunk in chunks
+        ]
+    if benchmark == "to_json":
+        results = [sanitize_chunk(chunk, rule_pack=rules) for chunk in chunks]
+        return lambda: [result.to_json() for result in results]
+    raise ValueError(f"Unknown in-process benchmark: {benchmark}")
+
+
+def best_time(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def measure(scenario: str, benchmark: str, *, scale: float, repeat: int) -> BenchResult:
+    """Run one benchmark in a fresh interpreter so its peak RSS is its own."""
+    spec = scenario_spec(scenario, scale)
+    corpus = generate_jsonl(spec)
+    chunks = spec.chunks
+    if benchmark in ("cli", *STARTUP_BENCHMARKS):
+        seconds, peak_rss_mb = _measure_cli(benchmark, spec, corpus, repeat)
+        if benchmark == "cli_help":
+            # One invocation that reads no chunks: chunks/s is invocations per second.
+            chunks = 1
+    else:
+        command = [
+            sys.executable,
+            "-m",
+            "benchmarks",
+            "--child",
+            f"{scenario}:{benchmark}",
+            "--scale",
+            str(scale),
+            "--repeat",
+            str(repeat),
+        ]
+        output, peak_rss_mb = _run_child(command)
+        seconds = float(output)
+    return BenchResult(scenario, benchmark, chunks, len(corpus), seconds, peak_rss_mb)
+
+
+def compare(
+    results: list[BenchResult], baseline: dict[str, Any], max_regression: float
+) -> list[str]:
+    """Return a message for every result whose chunks/s fell beyond ``max_regression``."""
+    previous = {(row["scenario"], row["benchmark"]): row for row in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        row = previous.get((result.scenario, result.benchmark))
+        if row is None:
+            continue
+        ratio = result.chunks_per_s / row["chunks_per_s"]
+        if ratio < 1 - max_regression:
+            regressions.append(
+                f"{result.scenario}/{result.benchmark}: {result.chunks_per_s:,.0f} chunks/s "
+                f"is {1 - ratio:.0%} below baseline {row['chunks_per_s']:,.0f}"
+            )
+    return regressions
+
+
+@app.command()
+def main(
+    scenario: list[str] | None = SCENARIO_OPT,
+    benchmark: list[str] | None = BENCHMARK_OPT,
+    scale: float = SCALE_OPT,
+    repeat: int = REPEAT_OPT,
+    json_out: Path | None = JSON_OPT,
+    baseline: Path = BASELINE_OPT,
+    update_baseline: bool = UPDATE_BASELINE_OPT,
+    max_regression: float = MAX_REGRESSION_OPT,
+    child: str | None = CHILD_OPT,
+) -> None:
+    if child is not None:
+        name, bench = child.split(":")
+        spec = scenario_spec(name, scale)
+        fn = prepare(bench, generate_jsonl(spec), scenario_rules(spec))
+        typer.echo(repr(best_time(fn, repeat)))
+        return
+
+    scenarios = scenario or list(SCENARIOS)
+    for name in scenarios:
+        if name not in SCENARIOS:
+            raise typer.BadParameter(f"Unknown scenario: {name}")
+    for bench in benchmark or []:
+        if bench not in BENCHMARKS:
+            raise typer.BadParameter(f"Unknown benchmark: {bench}")
+
+    results = []
+    typer.echo(f"{'scenario':<12} {'benchmark':<24} {'chunks/s':>12} {'MB/s':>8} {'RSS MB':>8}")
+    for name in scenarios:
+        for bench in benchmark or default_benchmarks(name):
+            result = measure(name, bench, scale=scale, repeat=repeat)
+            results.append(result)
+            rss = "-" if result.peak_rss_mb is None else f"{result.peak_rss_mb:.0f}"
+            typer.echo(
+                f"{name:<12} {bench:<24} {result.chunks_per_s:>12,.0f} "
+                f"{result.mb_per_s:>8.2f} {rss:>8}"
+            )
+
+    payload = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "scale": scale,
+            "repeat": repeat,
+        },
+        "results": [result.to_dict() for result in results],
+    }
+    if json_out is not None:
+        json_out.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+    if update_baseline:
+        baseline.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+        typer.echo(f"Wrote baseline to {baseline}")
+        return
+    if not baseline.exists():
+        return
+    stored = json.loads(baseline.read_text(encoding="utf-8"))
+    if stored.get("meta", {}).get("scale") != scale:
+        typer.echo("Baseline was recorded at a different --scale; not comparing.", err=True)
+        return
+    regressions = compare(results, stored, max_regression)
+    for message in regressions:
+        typer.echo(f"REGRESSION {message}", err=True)
+    if regressions:
+        raise typer.Exit(1)
+
+
+def _measure_cli(
+    benchmark: str, spec: CorpusSpec, corpus: bytes, repeat: int
+) -> tuple[float, float | None]:
+    """Time whole ``rag-sanitize`` runs: `cli` on a rules file, `cli_compiled` on a
+    precompiled artifact of the same rules, `cli_help` printing ``--help``."""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = Path(tmp) / "in.jsonl"
+        input_path.write_bytes(corpus)
+        command = [sys.executable, "-c", "from rag_sanitizer.cli import app; app()"]
+        if benchmark == "cli_help":
+            command.append("--help")
+        else:
+            command += ["--in", str(input_path), "--out", os.devnull, "--quiet"]
+        rules_path = Path(tmp) / "rules.json"
+        if benchmark == "cli_compiled":
+            artifact = compile_rule_pack(scenario_rules(spec))
+            rules_path.write_text(json.dumps(artifact))
+            command += ["--rules", str(rules_path)]
+        elif benchmark == "cli" and spec.extra_rules:
+            rules_path.write_text(json.dumps(rules_payload(spec.extra_rules, seed=spec.seed)))
+            command += ["--rules", str(rules_path)]
+        best = float("inf")
+        peak: float | None = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            _, rss = _run_child(command)
+            best = min(best, time.perf_counter() - started)
+            if rss is not None:
+                peak = rss if peak is None else max(peak, rss)
+        return best, peak
+
+
+def _run_child(command: list[str]) -> tuple[str, float | None]:
+    """Run ``command`` to completion; return its stdout and peak RSS in MB."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, env=env)
+    assert process.stdout is not None
+    output = process.stdout.read().decode()
+    process.stdout.close()
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+        scale = 1e6 if sys.platform == "darwin" else 1e3
+        peak_rss_mb: float | None = usage.ru_maxrss / scale
+    else:  # pragma: no cover - Windows
+        process.wait()
+        peak_rss_mb = None
+    if process.returncode != 0:
+        raise RuntimeError(f"Benchmark child failed ({process.returncode}): {command}")
+    return output, peak_rss_mb
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+
+from rag_sanitizer.parallel import LineOptions, init_worker, sanitize_chunks_in_worker
+from rag_sanitizer.sanitizer import Chunk, RulePack, SanitizedChunk, Sanitizer, load_rule_pack
+
+
+@dataclass
+class _Request:
+    chunk: Chunk
+    future: asyncio.Future[SanitizedChunk]
+
+
+class AsyncSanitizer:
+    """Sanitize chunks from asyncio code without blocking the event loop.
+
+    Concurrent `sanitize` calls are coalesced into micro-batches of up to
+    ``max_batch_size`` chunks (waiting at most ``max_batch_delay`` seconds for a batch to
+    fill) and run on a bounded pool of ``workers`` threads, or processes when
+    ``use_processes`` is set. At most ``queue_depth`` requests wait for a batch; further
+    callers are suspended until there is room. Requests whose deadline passes before
+    their batch starts are dropped.
+
+    Use as ``async with AsyncSanitizer(...) as sanitizer:`` or call `start`/`close`.
+    """
+
+    def __init__(
+        self,
+        *,
+        require_citations: bool = True,
+        rule_pack: RulePack | None = None,
+        rules_path: Path | None = None,
+        markdown_aware: bool = False,
+        mask_secrets: bool = False,
+        max_batch_size: int = 64,
+        max_batch_delay: float = 0.0,
+        queue_depth: int = 1024,
+        workers: int = 4,
+        use_processes: bool = False,
+        default_timeout: float | None = None,
+    ) -> None:
+        if max_batch_size < 1 or queue_depth < 1 or workers < 1:
+            raise ValueError("max_batch_size, queue_depth and workers must be >= 1")
+        if use_processes and rule_pack is not None:
+            raise ValueError("use rules_path (not rule_pack) with use_processes")
+        self.options = LineOptions(
+            require_citations=require_citations,
+            markdown_aware=markdown_aware,
+            mask_secrets=mask_secrets,
+        )
+        self.rules_path = rules_path
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.queue_depth = queue_depth
+        self.workers = workers
+        self.use_processes = use_processes
+        self.default_timeout = default_timeout
+        if rule_pack is None and rules_path is not None and not use_processes:
+            rule_pack = load_rule_pack(rules_path)
+        self._sanitizer = None if use_processes else self.options.sanitizer(rule_pack)
+
+        self._queue: asyncio.Queue[_Request] | None = None
+        self._executor: Executor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._batcher: asyncio.Task[None] | None = None
+        self._in_flight: set[asyncio.Task[None]] = set()
+        # Batches dispatched so far and the chunks they held.
+        self.batches = 0
+        self.batched_chunks = 0
+
+    async def __aenter__(self) -> AsyncSanitizer:
+        await self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        if self._batcher is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_depth)
+        self._slots = asyncio.Semaphore(self.workers)
+        if self.use_processes:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=init_worker,
+                initargs=(self.rules_path, self.options),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="rag-sanitizer"
+            )
+        self._batcher = asyncio.create_task(self._run_batches())
+
+    async def close(self) -> None:
+        """Finish queued requests, then stop the batcher and the pool."""
+        if self._batcher is None or self._queue is None:
+            return
+        await self._queue.join()
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        assert self._executor is not None
+        self._executor.shutdown(wait=True)
+        self._batcher = None
+        self._queue = None
+        self._executor = None
+
+    async def sanitize(self, chunk: Chunk, *, timeout: float | None = None) -> SanitizedChunk:
+        """Sanitize one chunk; raises `TimeoutError` when ``timeout`` seconds pass first.
+
+        The deadline covers waiting for queue space, for a batch and for the batch to
+        run. ``timeout`` defaults to ``default_timeout``.
+        """
+        if self._queue is None:
+            raise RuntimeError("AsyncSanitizer is not started")
+        queue = self._queue
+        future: asyncio.Future[SanitizedChunk] = asyncio.get_running_loop().create_future()
+        async with asyncio.timeout(timeout if timeout is not None else self.default_timeout):
+            await queue.put(_Request(chunk, future))
+            return await future
+
+    async def _run_batches(self) -> None:
+        assert self._queue is not None and self._slots is not None
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            self._drain(batch)
+            if len(batch) < self.max_batch_size and self.max_batch_delay > 0:
+                await asyncio.sleep(self.max_batch_delay)
+                self._drain(batch)
+            live = [request for request in batch if not request.future.done()]
+            if live:
+                self.batches += 1
+                self.batched_chunks += len(live)
+                await self._slots.acquire()
+                task = asyncio.create_task(self._run_batch(live))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+            # Mark requests done only once dispatched, so close() never strands a batch.
+            for _ in batch:
+                queue.task_done()
+
+    def _drain(self, batch: list[_Request]) -> None:
+        assert self._queue is not None
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _run_batch(self, batch: list[_Request]) -> None:
+        assert self._slots is not None
+        loop = asyncio.get_running_loop()
+        chunks = [request.chunk for request in batch]
+        try:
+            if self._sanitizer is not None:
+                results = await loop.run_in_executor(
+                    self._executor, _sanitize_chunks, self._sanitizer, chunks
+                )
+            else:
+                results = await loop.run_in_executor(
+                    self._executor, sanitize_chunks_in_worker, chunks
+                )
+        except Exception as exc:  # noqa: BLE001 - delivered to every waiting caller
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(exc)
+        else:
+            for request, result in zip(batch, results, strict=True):
+                if not request.future.done():
+                    request.future.set_result(result)
+        finally:
+            self._slots.release()
+
+
+def _sanitize_chunks(sanitizer: Sanitizer, chunks: list[Chunk]) -> list[SanitizedChunk]:
+    return [sanitizer.sanitize(chunk) for chunk in chunks]
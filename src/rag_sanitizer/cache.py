@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from rag_sanitizer.sanitizer import RulePack, TextScan, scan_text
+
+if TYPE_CHECKING:
+    from rag_sanitizer.profiling import Profiler
+
+
+def cache_key(text: str, rules: RulePack, *, markdown_aware: bool) -> str:
+    """Key a scan by text content, rule-pack fingerprint and text-affecting options.
+
+    Citation handling is applied to every result from the input chunk, so
+    ``require_citations`` does not need to be part of the key.
+    """
+    digest = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+    return f"{digest}:{rules.fingerprint}:{int(markdown_aware)}"
+
+
+class SqliteResultStore:
+    """Persistent second cache tier, so repeated runs can reuse earlier scans."""
+
+    def __init__(self, path: Path, *, commit_every: int = 1000) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.commit_every = commit_every
+        self._pending = 0
+        import sqlite3
+
+        self._connection = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS scans (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._connection.commit()
+
+    def get(self, key: str, rules: RulePack) -> TextScan | None:
+        """Load the scan stored under ``key``, which must have been made with ``rules``."""
+        row = self._connection.execute("SELECT value FROM scans WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        payload = json.loads(row[0])
+        if "secret_offsets" not in payload:
+            # Written by an older version; rescan and overwrite it.
+            return None
+        return TextScan(
+            sanitized_text=payload["sanitized_text"],
+            flag_bits=payload["flag_bits"],
+            redaction_lines=_compact(payload["redaction_lines"]),
+            redaction_patterns=_compact(payload["redaction_patterns"]),
+            secret_offsets=_compact(payload["secret_offsets"]),
+            pattern_names=rules.instruction_pattern_strings,
+            secret_pattern_names=rules.secret_pattern_strings,
+        )
+
+    def put(self, key: str, scan: TextScan) -> None:
+        value = json.dumps(
+            {
+                "sanitized_text": scan.sanitized_text,
+                "flag_bits": scan.flag_bits,
+                "redaction_lines": list(scan.redaction_lines),
+                "redaction_patterns": list(scan.redaction_patterns),
+                "secret_offsets": list(scan.secret_offsets),
+            }
+        )
+        self._connection.execute(
+            "INSERT OR REPLACE INTO scans (key, value) VALUES (?, ?)", (key, value)
+        )
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.flush()
+
+    def flush(self) -> None:
+        self._connection.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._connection.close()
+
+
+def _compact(values: list[int]) -> Sequence[int]:
+    return array("I", values) if values else ()
+
+
+class ResultCache:
+    """Content-addressed cache of text scans with an LRU memory tier.
+
+    Duplicate chunks (boilerplate, re-ingested documents) are scanned once per rule pack;
+    per-chunk fields such as ``id``, ``source`` and ``citations`` still come from each
+    input. ``max_entries`` bounds the in-memory tier; an optional `SqliteResultStore`
+    backs it on disk. Cached results are shared, so treat them as read-only.
+    """
+
+    def __init__(self, max_entries: int = 10_000, store: SqliteResultStore | None = None) -> None:
+        if max_entries < 0:
+            raise ValueError("max_entries must be >= 0")
+        self.max_entries = max_entries
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, TextScan] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def scan(
+        self,
+        text: str,
+        rules: RulePack,
+        *,
+        markdown_aware: bool = False,
+        profiler: Profiler | None = None,
+        scan_budget: float | None = None,
+    ) -> TextScan:
+        key = cache_key(text, rules, markdown_aware=markdown_aware)
+        with self._lock:
+            scan = self._entries.get(key)
+            if scan is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return scan
+            if self.store is not None:
+                scan = self.store.get(key, rules)
+                if scan is not None:
+                    self.hits += 1
+                    self._remember(key, scan)
+                    return scan
+            self.misses += 1
+
+        scan = scan_text(
+            text, rules, markdown_aware=markdown_aware, profiler=profiler, scan_budget=scan_budget
+        )
+        if "scan_timeout" in scan.flags:
+            # Partial result; a later scan with more time may complete.
+            return scan
+        with self._lock:
+            self._remember(key, scan)
+            if self.store is not None:
+                self.store.put(key, scan)
+        return scan
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def flush(self) -> None:
+        if self.store is not None:
+            with self._lock:
+                self.store.flush()
+
+    def close(self) -> None:
+        if self.store is not None:
+            with self._lock:
+                self.store.close()
+
+    def _remember(self, key: str, scan: TextScan) -> None:
+        if self.max_entries == 0:
+            return
+        self._entries[key] = scan
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
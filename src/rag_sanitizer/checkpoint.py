@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import json
+import os
+from collections import deque
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from time import monotonic
+from typing import IO, Any
+
+from rag_sanitizer.codec import iter_jsonl_lines
+from rag_sanitizer.profiling import Profiler
+from rag_sanitizer.summary import RunSummary
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    """Progress of a run: everything before these offsets is finished and on disk.
+
+    ``line_number`` is the number of input lines consumed up to ``input_offset``.
+    ``settings`` identifies the run (input, rules, options); resuming with different
+    settings is refused because the result would not match an uninterrupted run.
+    """
+
+    input_offset: int
+    output_offset: int
+    line_number: int
+    summary: dict[str, Any]
+    settings: dict[str, Any]
+    profile: dict[str, Any] | None = None
+
+    def restore(self, summary: RunSummary, profiler: Profiler | None) -> None:
+        """Add the checkpointed counters to a fresh ``summary`` (and ``profiler``)."""
+        summary.merge(RunSummary.from_dict(self.summary))
+        if profiler is not None and self.profile is not None:
+            profiler.merge(Profiler.from_dict(self.profile))
+
+
+def read_checkpoint(path: Path) -> Checkpoint | None:
+    """Load the checkpoint at ``path``, or None when there is none yet."""
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    return Checkpoint(**payload)
+
+
+def write_checkpoint(path: Path, checkpoint: Checkpoint) -> None:
+    """Replace ``path`` atomically, so a crash leaves the old or the new checkpoint."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + ".tmp")
+    with temporary.open("w", encoding="utf-8") as handle:
+        json.dump(asdict(checkpoint), handle, sort_keys=True)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+
+
+class LineTracker:
+    """Number the lines of a raw line stream like `iter_jsonl_lines`, tracking offsets.
+
+    Every raw line adds a resume point: the byte offset and line count at its end, and the
+    highest line number yielded up to it. Points are added before the raw line's own
+    lines are yielded, so once the last of them has been handled its point is available.
+    """
+
+    def __init__(
+        self,
+        raw_lines: Iterable[bytes],
+        *,
+        offset: int = 0,
+        line_number: int = 0,
+        universal_newlines: bool = True,
+    ) -> None:
+        self._raw_lines = raw_lines
+        self._offset = offset
+        self._line_number = line_number
+        self._universal_newlines = universal_newlines
+        self._last_yielded = line_number
+        self._points: deque[tuple[int, int, int]] = deque()
+
+    def __iter__(self) -> Iterator[tuple[int, bytes]]:
+        for raw in self._raw_lines:
+            base = self._line_number
+            lines = [
+                (base + number, line)
+                for number, line in iter_jsonl_lines(
+                    (raw,), universal_newlines=self._universal_newlines
+                )
+            ]
+            self._offset += len(raw)
+            self._line_number += (
+                len(raw.splitlines()) if self._universal_newlines and b"\r" in raw else 1
+            )
+            if lines:
+                self._last_yielded = lines[-1][0]
+            self._points.append((self._last_yielded, self._offset, self._line_number))
+            yield from lines
+
+    @property
+    def last_yielded(self) -> int:
+        return self._last_yielded
+
+    def pop_point(self, done_through: int) -> tuple[int, int, int] | None:
+        """Drop and return the latest point with no line after ``done_through`` before it.
+
+        Returns ``(last_yielded, input_offset, line_number)``, or None if none is new.
+        """
+        point = None
+        while self._points and self._points[0][0] <= done_through:
+            point = self._points.popleft()
+        return point
+
+
+class Checkpointer:
+    """Write a checkpoint at most every ``interval`` seconds as results are written.
+
+    Call `advance` after handling each result and `finish` after the last one. A
+    checkpoint is only taken right after the last line of a raw input line, when the
+    output and summary hold exactly the lines before the input resume point.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        tracker: LineTracker,
+        outfile: IO[bytes],
+        summary: RunSummary,
+        profiler: Profiler | None,
+        settings: dict[str, Any],
+        *,
+        interval: float,
+    ) -> None:
+        self.path = path
+        self.tracker = tracker
+        self.outfile = outfile
+        self.summary = summary
+        self.profiler = profiler
+        self.settings = settings
+        self.interval = interval
+        self._latest: tuple[int, int, int] | None = None
+        self._written_at = monotonic()
+
+    def advance(self, line_number: int) -> None:
+        """Note that every line through ``line_number`` has been handled."""
+        point = self.tracker.pop_point(line_number)
+        if point is None or point[0] != line_number:
+            return
+        self._latest = point
+        if monotonic() - self._written_at >= self.interval:
+            self.write(point[1], point[2])
+
+    def finish(self) -> None:
+        """Checkpoint the end of the input."""
+        point = self.tracker.pop_point(self.tracker.last_yielded) or self._latest
+        if point is not None:
+            self.write(point[1], point[2])
+
+    def write(self, input_offset: int, line_number: int) -> None:
+        self.outfile.flush()
+        os.fsync(self.outfile.fileno())
+        checkpoint = Checkpoint(
+            input_offset=input_offset,
+            output_offset=self.outfile.tell(),
+            line_number=line_number,
+            summary=self.summary.to_dict(),
+            settings=self.settings,
+            profile=None if self.profiler is None else self.profiler.to_dict(),
+        )
+        write_checkpoint(self.path, checkpoint)
+        self._written_at = monotonic()
@@ -2,23 +2,48 @@ from __future__ import annotations
 
 import json
 import sys
-from contextlib import nullcontext
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
 
 import typer
 
-from rag_sanitizer.sanitizer import (
-    dump_default_rules_json,
-    load_rule_pack,
-    parse_chunk,
-    sanitize_chunk,
-)
+if TYPE_CHECKING:
+    from rag_sanitizer.checkpoint import Checkpoint, Checkpointer
+    from rag_sanitizer.columnar import ColumnMapping
+    from rag_sanitizer.inputs import InputSet
+    from rag_sanitizer.parallel import LineOptions
+    from rag_sanitizer.profiling import Profiler
+    from rag_sanitizer.sanitizer import Chunk, RulePack, SanitizedChunk
+    from rag_sanitizer.shards import ShardSpec
+    from rag_sanitizer.summary import RunSummary
 
-app = typer.Typer(no_args_is_help=True)
+# rag_sanitizer modules are imported where they are used, so `--help` and the mode
+# flags only pay for what they run. Help is rendered without rich for the same reason.
+app = typer.Typer(no_args_is_help=True, rich_markup_mode=None)
 
-IN_OPT = typer.Option("-", "--in", "-i", help="Input JSONL file path, or '-' for stdin")
-OUT_OPT = typer.Option("-", "--out", "-o", help="Output JSONL file path, or '-' for stdout")
+IN_OPT = typer.Option(
+    "-",
+    "--in",
+    "-i",
+    help="Input JSONL file, directory of JSONL files or glob, Parquet/Arrow file "
+    "(.parquet, .arrow, .feather), or '-' for stdin",
+)
+OUT_OPT = typer.Option(
+    "-",
+    "--out",
+    "-o",
+    help="Output JSONL or Parquet/Arrow (.parquet, .arrow, .feather) file path, or '-' for stdout",
+)
+OUT_DIR_OPT = typer.Option(
+    None,
+    "--out-dir",
+    help="With a directory or glob --in, write each file's output to the same relative "
+    "path under this directory instead of concatenating into --out",
+)
 ALLOW_MISSING_OPT = typer.Option(
     False,
     "--allow-missing-citations",
@@ -26,11 +51,21 @@ ALLOW_MISSING_OPT = typer.Option(
 )
 
 RULES_OPT = typer.Option(None, "--rules", help="JSON rules file (regex lists + weights)")
+STRICT_RULES_OPT = typer.Option(
+    False,
+    "--strict-rules",
+    help="Reject rule patterns that can backtrack exponentially instead of warning",
+)
 DUMP_DEFAULT_RULES_OPT = typer.Option(
     None,
     "--dump-default-rules",
     help="Write default rules JSON to a file (or '-' for stdout) and exit",
 )
+COMPILE_RULES_OPT = typer.Option(
+    None,
+    "--compile-rules",
+    help="Write --rules (or the defaults) as a precompiled artifact for --rules and exit",
+)
 MAX_RISK_OPT = typer.Option(
     None,
     "--max-risk",
@@ -41,7 +76,12 @@ MAX_RISK_OPT = typer.Option(
 MARKDOWN_OPT = typer.Option(
     False,
     "--markdown",
-    help="Enable Markdown-aware sanitization (e.g., ignore matches inside fenced code blocks)",
+    help="Enable Markdown-aware sanitization (skip the rules' markdown_skip regions)",
+)
+MASK_SECRETS_OPT = typer.Option(
+    False,
+    "--mask-secrets",
+    help="Replace matched secrets in sanitized_text (with the rules' secret_mask, or [REDACTED])",
 )
 FAIL_ON_FLAG_OPT = typer.Option(
     None,
@@ -54,6 +94,125 @@ SUMMARY_JSON_OPT = typer.Option(
     help="Write JSON summary to a file (or '-' for stdout)",
 )
 QUIET_OPT = typer.Option(False, "--quiet", help="Suppress summary output")
+WORKERS_OPT = typer.Option(
+    1,
+    "--workers",
+    min=1,
+    help="Sanitize in N worker processes (output order and summary match a serial run)",
+)
+CACHE_SIZE_OPT = typer.Option(
+    0,
+    "--cache-size",
+    min=0,
+    help="Reuse results for duplicate chunk texts, keeping up to N in memory (0 = off)",
+)
+CACHE_DB_OPT = typer.Option(
+    None,
+    "--cache-db",
+    help="SQLite file persisting cached results across runs (enables the cache)",
+)
+PROFILE_OPT = typer.Option(
+    False,
+    "--profile",
+    help="Record per-stage and per-pattern timings in --summary-json (slower)",
+)
+PROFILE_PROMETHEUS_OPT = typer.Option(
+    None,
+    "--profile-prometheus",
+    help="Write the profile in Prometheus text format to a file (or '-' for stdout)",
+)
+LINT_RULES_OPT = typer.Option(
+    False,
+    "--lint-rules",
+    help="Check --rules (or the defaults) for patterns prone to slow backtracking and exit",
+)
+SCAN_BUDGET_MS_OPT = typer.Option(
+    None,
+    "--scan-budget-ms",
+    min=0.0,
+    help="Stop matching a chunk after this many ms and flag it scan_timeout",
+)
+SHARD_OPT = typer.Option(
+    None,
+    "--shard",
+    help="Process only byte-range shard i of N of a memory-mapped --in file ('i/N'); "
+    "--summary-json then writes a fragment for --merge-summary",
+)
+MERGE_SUMMARY_OPT = typer.Option(
+    None,
+    "--merge-summary",
+    help="Merge shard summary fragments (repeatable) into --summary-json and exit",
+)
+CHECKPOINT_OPT = typer.Option(
+    None,
+    "--checkpoint",
+    help="Periodically record progress in this file so the run can be resumed",
+)
+RESUME_OPT = typer.Option(
+    False,
+    "--resume",
+    help="Continue from --checkpoint, truncating --out to the checkpointed offset",
+)
+CHECKPOINT_INTERVAL_OPT = typer.Option(
+    60.0,
+    "--checkpoint-interval",
+    min=0.0,
+    help="Seconds between checkpoints (with --checkpoint)",
+)
+BATCH_SIZE_OPT = typer.Option(
+    256,
+    "--batch-size",
+    min=1,
+    help="JSONL lines handed to a worker at a time (with --workers, or per batch with --serve)",
+)
+COLUMN_OPT = typer.Option(
+    None,
+    "--column",
+    help="Read a chunk field from another column of a Parquet/Arrow --in, as FIELD=COLUMN "
+    "(repeatable; fields: id, text, source, citations)",
+)
+RECORD_BATCH_ROWS_OPT = typer.Option(
+    16384,
+    "--record-batch-rows",
+    min=1,
+    help="Rows read, sanitized and written at a time with Parquet/Arrow --in or --out",
+)
+INDEX_OPT = typer.Option(
+    None,
+    "--index",
+    help="Write a sidecar index of every chunk's text hash and per-pattern hits, for --rescan",
+)
+RESCAN_OPT = typer.Option(
+    None,
+    "--rescan",
+    help="Re-sanitize the --in that this --index file was written for: stored hits are "
+    "reused and only patterns added to --rules since are matched",
+)
+STREAM_WINDOW_OPT = typer.Option(
+    None,
+    "--stream-window",
+    min=64,
+    help="Stream lines longer than this many bytes instead of reading them whole: their "
+    "text is scanned and written holding only a few windows of it in memory",
+)
+SERVE_OPT = typer.Option(
+    False,
+    "--serve",
+    help="Serve sanitization over HTTP on localhost and/or --socket until interrupted",
+)
+PORT_OPT = typer.Option(
+    None,
+    "--port",
+    min=0,
+    help="HTTP port on 127.0.0.1 for --serve (default 8765 unless only --socket is given)",
+)
+SOCKET_OPT = typer.Option(None, "--socket", help="Unix domain socket path for --serve")
+RELOAD_INTERVAL_OPT = typer.Option(
+    2.0,
+    "--reload-interval",
+    min=0.0,
+    help="Seconds between checks of --rules for changes with --serve (0 = only on SIGHUP)",
+)
 
 
 class OnError(str, Enum):
@@ -69,125 +228,1045 @@ ON_ERROR_OPT = typer.Option(
 )
 
 
+# For each special mode of `run`, in the order it picks them: how a conflicting option is
+# reported, and the options (keys of the ``used`` table built in `run`) it cannot be
+# combined with.
+_MODE_CONFLICTS: dict[str, tuple[str, tuple[str, ...]]] = {
+    "streamed": (
+        "--stream-window cannot be used with {option}",
+        (
+            "--shard",
+            "--checkpoint",
+            "--workers",
+            "--scan-budget-ms",
+            "--cache-size or --cache-db",
+            "--profile",
+            "--index or --rescan",
+            "Parquet or Arrow files",
+            "a directory or glob --in",
+        ),
+    ),
+    "indexed": (
+        "--index and --rescan cannot be used with {option}",
+        (
+            "--shard",
+            "--checkpoint",
+            "--workers",
+            "--scan-budget-ms",
+            "--cache-size or --cache-db",
+            "--profile",
+            "Parquet or Arrow files",
+            "a directory or glob --in",
+        ),
+    ),
+    "columnar": (
+        "{option} cannot be used with Parquet or Arrow files",
+        ("--shard", "--checkpoint", "--out-dir", "--workers", "a directory or glob --in"),
+    ),
+    "files": ("{option} needs a single --in file", ("--shard", "--checkpoint")),
+}
+
+
+@dataclass(frozen=True)
+class _RunContext:
+    """What every sanitize mode of `run` shares: its paths, rules, counters and reporting."""
+
+    input_path: str
+    output_path: str
+    rules: Path | None
+    rule_pack: RulePack | None
+    options: LineOptions
+    summary: RunSummary
+    profiler: Profiler | None
+    skip_invalid: bool
+    quiet: bool
+    summary_json: str | None
+    profile_prometheus: str | None
+
+    def finish(
+        self,
+        summary_dict: dict[str, Any] | None,
+        *,
+        processed: str | None = None,
+        destination: str | None = None,
+    ) -> None:
+        destination = self.output_path if destination is None else destination
+        _finish(
+            self.summary,
+            summary_dict,
+            self.profiler,
+            processed=processed or f"{self.summary.processed} chunks",
+            destination="stdout" if destination == "-" else destination,
+            quiet=self.quiet,
+            summary_json=self.summary_json,
+            profile_prometheus=self.profile_prometheus,
+        )
+
+    def profiled(self, summary_dict: dict[str, Any]) -> dict[str, Any]:
+        """``summary_dict`` with the profile added, when profiling."""
+        if self.profiler is not None:
+            summary_dict["profile"] = self.profiler.to_dict()
+        return summary_dict
+
+
 @app.command()
 def run(
     input_path: str = IN_OPT,
     output_path: str = OUT_OPT,
+    out_dir: Path | None = OUT_DIR_OPT,
     allow_missing_citations: bool = ALLOW_MISSING_OPT,
     rules: Path | None = RULES_OPT,
+    strict_rules: bool = STRICT_RULES_OPT,
     dump_default_rules: str | None = DUMP_DEFAULT_RULES_OPT,
+    compile_rules: Path | None = COMPILE_RULES_OPT,
     max_risk: float | None = MAX_RISK_OPT,
     markdown: bool = MARKDOWN_OPT,
+    mask_secrets: bool = MASK_SECRETS_OPT,
     fail_on_flag: list[str] | None = FAIL_ON_FLAG_OPT,
     summary_json: str | None = SUMMARY_JSON_OPT,
     on_error: OnError = ON_ERROR_OPT,
     quiet: bool = QUIET_OPT,
+    workers: int = WORKERS_OPT,
+    batch_size: int = BATCH_SIZE_OPT,
+    column: list[str] | None = COLUMN_OPT,
+    record_batch_rows: int = RECORD_BATCH_ROWS_OPT,
+    index: Path | None = INDEX_OPT,
+    rescan: Path | None = RESCAN_OPT,
+    stream_window: int | None = STREAM_WINDOW_OPT,
+    cache_size: int = CACHE_SIZE_OPT,
+    cache_db: Path | None = CACHE_DB_OPT,
+    profile: bool = PROFILE_OPT,
+    profile_prometheus: str | None = PROFILE_PROMETHEUS_OPT,
+    lint_rules: bool = LINT_RULES_OPT,
+    scan_budget_ms: float | None = SCAN_BUDGET_MS_OPT,
+    shard: str | None = SHARD_OPT,
+    merge_summary: list[Path] | None = MERGE_SUMMARY_OPT,
+    checkpoint: Path | None = CHECKPOINT_OPT,
+    resume: bool = RESUME_OPT,
+    checkpoint_interval: float = CHECKPOINT_INTERVAL_OPT,
+    serve: bool = SERVE_OPT,
+    port: int | None = PORT_OPT,
+    socket: Path | None = SOCKET_OPT,
+    reload_interval: float = RELOAD_INTERVAL_OPT,
 ) -> None:
+    from rag_sanitizer.compression import compression_for_path, detect_compression
+    from rag_sanitizer.inputs import columnar_format, is_multi_input
+    from rag_sanitizer.parallel import LineOptions
+    from rag_sanitizer.profiling import Profiler
+    from rag_sanitizer.sanitizer import default_rule_pack, with_secret_mask
+    from rag_sanitizer.summary import RunSummary
+
+    # Modes that do not sanitize a file exit once done.
     if dump_default_rules is not None:
-        rules_json = dump_default_rules_json() + "\n"
-        if dump_default_rules == "-":
-            typer.echo(rules_json.rstrip("\n"))
-            raise typer.Exit(0)
-        dump_path = Path(dump_default_rules)
-        dump_path.parent.mkdir(parents=True, exist_ok=True)
-        dump_path.write_text(rules_json, encoding="utf-8")
-        typer.echo(f"Wrote default rules to {dump_path}")
-        raise typer.Exit(0)
+        _dump_default_rules(dump_default_rules)
+    if compile_rules is not None:
+        _compile_rules(rules, compile_rules, strict=strict_rules)
+    if lint_rules:
+        _lint_rules(rules)
+    if merge_summary:
+        _merge_summaries(merge_summary, summary_json, quiet)
+    if serve:
+        _serve(
+            rules,
+            require_citations=not allow_missing_citations,
+            markdown_aware=markdown,
+            mask_secrets=mask_secrets,
+            workers=workers,
+            batch_size=batch_size,
+            port=port,
+            socket_path=socket,
+            reload_interval=reload_interval,
+            strict_rules=strict_rules,
+        )
 
     if not input_path:
         input_path = "-"
     if not output_path:
         output_path = "-"
-    if summary_json == "-" and output_path == "-":
+    if out_dir is not None and output_path != "-":
+        raise typer.BadParameter("--out-dir cannot be combined with --out")
+    writes_stdout = output_path == "-" and out_dir is None
+    if summary_json == "-" and writes_stdout:
         raise typer.BadParameter("--summary-json '-' cannot be used with --out '-'")
+    if profile_prometheus == "-" and (writes_stdout or summary_json == "-"):
+        raise typer.BadParameter("--profile-prometheus '-' needs stdout to itself")
+    if profile and summary_json is None and profile_prometheus is None:
+        raise typer.BadParameter("--profile needs --summary-json or --profile-prometheus")
+    shard_spec: ShardSpec | None = None
+    if shard is not None:
+        from rag_sanitizer.shards import parse_shard_spec
 
-    rule_pack = load_rule_pack(rules) if rules is not None else None
+        try:
+            shard_spec = parse_shard_spec(shard)
+        except ValueError as exc:
+            raise typer.BadParameter(str(exc)) from None
+        if input_path == "-":
+            raise typer.BadParameter("--shard needs an --in file (stdin cannot be mapped)")
+    if resume and checkpoint is None:
+        raise typer.BadParameter("--resume needs --checkpoint")
+    if checkpoint is not None and "-" in (input_path, output_path):
+        raise typer.BadParameter("--checkpoint needs --in and --out files")
+    if checkpoint is not None and compression_for_path(Path(output_path)) is not None:
+        raise typer.BadParameter("--checkpoint needs uncompressed output")
+    columnar_in = input_path != "-" and columnar_format(Path(input_path)) is not None
+    columnar_out = output_path != "-" and columnar_format(Path(output_path)) is not None
+    if column and not columnar_in:
+        raise typer.BadParameter("--column needs a Parquet or Arrow --in file")
+    multi_input = input_path != "-" and is_multi_input(input_path)
 
-    if input_path != "-":
+    # Each mode's conflicts include the modes below it, so none is silently ignored.
+    if stream_window is not None:
+        mode = "streamed"
+    elif index is not None or rescan is not None:
+        mode = "indexed"
+    elif columnar_in or columnar_out:
+        mode = "columnar"
+    elif multi_input:
+        mode = "files"
+    else:
+        mode = "lines"
+    used = {
+        "--shard": shard_spec is not None,
+        "--checkpoint": checkpoint is not None,
+        "--out-dir": out_dir is not None,
+        "--workers": workers > 1,
+        "--scan-budget-ms": scan_budget_ms is not None,
+        "--cache-size or --cache-db": cache_size > 0 or cache_db is not None,
+        "--profile": profile or profile_prometheus is not None,
+        "--index or --rescan": index is not None or rescan is not None,
+        "Parquet or Arrow files": columnar_in or columnar_out,
+        "a directory or glob --in": multi_input,
+    }
+    message, conflicts = _MODE_CONFLICTS.get(mode, ("", ()))
+    for option in conflicts:
+        if used[option]:
+            raise typer.BadParameter(message.format(option=option))
+    if out_dir is not None and mode != "files":
+        raise typer.BadParameter("--out-dir needs a directory or glob --in")
+
+    rule_pack = _load_rules(rules, strict=strict_rules) if rules is not None else None
+    if mask_secrets:
+        rule_pack = with_secret_mask(rule_pack or default_rule_pack())
+
+    if input_path != "-" and not multi_input:
         input_file = Path(input_path)
         if not input_file.exists():
             raise typer.BadParameter(f"Input not found: {input_file}")
+        if shard_spec is not None or checkpoint is not None:
+            with input_file.open("rb") as handle:
+                if detect_compression(handle.read(4)) is not None:
+                    option = "--shard" if shard_spec is not None else "--checkpoint"
+                    raise typer.BadParameter(f"{option} needs uncompressed input")
 
     if output_path != "-":
         output_file = Path(output_path)
         output_file.parent.mkdir(parents=True, exist_ok=True)
 
-    processed = 0
-    flagged = 0
-    max_seen_risk = 0.0
-    should_fail = False
-    fail_on_flag_set = {flag.strip() for flag in (fail_on_flag or []) if flag.strip()}
-    flags_count: dict[str, int] = {}
-
-    infile_cm = (
-        nullcontext(sys.stdin)
-        if input_path == "-"
-        else Path(input_path).open("r", encoding="utf-8")
+    context = _RunContext(
+        input_path=input_path,
+        output_path=output_path,
+        rules=rules,
+        rule_pack=rule_pack,
+        options=LineOptions(
+            require_citations=not allow_missing_citations,
+            markdown_aware=markdown,
+            mask_secrets=mask_secrets,
+            cache_size=cache_size,
+            cache_db=cache_db,
+            scan_budget=None if scan_budget_ms is None else scan_budget_ms / 1000,
+        ),
+        summary=RunSummary(
+            max_risk=max_risk,
+            fail_on_flags=frozenset(flag.strip() for flag in (fail_on_flag or []) if flag.strip()),
+            track_cache=cache_size > 0 or cache_db is not None,
+            track_distributions=True,
+        ),
+        profiler=Profiler() if used["--profile"] else None,
+        skip_invalid=on_error == OnError.skip,
+        quiet=quiet,
+        summary_json=summary_json,
+        profile_prometheus=profile_prometheus,
+    )
+    if mode == "streamed":
+        assert stream_window is not None
+        _run_streamed(context, window=stream_window)
+    elif mode == "indexed":
+        _run_indexed(context, index_path=index, previous_path=rescan)
+    elif mode == "columnar":
+        _run_columnar(context, column=column or [], batch_rows=record_batch_rows)
+    elif mode == "files":
+        _run_files(context, out_dir=out_dir, workers=workers)
+    else:
+        _run_lines(
+            context,
+            shard_spec=shard_spec,
+            checkpoint=checkpoint,
+            resume=resume,
+            checkpoint_interval=checkpoint_interval,
+            workers=workers,
+            batch_size=batch_size,
+            on_error=on_error,
+        )
+
+
+def _dump_default_rules(destination: str) -> None:
+    from rag_sanitizer.sanitizer import dump_default_rules_json
+
+    rules_json = dump_default_rules_json() + "\n"
+    if destination == "-":
+        typer.echo(rules_json.rstrip("\n"))
+        raise typer.Exit(0)
+    dump_path = Path(destination)
+    dump_path.parent.mkdir(parents=True, exist_ok=True)
+    dump_path.write_text(rules_json, encoding="utf-8")
+    typer.echo(f"Wrote default rules to {dump_path}")
+    raise typer.Exit(0)
+
+
+def _serve(
+    rules: Path | None,
+    *,
+    require_citations: bool,
+    markdown_aware: bool,
+    mask_secrets: bool,
+    workers: int,
+    batch_size: int,
+    port: int | None,
+    socket_path: Path | None,
+    reload_interval: float,
+    strict_rules: bool,
+) -> None:
+    from rag_sanitizer.server import DEFAULT_PORT, SanitizerServer, serve_until_stopped
+
+    server = SanitizerServer(
+        rules_path=rules,
+        require_citations=require_citations,
+        markdown_aware=markdown_aware,
+        mask_secrets=mask_secrets,
+        workers=workers,
+        max_batch_size=batch_size,
+        reload_interval=reload_interval,
+        strict_patterns=strict_rules,
+    )
+    try:
+        serve_until_stopped(
+            server,
+            port=DEFAULT_PORT if port is None and socket_path is None else port,
+            socket_path=socket_path,
+        )
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from None
+    except OSError as exc:
+        raise typer.BadParameter(f"Cannot listen: {exc}") from None
+    raise typer.Exit(0)
+
+
+def _run_indexed(
+    context: _RunContext, *, index_path: Path | None, previous_path: Path | None
+) -> None:
+    from rag_sanitizer.sanitizer import default_rule_pack
+
+    stats = _sanitize_indexed(
+        context.input_path,
+        context.output_path,
+        rule_pack=context.rule_pack or default_rule_pack(),
+        index_path=index_path,
+        previous_path=previous_path,
+        markdown_aware=context.options.markdown_aware,
+        require_citations=context.options.require_citations,
+        summary=context.summary,
+        skip_invalid=context.skip_invalid,
     )
-    outfile_cm = (
-        nullcontext(sys.stdout)
-        if output_path == "-"
-        else Path(output_path).open("w", encoding="utf-8")
+    payload = context.summary.to_dict()
+    if previous_path is not None:
+        payload["rescan"] = stats
+    context.finish(
+        payload,
+        processed=f"{context.summary.processed} chunks"
+        + ("" if previous_path is None else f" ({stats['reused']} from the index)"),
     )
 
-    with infile_cm as infile, outfile_cm as outfile:
-        for line_number, raw_line in enumerate(infile, start=1):
-            line = raw_line.strip()
-            if not line:
-                continue
+
+def _run_streamed(context: _RunContext, *, window: int) -> None:
+    from rag_sanitizer.sanitizer import default_rule_pack
+
+    _sanitize_streamed(
+        context.input_path,
+        context.output_path,
+        window=window,
+        rule_pack=context.rule_pack or default_rule_pack(),
+        options=context.options,
+        summary=context.summary,
+        skip_invalid=context.skip_invalid,
+    )
+    context.finish(context.summary.to_dict())
+
+
+def _run_columnar(context: _RunContext, *, column: list[str], batch_rows: int) -> None:
+    from rag_sanitizer.columnar import ColumnMapping
+
+    try:
+        columns = ColumnMapping.parse(column)
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from None
+    _sanitize_columnar(
+        context.input_path,
+        context.output_path,
+        columns=columns,
+        batch_rows=batch_rows,
+        rule_pack=context.rule_pack,
+        options=context.options,
+        summary=context.summary,
+        profiler=context.profiler,
+        skip_invalid=context.skip_invalid,
+    )
+    context.finish(context.profiled(context.summary.to_dict()))
+
+
+def _run_files(context: _RunContext, *, out_dir: Path | None, workers: int) -> None:
+    from rag_sanitizer.inputs import expand_inputs
+
+    # Never read the run's own output back as input.
+    exclude = [Path(context.output_path)] if context.output_path != "-" else []
+    if out_dir is not None:
+        exclude.append(out_dir)
+    try:
+        inputs = expand_inputs(context.input_path, tuple(exclude))
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from None
+    files = _sanitize_files(
+        inputs,
+        output_path=context.output_path,
+        out_dir=out_dir,
+        rule_pack=context.rule_pack,
+        rules=context.rules,
+        options=context.options,
+        summary=context.summary,
+        profiler=context.profiler,
+        skip_invalid=context.skip_invalid,
+        workers=workers,
+    )
+    merged = context.summary.to_dict()
+    merged["files"] = files
+    context.finish(
+        context.profiled(merged),
+        processed=f"{context.summary.processed} chunks from {len(files)} files",
+        destination=str(out_dir) if out_dir is not None else None,
+    )
+
+
+def _run_lines(
+    context: _RunContext,
+    *,
+    shard_spec: ShardSpec | None,
+    checkpoint: Path | None,
+    resume: bool,
+    checkpoint_interval: float,
+    workers: int,
+    batch_size: int,
+    on_error: OnError,
+) -> None:
+    """Sanitize one JSONL file or stdin line by line, optionally sharded or checkpointed."""
+    from rag_sanitizer.codec import iter_jsonl_lines
+    from rag_sanitizer.compression import compression_for_path, open_input, open_output
+    from rag_sanitizer.parallel import iter_line_results
+    from rag_sanitizer.sanitizer import default_rule_pack
+
+    input_path, output_path = context.input_path, context.output_path
+    summary, profiler = context.summary, context.profiler
+    resumed: Checkpoint | None = None
+    settings: dict[str, Any] = {}
+    if checkpoint is not None:
+        from rag_sanitizer.checkpoint import read_checkpoint
+
+        settings = {
+            "input": str(Path(input_path).resolve()),
+            "input_bytes": Path(input_path).stat().st_size,
+            "output": str(Path(output_path).resolve()),
+            "shard": None if shard_spec is None else str(shard_spec),
+            "rules": (context.rule_pack or default_rule_pack()).fingerprint,
+            "markdown": context.options.markdown_aware,
+            "require_citations": context.options.require_citations,
+            "scan_budget": context.options.scan_budget,
+            "max_risk": summary.max_risk,
+            "fail_on_flags": sorted(summary.fail_on_flags),
+            "on_error": on_error.value,
+        }
+        if resume:
             try:
-                chunk = parse_chunk(line)
-            except Exception as exc:  # noqa: BLE001 - CLI boundary
-                if on_error == OnError.skip:
-                    typer.echo(f"Skipping invalid JSONL line {line_number}: {exc}", err=True)
+                resumed = read_checkpoint(checkpoint)
+            except (OSError, TypeError, ValueError) as exc:
+                raise typer.BadParameter(f"Cannot read checkpoint {checkpoint}: {exc}") from None
+        if resumed is not None:
+            if resumed.settings != settings:
+                raise typer.BadParameter(
+                    f"Checkpoint {checkpoint} was written by a run with different input, "
+                    "output, rules or options"
+                )
+            output_size = Path(output_path).stat().st_size if Path(output_path).exists() else 0
+            if output_size < resumed.output_offset:
+                raise typer.BadParameter(f"Output {output_path} is shorter than the checkpoint")
+            resumed.restore(summary, profiler)
+
+    # Line numbers in messages are relative to the shard when sharding.
+    where = "" if shard_spec is None else f" of shard {shard_spec}"
+    shard_start = shard_end = 0
+
+    # Lines stay bytes end to end: they are parsed without decoding and the (ASCII-only)
+    # output is written without re-encoding.
+    infile: Iterable[bytes]
+    outfile: IO[bytes]
+    with ExitStack() as stack:
+        stack.enter_context(_reported_input_errors())
+        try:
+            if shard_spec is not None:
+                from rag_sanitizer.shards import open_shard
+
+                infile, shard_start, shard_end = stack.enter_context(
+                    open_shard(
+                        Path(input_path),
+                        shard_spec,
+                        offset=None if resumed is None else resumed.input_offset,
+                    )
+                )
+            elif input_path == "-":
+                infile = stack.enter_context(open_input(sys.stdin.buffer))
+            elif resumed is not None:
+                source = stack.enter_context(Path(input_path).open("rb"))
+                source.seek(resumed.input_offset)
+                infile = source
+            else:
+                source = stack.enter_context(Path(input_path).open("rb"))
+                infile = stack.enter_context(open_input(source, Path(input_path)))
+            if output_path == "-":
+                outfile = sys.stdout.buffer
+            elif resumed is not None:
+                outfile = stack.enter_context(Path(output_path).open("r+b"))
+                outfile.truncate(resumed.output_offset)
+                outfile.seek(resumed.output_offset)
+            else:
+                target = stack.enter_context(Path(output_path).open("wb"))
+                outfile = stack.enter_context(
+                    open_output(target, compression_for_path(Path(output_path)))
+                )
+        except ValueError as exc:
+            raise typer.BadParameter(str(exc)) from None
+        checkpointer: Checkpointer | None = None
+        numbered_lines: Iterable[tuple[int, bytes]]
+        if checkpoint is None:
+            numbered_lines = iter_jsonl_lines(infile, universal_newlines=input_path != "-")
+        else:
+            from rag_sanitizer.checkpoint import Checkpointer, LineTracker
+
+            tracker = LineTracker(
+                infile,
+                offset=shard_start if resumed is None else resumed.input_offset,
+                line_number=0 if resumed is None else resumed.line_number,
+            )
+            numbered_lines = tracker
+            checkpointer = Checkpointer(
+                checkpoint,
+                tracker,
+                outfile,
+                summary,
+                profiler,
+                settings,
+                interval=checkpoint_interval,
+            )
+        results = iter_line_results(
+            numbered_lines,
+            rule_pack=context.rule_pack,
+            rules_path=context.rules,
+            options=context.options,
+            workers=workers,
+            batch_size=batch_size,
+            profiler=profiler,
+        )
+        for result in results:
+            if result.output is None:
+                if context.skip_invalid:
+                    typer.echo(
+                        f"Skipping invalid JSONL line {result.line_number}{where}: {result.error}",
+                        err=True,
+                    )
+                    if checkpointer is not None:
+                        checkpointer.advance(result.line_number)
                     continue
-                typer.echo(f"Invalid JSONL line {line_number}: {exc}", err=True)
-                raise typer.Exit(2) from exc
+                typer.echo(
+                    f"Invalid JSONL line {result.line_number}{where}: {result.error}", err=True
+                )
+                raise typer.Exit(2)
+
+            outfile.write(result.output)
+            outfile.write(b"\n")
+            summary.record(result.flags, result.risk_score, result.stats)
+            if result.cache_hit is not None:
+                summary.record_cache(result.cache_hit)
+            if checkpointer is not None:
+                checkpointer.advance(result.line_number)
+        outfile.flush()
+        if checkpointer is not None:
+            checkpointer.finish()
+
+    summary_dict: dict[str, Any] | None = None
+    if context.summary_json is not None:
+        if shard_spec is not None:
+            from rag_sanitizer.shards import summary_fragment
 
-            sanitized = sanitize_chunk(
-                chunk,
-                require_citations=not allow_missing_citations,
-                rule_pack=rule_pack,
-                markdown_aware=markdown,
+            summary_dict = summary_fragment(
+                summary,
+                shard_spec,
+                input_path=Path(input_path),
+                start=shard_start,
+                end=shard_end,
+                profiler=profiler,
             )
-            outfile.write(sanitized.to_json())
-            outfile.write("\n")
-
-            processed += 1
-            if sanitized.flags:
-                flagged += 1
-                for flag in sanitized.flags:
-                    flags_count[flag] = flags_count.get(flag, 0) + 1
-            if sanitized.risk_score > max_seen_risk:
-                max_seen_risk = sanitized.risk_score
-            if max_risk is not None and sanitized.risk_score >= max_risk:
-                should_fail = True
-            if fail_on_flag_set and any(flag in fail_on_flag_set for flag in sanitized.flags):
-                should_fail = True
+        else:
+            summary_dict = context.profiled(summary.to_dict())
+    context.finish(summary_dict, destination=str(Path(output_path)))
+
+
+def _sanitize_files(
+    inputs: InputSet,
+    *,
+    output_path: str,
+    out_dir: Path | None,
+    rule_pack: RulePack | None,
+    rules: Path | None,
+    options: LineOptions,
+    summary: RunSummary,
+    profiler: Profiler | None,
+    skip_invalid: bool,
+    workers: int,
+) -> dict[str, Any]:
+    """Sanitize every file of a directory or glob ``--in``; return per-file summaries."""
+    from rag_sanitizer.compression import compression_for_path, open_output
+    from rag_sanitizer.parallel import iter_file_results
+
+    files: dict[str, Any] = {}
+    with ExitStack() as stack:
+        stack.enter_context(_reported_input_errors())
+        outfile: IO[bytes] | None = None
+        outputs = None
+        if out_dir is not None:
+            outputs = [inputs.mirrored(path, out_dir) for path in inputs.files]
+        elif output_path == "-":
+            outfile = sys.stdout.buffer
+        else:
+            target = stack.enter_context(Path(output_path).open("wb"))
+            outfile = stack.enter_context(
+                open_output(target, compression_for_path(Path(output_path)))
+            )
+        results = iter_file_results(
+            inputs.files,
+            outputs=outputs,
+            outfile=outfile,
+            rule_pack=rule_pack,
+            rules_path=rules,
+            options=options,
+            summary=summary,
+            skip_invalid=skip_invalid,
+            workers=workers,
+            profiler=profiler,
+        )
+        for result in results:
+            name = inputs.name(result.path)
+            for line_number, error in result.skipped:
+                typer.echo(
+                    f"Skipping invalid JSONL line {line_number} of {name}: {error}", err=True
+                )
+            if result.error is not None:
+                line_number, error = result.error
+                typer.echo(f"Invalid JSONL line {line_number} of {name}: {error}", err=True)
+                raise typer.Exit(2)
+            summary.merge(result.summary)
+            files[name] = result.summary.to_dict()
+        if outfile is not None:
+            outfile.flush()
+    return files
+
+
+def _sanitize_columnar(
+    input_path: str,
+    output_path: str,
+    *,
+    columns: ColumnMapping,
+    batch_rows: int,
+    rule_pack: RulePack | None,
+    options: LineOptions,
+    summary: RunSummary,
+    profiler: Profiler | None,
+    skip_invalid: bool,
+) -> None:
+    """Sanitize with a Parquet/Arrow file on either side, one record batch at a time."""
+    from rag_sanitizer.codec import iter_jsonl_lines
+    from rag_sanitizer.columnar import (
+        ColumnarWriter,
+        read_record_batches,
+        sanitize_chunk_batch,
+        sanitize_record_batch,
+    )
+    from rag_sanitizer.compression import compression_for_path, open_input, open_output
+    from rag_sanitizer.inputs import columnar_format
+
+    sanitizer = options.sanitizer(rule_pack)
+    sanitizer.profiler = profiler
+    batches: Iterable[list[SanitizedChunk]]
+    with ExitStack() as stack:
+        stack.enter_context(_reported_input_errors())
+        try:
+            if input_path != "-" and columnar_format(Path(input_path)) is not None:
+                batches = (
+                    sanitize_record_batch(batch, sanitizer, columns, summary=summary)
+                    for batch in read_record_batches(Path(input_path), columns, batch_rows)
+                )
+            else:
+                if input_path == "-":
+                    infile = stack.enter_context(open_input(sys.stdin.buffer))
+                else:
+                    source = stack.enter_context(Path(input_path).open("rb"))
+                    infile = stack.enter_context(open_input(source, Path(input_path)))
+                numbered_lines = iter_jsonl_lines(infile, universal_newlines=input_path != "-")
+                batches = (
+                    sanitize_chunk_batch(chunks, sanitizer, summary=summary)
+                    for chunks in _chunk_batches(numbered_lines, batch_rows, skip_invalid)
+                )
+            if output_path != "-" and columnar_format(Path(output_path)) is not None:
+                writer = stack.enter_context(ColumnarWriter(Path(output_path)))
+                for results in batches:
+                    writer.write(results)
+                return
+            outfile: IO[bytes]
+            if output_path == "-":
+                outfile = sys.stdout.buffer
+            else:
+                target = stack.enter_context(Path(output_path).open("wb"))
+                outfile = stack.enter_context(
+                    open_output(target, compression_for_path(Path(output_path)))
+                )
+            for results in batches:
+                outfile.write(b"".join(result.to_json_bytes() + b"\n" for result in results))
+            outfile.flush()
+        except ValueError as exc:
+            raise typer.BadParameter(str(exc)) from None
+
+
+def _sanitize_indexed(
+    input_path: str,
+    output_path: str,
+    *,
+    rule_pack: RulePack,
+    index_path: Path | None,
+    previous_path: Path | None,
+    markdown_aware: bool,
+    require_citations: bool,
+    summary: RunSummary,
+    skip_invalid: bool,
+) -> dict[str, Any]:
+    """Sanitize via per-pattern hits for --index/--rescan; return the rescan stats."""
+    from rag_sanitizer.codec import iter_jsonl_lines
+    from rag_sanitizer.compression import compression_for_path, open_input, open_output
+    from rag_sanitizer.rescan import IndexWriter, Rescanner, index_header, open_index
+    from rag_sanitizer.sanitizer import parse_chunk
+
+    with ExitStack() as stack:
+        stack.enter_context(_reported_input_errors())
+        previous: dict[str, Any] | None = None
+        records: Iterator[dict[str, Any]] = iter(())
+        if previous_path is not None:
+            try:
+                previous, records = stack.enter_context(open_index(previous_path))
+            except (OSError, ValueError) as exc:
+                raise typer.BadParameter(f"Cannot read index {previous_path}: {exc}") from None
+        try:
+            rescanner = Rescanner(
+                rule_pack,
+                markdown_aware=markdown_aware,
+                require_citations=require_citations,
+                previous=previous,
+            )
+            if input_path == "-":
+                infile = stack.enter_context(open_input(sys.stdin.buffer))
+            else:
+                source = stack.enter_context(Path(input_path).open("rb"))
+                infile = stack.enter_context(open_input(source, Path(input_path)))
+            outfile: IO[bytes]
+            if output_path == "-":
+                outfile = sys.stdout.buffer
+            else:
+                target = stack.enter_context(Path(output_path).open("wb"))
+                outfile = stack.enter_context(
+                    open_output(target, compression_for_path(Path(output_path)))
+                )
+        except ValueError as exc:
+            raise typer.BadParameter(str(exc)) from None
+        writer = None
+        if index_path is not None:
+            header = index_header(rule_pack, markdown_aware=markdown_aware)
+            writer = stack.enter_context(IndexWriter(index_path, header))
+
+        numbered_lines = iter_jsonl_lines(infile, universal_newlines=input_path != "-")
+        for line_number, line in numbered_lines:
+            try:
+                chunk = parse_chunk(line)
+            except Exception as exc:  # noqa: BLE001 - reported per line
+                if not skip_invalid:
+                    typer.echo(f"Invalid JSONL line {line_number}: {exc}", err=True)
+                    raise typer.Exit(2) from None
+                typer.echo(f"Skipping invalid JSONL line {line_number}: {exc}", err=True)
+                continue
+            try:
+                result, record = rescanner.sanitize(chunk, next(records, None))
+            except ValueError as exc:
+                raise typer.BadParameter(f"Invalid index {previous_path}: {exc}") from None
+            outfile.write(result.to_json_bytes())
+            outfile.write(b"\n")
+            summary.record(result.flags, result.risk_score, result.chunk_stats(len(chunk.text)))
+            if writer is not None:
+                writer.write(record)
+        outfile.flush()
+    return rescanner.stats()
 
+
+def _sanitize_streamed(
+    input_path: str,
+    output_path: str,
+    *,
+    window: int,
+    rule_pack: RulePack,
+    options: LineOptions,
+    summary: RunSummary,
+    skip_invalid: bool,
+) -> None:
+    """Sanitize for --stream-window: lines longer than ``window`` are never held whole."""
+    from rag_sanitizer.compression import compression_for_path, open_input_stream, open_output
+    from rag_sanitizer.sanitizer import parse_chunk
+    from rag_sanitizer.streaming import LongLine, iter_stream_lines, sanitize_long_line
+
+    sanitizer = options.sanitizer(rule_pack)
+    with ExitStack() as stack:
+        stack.enter_context(_reported_input_errors())
+        try:
+            if input_path == "-":
+                infile = stack.enter_context(open_input_stream(sys.stdin.buffer))
+            else:
+                source = stack.enter_context(Path(input_path).open("rb"))
+                infile = stack.enter_context(open_input_stream(source, Path(input_path)))
+            outfile: IO[bytes]
+            if output_path == "-":
+                outfile = sys.stdout.buffer
+            else:
+                target = stack.enter_context(Path(output_path).open("wb"))
+                outfile = stack.enter_context(
+                    open_output(target, compression_for_path(Path(output_path)))
+                )
+        except ValueError as exc:
+            raise typer.BadParameter(str(exc)) from None
+
+        numbered_lines = iter_stream_lines(infile, window, universal_newlines=input_path != "-")
+        for line_number, line in numbered_lines:
+            try:
+                if isinstance(line, LongLine):
+                    result = sanitize_long_line(
+                        line.pieces(),
+                        outfile,
+                        rule_pack=rule_pack,
+                        markdown_aware=options.markdown_aware,
+                        require_citations=options.require_citations,
+                        window=window,
+                        summary=summary,
+                    )
+                    if result is None:
+                        continue
+                else:
+                    chunk = parse_chunk(line)
+                    result = sanitizer.sanitize(chunk)
+                    outfile.write(result.to_json_bytes())
+                    summary.record(
+                        result.flags, result.risk_score, result.chunk_stats(len(chunk.text))
+                    )
+            except Exception as exc:  # noqa: BLE001 - reported per line
+                if not skip_invalid:
+                    typer.echo(f"Invalid JSONL line {line_number}: {exc}", err=True)
+                    raise typer.Exit(2) from None
+                typer.echo(f"Skipping invalid JSONL line {line_number}: {exc}", err=True)
+                continue
+            outfile.write(b"\n")
+        outfile.flush()
+
+
+def _chunk_batches(
+    numbered_lines: Iterable[tuple[int, bytes]], batch_rows: int, skip_invalid: bool
+) -> Iterable[list[Chunk]]:
+    """Parse JSONL lines into lists of ``batch_rows`` chunks, reporting invalid lines."""
+    from rag_sanitizer.sanitizer import parse_chunk
+
+    chunks: list[Chunk] = []
+    for line_number, line in numbered_lines:
+        try:
+            chunks.append(parse_chunk(line))
+        except Exception as exc:  # noqa: BLE001 - reported per line
+            if not skip_invalid:
+                typer.echo(f"Invalid JSONL line {line_number}: {exc}", err=True)
+                raise typer.Exit(2) from None
+            typer.echo(f"Skipping invalid JSONL line {line_number}: {exc}", err=True)
+            continue
+        if len(chunks) == batch_rows:
+            yield chunks
+            chunks = []
+    if chunks:
+        yield chunks
+
+
+@contextmanager
+def _reported_input_errors() -> Iterator[None]:
+    """Report truncated or corrupt compressed input as an input error (exit code 2)."""
+    from rag_sanitizer.compression import DecompressionError
+
+    try:
+        yield
+    except DecompressionError as exc:
+        typer.echo(f"Cannot read input: {exc}", err=True)
+        raise typer.Exit(2) from None
+
+
+def _finish(
+    summary: RunSummary,
+    summary_dict: dict[str, Any] | None,
+    profiler: Profiler | None,
+    *,
+    processed: str,
+    destination: str,
+    quiet: bool,
+    summary_json: str | None,
+    profile_prometheus: str | None,
+) -> None:
+    """Report a finished run and exit 2 if its gate failed."""
     if not quiet:
-        destination = "stdout" if output_path == "-" else str(Path(output_path))
         typer.echo(
-            f"Processed {processed} chunks (flagged: {flagged}, max risk: {max_seen_risk:.2f}). "
-            f"Wrote output to {destination}.",
+            f"Processed {processed} (flagged: {summary.flagged}, "
+            f"max risk: {summary.max_seen_risk:.2f}). Wrote output to {destination}.",
             err=True,
         )
 
     if summary_json is not None:
-        summary = {
-            "processed": processed,
-            "flagged": flagged,
-            "max_risk": round(max_seen_risk, 4),
-            "flags_count": flags_count,
-            "failed": should_fail,
-        }
-        summary_payload = json.dumps(summary, sort_keys=True)
-        if summary_json == "-":
-            typer.echo(summary_payload)
+        assert summary_dict is not None
+        _write_summary(summary_dict, summary_json)
+
+    if profiler is not None and profile_prometheus is not None:
+        if profile_prometheus == "-":
+            typer.echo(profiler.to_prometheus(), nl=False)
         else:
-            summary_path = Path(summary_json)
-            summary_path.parent.mkdir(parents=True, exist_ok=True)
-            summary_path.write_text(summary_payload + "\n", encoding="utf-8")
+            prometheus_path = Path(profile_prometheus)
+            prometheus_path.parent.mkdir(parents=True, exist_ok=True)
+            prometheus_path.write_text(profiler.to_prometheus(), encoding="utf-8")
 
-    if should_fail:
+    if summary.should_fail:
         raise typer.Exit(2)
+
+
+def _load_rules(rules: Path, *, strict: bool) -> RulePack:
+    import warnings
+
+    from rag_sanitizer.sanitizer import (
+        UnsafePatternWarning,
+        check_rule_pack_safety,
+        load_rule_pack,
+    )
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", UnsafePatternWarning)
+        try:
+            rule_pack = load_rule_pack(rules)
+            if strict:
+                check_rule_pack_safety(rule_pack)
+        except ValueError as exc:
+            raise typer.BadParameter(f"Invalid rules file {rules}: {exc}") from None
+    for warning in caught:
+        if issubclass(warning.category, UnsafePatternWarning):
+            typer.echo(f"Warning: {rules}: {warning.message}", err=True)
+        else:
+            warnings.showwarning(
+                warning.message, warning.category, warning.filename, warning.lineno
+            )
+    return rule_pack
+
+
+def _compile_rules(rules: Path | None, output: Path, *, strict: bool) -> None:
+    from rag_sanitizer.sanitizer import compile_rule_pack, default_rule_pack
+
+    rule_pack = _load_rules(rules, strict=strict) if rules is not None else default_rule_pack()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(compile_rule_pack(rule_pack), sort_keys=True) + "\n", encoding="utf-8"
+    )
+    typer.echo(f"Wrote compiled rules {rule_pack.fingerprint[:12]} to {output}")
+    raise typer.Exit(0)
+
+
+def _lint_rules(rules: Path | None) -> None:
+    from rag_sanitizer.lint import lint_patterns
+    from rag_sanitizer.sanitizer import DEFAULT_RULES, RULE_ARTIFACT_FORMAT
+
+    # Read the file directly: a pack that fails the load-time check must still be lintable.
+    if rules is None:
+        payload = DEFAULT_RULES
+    else:
+        try:
+            payload = json.loads(rules.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            raise typer.BadParameter(f"Cannot read rules file {rules}: {exc}") from None
+        if not isinstance(payload, dict):
+            raise typer.BadParameter("rules must be a JSON object")
+        if payload.get("format") == RULE_ARTIFACT_FORMAT and isinstance(payload.get("rules"), dict):
+            payload = payload["rules"]  # a --compile-rules artifact
+    fields = {}
+    for field_name in ("instruction_patterns", "secret_patterns"):
+        patterns = payload.get(field_name, DEFAULT_RULES[field_name])
+        if not isinstance(patterns, list) or not all(isinstance(item, str) for item in patterns):
+            raise typer.BadParameter(f"{field_name} must be a list of strings")
+        fields[field_name] = patterns
+
+    findings = lint_patterns(fields)
+    for finding in findings:
+        typer.echo(str(finding))
+    errors = sum(finding.severity == "error" for finding in findings)
+    checked = sum(len(patterns) for patterns in fields.values())
+    typer.echo(
+        f"Checked {checked} patterns: {errors} errors, {len(findings) - errors} warnings.",
+        err=True,
+    )
+    raise typer.Exit(2 if errors else 0)
+
+
+def _write_summary(summary_dict: dict[str, Any], summary_json: str) -> None:
+    summary_payload = json.dumps(summary_dict, sort_keys=True)
+    if summary_json == "-":
+        typer.echo(summary_payload)
+    else:
+        summary_path = Path(summary_json)
+        summary_path.parent.mkdir(parents=True, exist_ok=True)
+        summary_path.write_text(summary_payload + "\n", encoding="utf-8")
+
+
+def _merge_summaries(fragment_paths: list[Path], summary_json: str | None, quiet: bool) -> None:
+    from rag_sanitizer.shards import merge_fragments
+
+    fragments = []
+    for path in fragment_paths:
+        try:
+            fragments.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError) as exc:
+            raise typer.BadParameter(f"Cannot read summary fragment {path}: {exc}") from None
+    try:
+        merged = merge_fragments(fragments)
+    except (KeyError, TypeError, ValueError) as exc:
+        raise typer.BadParameter(f"Cannot merge summary fragments: {exc}") from None
+    _write_summary(merged, summary_json or "-")
+    if not quiet:
+        typer.echo(
+            f"Merged {len(fragments)} shards: {merged['processed']} chunks "
+            f"(flagged: {merged['flagged']}, max risk: {merged['max_risk']:.2f}).",
+            err=True,
+        )
+    raise typer.Exit(2 if merged["failed"] else 0)
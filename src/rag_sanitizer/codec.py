@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable, Iterator
+from json.encoder import JSONEncoder, encode_basestring_ascii
+from typing import Any
+
+try:  # Optional fast decoder (`pip install rag-sanitizer[fast]`).
+    import orjson
+except ImportError:  # pragma: no cover - optional accelerator
+    orjson = None  # type: ignore[assignment, unused-ignore]
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# The encoder behind `json.dumps` defaults (", "/": " separators, NaN allowed), without
+# circular-reference tracking: rows are built from decoded JSON and cannot be cyclic, and
+# a shared marker table would misfire when threads encode the same cached scan at once.
+_c_make_encoder: Any = getattr(json.encoder, "c_make_encoder", None)
+_encode_ascii: Any = (
+    _c_make_encoder(
+        None,
+        JSONEncoder().default,
+        encode_basestring_ascii,
+        None,
+        ": ",
+        ", ",
+        False,
+        False,
+        True,
+    )
+    if _c_make_encoder is not None
+    else None
+)
+
+
+def loads(data: str | bytes) -> Any:
+    """Decode one JSON document, accepting exactly what `json.loads` accepts.
+
+    orjson is stricter than the stdlib (no ``NaN``, no UTF-16 byte input, no lone
+    surrogates), so anything it rejects is retried with `json.loads`; errors therefore
+    carry the stdlib's messages. Some orjson versions also read integers wider than
+    64 bits as floats, so results containing a float are re-decoded too (chunk rows
+    rarely carry floats).
+    """
+    if orjson is not None:
+        try:
+            value = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+        else:
+            if not _has_float(value):
+                return value
+    return json.loads(data)
+
+
+def _has_float(value: Any) -> bool:
+    kind = type(value)
+    if kind is dict:
+        return any(map(_has_float, value.values()))
+    if kind is list:
+        return any(map(_has_float, value))
+    return kind is float
+
+
+def dumps_ascii(value: Any) -> str:
+    """Encode ``value`` exactly as ``json.dumps(value, ensure_ascii=True)`` does.
+
+    `json.dumps` builds a fresh C encoder (and a circular-reference table) on every
+    call; reusing one encoder skips that per-row setup while producing the same text.
+    """
+    if _encode_ascii is None:  # pragma: no cover - interpreters without the C speedups
+        return json.dumps(value)
+    return "".join(_encode_ascii(value, 0))
+
+
+def iter_jsonl_lines(
+    lines: Iterable[bytes], *, universal_newlines: bool = True
+) -> Iterator[tuple[int, bytes]]:
+    """Yield ``(line_number, line)`` for the non-blank lines of a binary JSONL stream.
+
+    Numbering and stripping match iterating the stream in text mode (`str.strip`, and a
+    lone ``"\\r"`` ending a line when ``universal_newlines`` is set, as for files opened
+    with `open`; POSIX ``sys.stdin`` only splits on ``"\\n"``). Reading bytes therefore
+    changes neither line numbers nor which lines count as blank. Lines are returned
+    undecoded; `loads` accepts bytes directly.
+    """
+    line_number = 0
+    for raw in lines:
+        pieces = raw.splitlines() if universal_newlines and b"\r" in raw else (raw,)
+        for piece in pieces:
+            line_number += 1
+            line = piece.strip()
+            if line and not (_is_plain(line[0]) and _is_plain(line[-1])):
+                # str.strip also removes non-ASCII and \x1c-\x1f whitespace.
+                line = (
+                    piece.decode("utf-8", "surrogateescape")
+                    .strip()
+                    .encode("utf-8", "surrogateescape")
+                )
+            if line:
+                yield line_number, line
+
+
+def _is_plain(byte: int) -> bool:
+    return 0x20 < byte < 0x7F
@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, fields
+from functools import cache
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+from rag_sanitizer.inputs import columnar_format
+from rag_sanitizer.matching import ASCII_FOLDING_CHARS
+from rag_sanitizer.sanitizer import (
+    OTHER_LINE_BREAKS,
+    Chunk,
+    RulePack,
+    SanitizedChunk,
+    Sanitizer,
+    chunk_from_dict,
+)
+from rag_sanitizer.summary import RunSummary
+
+try:  # Optional Arrow/Parquet support (`pip install rag-sanitizer[parquet]`).
+    import pyarrow as pa  # type: ignore[import-untyped, import-not-found, unused-ignore]
+    import pyarrow.compute as pc  # type: ignore[import-untyped, import-not-found, unused-ignore]
+    import pyarrow.parquet as pq  # type: ignore[import-untyped, import-not-found, unused-ignore]
+except ImportError:  # pragma: no cover - optional format
+    pa = pc = pq = None
+
+# Rows per record batch; the rows (and their results) of one batch are all that is held
+# in memory at a time.
+DEFAULT_BATCH_ROWS = 16384
+
+_RE2_SPECIAL = frozenset("\\.^$|?*+()[]{}")
+
+
+@dataclass(frozen=True)
+class ColumnMapping:
+    """Input column names for the `Chunk` fields.
+
+    Only ``text`` must exist; a missing ``id``, ``source`` or ``citations`` column reads
+    like a JSONL object without that key.
+    """
+
+    id: str = "id"
+    text: str = "text"
+    source: str = "source"
+    citations: str = "citations"
+
+    @classmethod
+    def parse(cls, specs: Iterable[str]) -> ColumnMapping:
+        """Build a mapping from ``FIELD=COLUMN`` strings such as ``text=body``."""
+        names = {item.name for item in fields(cls)}
+        mapping: dict[str, str] = {}
+        for spec in specs:
+            name, sep, column = spec.partition("=")
+            name = name.strip()
+            if not sep or not column:
+                raise ValueError(f"column mapping {spec!r} must look like FIELD=COLUMN")
+            if name not in names:
+                raise ValueError(
+                    f"unknown column field {name!r} (expected one of {', '.join(sorted(names))})"
+                )
+            mapping[name] = column
+        return cls(**mapping)
+
+
+DEFAULT_COLUMNS = ColumnMapping()
+
+
+@cache
+def output_schema() -> Any:
+    """Arrow schema of sanitized output: one column per `SanitizedChunk.to_json` key."""
+    _require_pyarrow()
+    return pa.schema(
+        [
+            ("id", pa.string()),
+            ("sanitized_text", pa.string()),
+            ("risk_score", pa.float64()),
+            ("flags", pa.list_(pa.string())),
+            ("source", pa.string()),
+            ("citations", pa.list_(pa.string())),
+            ("citation_ok", pa.bool_()),
+            (
+                "redactions",
+                pa.list_(
+                    pa.struct(
+                        [
+                            ("line_number", pa.int64()),
+                            ("type", pa.string()),
+                            ("matched_patterns", pa.list_(pa.string())),
+                        ]
+                    )
+                ),
+            ),
+            (
+                "secret_spans",
+                pa.list_(
+                    pa.struct(
+                        [("start", pa.int64()), ("end", pa.int64()), ("pattern", pa.string())]
+                    )
+                ),
+            ),
+        ]
+    )
+
+
+def prescreen(texts: Any, rule_pack: RulePack) -> list[bool]:
+    """Return, per row of the Arrow string array ``texts``, whether it needs a scan.
+
+    Rows marked False contain none of the rule pack's prefilter literals, so
+    `Sanitizer.sanitize_unmatched` gives their exact result. The check runs as two
+    vectorized kernels over the whole array (ASCII lowercasing, then one regex
+    alternation of the literals); rows with characters that fold onto ASCII letters,
+    with `OTHER_LINE_BREAKS` or with null text are always marked for a scan. When any
+    pattern lacks a literal every row is.
+    """
+    _require_pyarrow()
+    instruction = rule_pack.instruction_matcher.prefilter
+    secret = rule_pack.secret_matcher.prefilter
+    if instruction.always or secret.always:
+        return [True] * len(texts)
+    return pc.fill_null(  # type: ignore[no-any-return]
+        pc.match_substring_regex(pc.ascii_lower(texts), _screen_regex(rule_pack)), True
+    ).to_pylist()
+
+
+def sanitize_chunk_batch(
+    chunks: Sequence[Chunk],
+    sanitizer: Sanitizer,
+    *,
+    summary: RunSummary | None = None,
+) -> list[SanitizedChunk]:
+    """Sanitize ``chunks`` with one vectorized `prescreen`; results match `Sanitizer.sanitize`."""
+    _require_pyarrow()
+    texts = pa.array([chunk.text for chunk in chunks], type=pa.string())
+    return _sanitize_screened(chunks, texts, sanitizer, summary)
+
+
+def sanitize_record_batch(
+    batch: Any,
+    sanitizer: Sanitizer,
+    columns: ColumnMapping = DEFAULT_COLUMNS,
+    *,
+    summary: RunSummary | None = None,
+) -> list[SanitizedChunk]:
+    """Sanitize the rows of an Arrow record batch read with the ``columns`` mapping.
+
+    Values are normalized like JSONL objects (`chunk_from_dict`), so a row gives the
+    same result as the equivalent JSONL line. The pre-screen runs directly on the text
+    column; only rows it marks are scanned.
+    """
+    _require_pyarrow()
+    names = batch.schema.names
+    if columns.text not in names:
+        raise ValueError(f"input has no text column {columns.text!r}")
+    texts = batch.column(columns.text)
+    if not (pa.types.is_string(texts.type) or pa.types.is_large_string(texts.type)):
+        raise ValueError(f"text column {columns.text!r} must hold strings, not {texts.type}")
+    present = {
+        key: batch.column(column).to_pylist()
+        for key, column in (
+            ("id", columns.id),
+            ("text", columns.text),
+            ("source", columns.source),
+            ("citations", columns.citations),
+        )
+        if column in names
+    }
+    keys = list(present)
+    chunks = [
+        chunk_from_dict(dict(zip(keys, values, strict=True)))
+        for values in zip(*present.values(), strict=True)
+    ]
+    return _sanitize_screened(chunks, texts, sanitizer, summary)
+
+
+def results_to_record_batch(results: Sequence[SanitizedChunk]) -> Any:
+    """Build an `output_schema` record batch from sanitize results."""
+    schema = output_schema()
+    return pa.RecordBatch.from_pydict(
+        {
+            "id": [result.chunk_id for result in results],
+            "sanitized_text": [result.sanitized_text for result in results],
+            "risk_score": [result.risk_score for result in results],
+            "flags": [result.flags for result in results],
+            "source": [_source_text(result.source) for result in results],
+            "citations": [result.citations for result in results],
+            "citation_ok": [result.citation_ok for result in results],
+            "redactions": [result.redactions for result in results],
+            "secret_spans": [result.secret_spans for result in results],
+        },
+        schema=schema,
+    )
+
+
+def read_record_batches(
+    path: Path, columns: ColumnMapping = DEFAULT_COLUMNS, batch_rows: int = DEFAULT_BATCH_ROWS
+) -> Iterator[Any]:
+    """Yield record batches of at most ``batch_rows`` rows, reading only mapped columns.
+
+    Parquet files are decoded batch by batch; Arrow IPC files are memory-mapped.
+    """
+    _require_pyarrow()
+    kind = columnar_format(path)
+    if kind == "parquet":
+        parquet = pq.ParquetFile(path)
+        wanted = _wanted(parquet.schema_arrow.names, columns)
+        yield from parquet.iter_batches(batch_size=batch_rows, columns=wanted)
+        return
+    if kind != "arrow":
+        raise ValueError(f"{path} is not a Parquet or Arrow file")
+    with pa.memory_map(str(path)) as source:
+        try:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            source.seek(0)
+            reader = pa.ipc.open_stream(source)
+            batches = iter(reader)
+        wanted = _wanted(reader.schema.names, columns)
+        for batch in batches:
+            batch = batch.select(wanted)
+            for offset in range(0, batch.num_rows, batch_rows):
+                yield batch.slice(offset, batch_rows)
+
+
+class ColumnarWriter:
+    """Write sanitize results to a Parquet or Arrow IPC file, one record batch at a time."""
+
+    def __init__(self, path: Path) -> None:
+        _require_pyarrow()
+        kind = columnar_format(path)
+        if kind is None:
+            raise ValueError(f"{path} is not a Parquet or Arrow file name")
+        schema = output_schema()
+        if kind == "parquet":
+            self._writer = pq.ParquetWriter(path, schema)
+        else:
+            self._writer = pa.ipc.new_file(str(path), schema)
+
+    def write(self, results: Sequence[SanitizedChunk]) -> None:
+        if results:
+            self._writer.write_batch(results_to_record_batch(results))
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def __enter__(self) -> ColumnarWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def sanitize_columnar_file(
+    input_path: Path,
+    output_path: Path,
+    *,
+    sanitizer: Sanitizer | None = None,
+    columns: ColumnMapping = DEFAULT_COLUMNS,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    summary: RunSummary | None = None,
+) -> int:
+    """Sanitize a Parquet/Arrow file into another one; return the number of rows.
+
+    Memory stays bounded by ``batch_rows``: each batch is read, screened, sanitized and
+    written before the next is read.
+    """
+    sanitizer = sanitizer or Sanitizer()
+    rows = 0
+    with ColumnarWriter(output_path) as writer:
+        for batch in read_record_batches(input_path, columns, batch_rows):
+            results = sanitize_record_batch(batch, sanitizer, columns, summary=summary)
+            writer.write(results)
+            rows += len(results)
+    return rows
+
+
+def _sanitize_screened(
+    chunks: Sequence[Chunk],
+    texts: Any,
+    sanitizer: Sanitizer,
+    summary: RunSummary | None,
+) -> list[SanitizedChunk]:
+    profiler = sanitizer.profiler
+    if profiler is not None:
+        started = perf_counter()
+    needs_scan = prescreen(texts, sanitizer.rule_pack)
+    if profiler is not None:
+        profiler.add("prefilter", started)
+    cache = sanitizer.cache
+    results: list[SanitizedChunk] = []
+    for chunk, scan in zip(chunks, needs_scan, strict=True):
+        if not scan:
+            result = sanitizer.sanitize_unmatched(chunk)
+        elif cache is None:
+            result = sanitizer.sanitize(chunk)
+        else:
+            hits_before = cache.hits
+            result = sanitizer.sanitize(chunk)
+            if summary is not None:
+                summary.record_cache(cache.hits > hits_before)
+        if summary is not None:
+            summary.record(result.flags, result.risk_score, result.chunk_stats(len(chunk.text)))
+        results.append(result)
+    return results
+
+
+@cache
+def _cached_screen_regex(literals: tuple[str, ...]) -> str:
+    special = "".join(
+        f"\\x{{{ord(char):x}}}" for char in ASCII_FOLDING_CHARS + "".join(OTHER_LINE_BREAKS)
+    )
+    escaped = ("".join(f"\\{c}" if c in _RE2_SPECIAL else c for c in item) for item in literals)
+    return "|".join((f"[{special}]", *escaped))
+
+
+def _screen_regex(rule_pack: RulePack) -> str:
+    """The RE2 alternation `prescreen` runs: any literal, or a character needing a scan."""
+    literals = (
+        *rule_pack.instruction_matcher.prefilter.literals,
+        *rule_pack.secret_matcher.prefilter.literals,
+    )
+    return _cached_screen_regex(tuple(sorted(set(literals))))
+
+
+def _wanted(available: Sequence[str], columns: ColumnMapping) -> list[str]:
+    if columns.text not in available:
+        raise ValueError(f"input has no text column {columns.text!r}")
+    wanted = (columns.id, columns.text, columns.source, columns.citations)
+    return [name for name in dict.fromkeys(wanted) if name in available]
+
+
+def _source_text(source: Any) -> str | None:
+    # Output sources are strings; other JSON values are stored as their JSON text.
+    if source is None or isinstance(source, str):
+        return source
+    return json.dumps(source)
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ValueError("Parquet/Arrow I/O needs pyarrow: pip install rag-sanitizer[parquet]")
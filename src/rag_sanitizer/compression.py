@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import gzip
+import io
+import queue
+import threading
+import zlib
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, cast
+
+try:  # Optional zstd support (`pip install rag-sanitizer[zstd]`).
+    import zstandard  # type: ignore[import-not-found, unused-ignore]
+except ImportError:  # pragma: no cover - optional codec
+    zstandard = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+EXTENSIONS = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+
+# Decompressed bytes read per block, and blocks buffered between the I/O thread and the
+# sanitizer; together they bound the memory held in flight.
+BLOCK_SIZE = 1 << 20
+QUEUE_BLOCKS = 8
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+_DONE = object()
+
+
+class DecompressionError(OSError):
+    """Compressed input that is truncated or corrupt."""
+
+
+def detect_compression(head: bytes) -> str | None:
+    """Return ``"gzip"``, ``"zstd"`` or None from a stream's leading bytes."""
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def compression_for_path(path: Path) -> str | None:
+    """Return the compression implied by ``path``'s extension (``.gz``, ``.zst``)."""
+    return EXTENSIONS.get(path.suffix.lower())
+
+
+@contextmanager
+def open_input(stream: IO[bytes], path: Path | None = None) -> Iterator[Iterable[bytes]]:
+    """Yield the raw lines of ``stream``, decompressing gzip/zstd input on the fly.
+
+    Compression is detected from the magic bytes, or from ``path``'s extension when the
+    stream cannot be peeked. Plain input is returned as is. Compressed input is
+    decompressed and split into lines by a background thread, which stays at most
+    `QUEUE_BLOCKS` blocks ahead. Lines are yielded without their ``"\\n"``;
+    `iter_jsonl_lines` numbers them the same either way. Truncated or corrupt
+    compressed input raises `DecompressionError` while the lines are iterated.
+    """
+    kind = _input_compression(stream, path)
+    if kind is None:
+        yield stream
+        return
+    reader = _ThreadedLineReader(_decompressor(kind, stream), kind)
+    try:
+        yield reader
+    finally:
+        reader.close()
+
+
+@contextmanager
+def open_input_stream(stream: IO[bytes], path: Path | None = None) -> Iterator[IO[bytes]]:
+    """Like `open_input`, but yield a binary file object rather than its lines.
+
+    For readers that take lines of any length in bounded pieces with ``readline(size)``;
+    compressed input is decompressed in the calling thread.
+    """
+    kind = _input_compression(stream, path)
+    if kind is None:
+        yield stream
+        return
+    source = _decompressor(kind, stream)
+    reader = _CheckedReader(source if kind == "gzip" else io.BufferedReader(source), kind)
+    try:
+        yield cast(IO[bytes], reader)
+    finally:
+        reader.close()
+
+
+@contextmanager
+def open_output(stream: IO[bytes], compression: str | None) -> Iterator[IO[bytes]]:
+    """Yield a binary writer for ``stream``, compressing in a background thread if asked."""
+    if compression is None:
+        yield stream
+        return
+    writer = _ThreadedWriter(_compressor(compression, stream))
+    try:
+        yield cast(IO[bytes], writer)
+    finally:
+        writer.close()
+
+
+def _input_compression(stream: IO[bytes], path: Path | None) -> str | None:
+    peek = getattr(stream, "peek", None)
+    if peek is not None:
+        return detect_compression(peek(len(ZSTD_MAGIC))[: len(ZSTD_MAGIC)])
+    return compression_for_path(path) if path is not None else None
+
+
+def _decompressor(kind: str, stream: IO[bytes]) -> Any:
+    if kind == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    return _zstandard().ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+
+
+def _compressor(kind: str, stream: IO[bytes]) -> Any:
+    if kind == "gzip":
+        # A fixed mtime keeps output byte-identical across runs.
+        return gzip.GzipFile(fileobj=stream, mode="wb", compresslevel=GZIP_LEVEL, mtime=0)
+    return _zstandard().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(stream, closefd=False)
+
+
+def _zstandard() -> Any:
+    if zstandard is None:
+        raise ValueError("zstd streams need the zstandard package: pip install rag-sanitizer[zstd]")
+    return zstandard
+
+
+def _decompression_error(kind: str, exc: BaseException) -> BaseException:
+    """Convert a codec's read error into `DecompressionError`; return others unchanged."""
+    errors: tuple[type[BaseException], ...] = (EOFError, OSError, zlib.error)
+    if zstandard is not None:
+        errors += (zstandard.ZstdError,)
+    if isinstance(exc, DecompressionError) or not isinstance(exc, errors):
+        return exc
+    return DecompressionError(f"truncated or corrupt {kind} input: {exc}")
+
+
+class _CheckedReader:
+    """Read a decompressing stream, raising `DecompressionError` for its codec errors."""
+
+    def __init__(self, source: Any, kind: str) -> None:
+        self._source = source
+        self._kind = kind
+
+    def read(self, size: int = -1) -> bytes:
+        try:
+            return cast(bytes, self._source.read(size))
+        except Exception as exc:
+            raise _decompression_error(self._kind, exc) from exc
+
+    def readline(self, size: int = -1) -> bytes:
+        try:
+            return cast(bytes, self._source.readline(size))
+        except Exception as exc:
+            raise _decompression_error(self._kind, exc) from exc
+
+    def close(self) -> None:
+        self._source.close()
+
+
+class _ThreadedLineReader:
+    """Iterate lines decompressed by a background thread through a bounded queue."""
+
+    def __init__(self, source: Any, kind: str) -> None:
+        self._source = source
+        self._kind = kind
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=QUEUE_BLOCKS)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rag-sanitizer-reader", daemon=True)
+        self._thread.start()
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield from item
+
+    def close(self) -> None:
+        self._stop.set()
+        # Unblock a producer waiting on a full queue.
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._thread.join()
+        self._source.close()
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self) -> None:
+        pending = b""
+        try:
+            while True:
+                block = self._source.read(BLOCK_SIZE)
+                if not block:
+                    break
+                lines = (pending + block).split(b"\n") if pending else block.split(b"\n")
+                pending = lines.pop()
+                if lines and not self._put(lines):
+                    return
+            if pending:
+                self._put([pending])
+        except BaseException as exc:  # noqa: BLE001 - re-raised in the consumer
+            self._put(_decompression_error(self._kind, exc))
+        self._put(_DONE)
+
+
+class _ThreadedWriter:
+    """Buffer writes and compress them in a background thread through a bounded queue."""
+
+    def __init__(self, sink: Any) -> None:
+        self._sink = sink
+        self._pending: list[bytes] = []
+        self._pending_size = 0
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=QUEUE_BLOCKS)
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name="rag-sanitizer-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, data: bytes) -> int:
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= BLOCK_SIZE:
+            self._submit()
+        return len(data)
+
+    def flush(self) -> None:
+        self._submit()
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        try:
+            self._submit()
+        finally:
+            self._queue.put(_DONE)
+            self._thread.join()
+        self._raise_error()
+
+    def _submit(self) -> None:
+        self._raise_error()
+        if self._pending:
+            self._queue.put(b"".join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _DONE:
+                    if self._error is None:
+                        self._sink.close()
+                    return
+                if self._error is None:
+                    self._sink.write(item)
+            except BaseException as exc:  # noqa: BLE001 - re-raised in the producer
+                self._error = exc
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import glob
+from dataclasses import dataclass
+from pathlib import Path
+
+from rag_sanitizer.compression import EXTENSIONS
+
+# Files a directory `--in` picks up, optionally followed by a compression extension.
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+
+# Single-file `--in`/`--out` extensions read and written as Parquet or as Arrow IPC
+# (Feather v2) files by `rag_sanitizer.columnar`.
+COLUMNAR_EXTENSIONS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+_GLOB_MAGIC = frozenset("*?[")
+
+
+@dataclass(frozen=True)
+class InputSet:
+    """The files a directory or glob ``--in`` expands to, in processing order.
+
+    ``root`` is the directory that file names are reported relative to, and that
+    mirrored outputs are laid out from.
+    """
+
+    root: Path
+    files: tuple[Path, ...]
+
+    def name(self, path: Path) -> str:
+        """``path`` relative to the root, with ``/`` separators."""
+        return path.relative_to(self.root).as_posix()
+
+    def mirrored(self, path: Path, out_dir: Path) -> Path:
+        """Where the output for ``path`` goes under ``out_dir``."""
+        return out_dir / path.relative_to(self.root)
+
+
+def is_multi_input(value: str) -> bool:
+    """Whether ``--in value`` names a directory or glob rather than a single file."""
+    path = Path(value)
+    if path.is_file():
+        return False
+    return path.is_dir() or any(char in _GLOB_MAGIC for char in value)
+
+
+def expand_inputs(value: str, exclude: tuple[Path, ...] = ()) -> InputSet:
+    """Expand a directory (recursively, JSONL files only) or glob into sorted files.
+
+    Files at or under an ``exclude`` path (such as the run's own output) are skipped.
+    Raises ValueError when nothing is left.
+    """
+    path = Path(value)
+    if path.is_dir():
+        root = path
+        candidates = [item for item in path.rglob("*") if is_jsonl_name(item.name)]
+    else:
+        root = _glob_root(value)
+        candidates = [Path(item) for item in glob.glob(value, recursive=True)]
+    excluded = [item.resolve() for item in exclude]
+    files = sorted(
+        item
+        for item in candidates
+        if item.is_file() and not any(item.resolve().is_relative_to(skip) for skip in excluded)
+    )
+    if not files:
+        raise ValueError(f"no input files match {value}")
+    return InputSet(root, tuple(files))
+
+
+def columnar_format(path: Path) -> str | None:
+    """Return ``"parquet"``, ``"arrow"`` or None from ``path``'s extension."""
+    return COLUMNAR_EXTENSIONS.get(path.suffix.lower())
+
+
+def is_jsonl_name(name: str) -> bool:
+    """Whether ``name`` ends in a JSONL suffix, optionally compressed (``a.jsonl.gz``)."""
+    stem, dot, suffix = name.rpartition(".")
+    if dot and f".{suffix.lower()}" in EXTENSIONS:
+        name = stem
+    return name.lower().endswith(JSONL_SUFFIXES)
+
+
+def _glob_root(pattern: str) -> Path:
+    """The leading directories of ``pattern`` that contain no glob characters."""
+    parts = Path(pattern).parts
+    for index, part in enumerate(parts):
+        if any(char in _GLOB_MAGIC for char in part):
+            return Path(*parts[:index]) if index else Path(".")
+    return Path(pattern).parent
@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from re import Pattern
+from time import perf_counter
+from typing import Any
+
+from rag_sanitizer.matching import required_literal
+
+# The stdlib regex parser (formerly `sre_parse`): private, but the only way to inspect a
+# pattern's structure, and stable across the supported Python versions.
+_parser: Any = getattr(re, "_parser")  # noqa: B009
+
+# Repeats allowing at least this many iterations are treated like unbounded ones.
+_LARGE_REPEAT = 16
+
+# Characters used to decide whether two regex atoms can consume the same input.
+_SAMPLE_CHARS = tuple(chr(code) for code in range(32, 127)) + (
+    "\t",
+    "\n",
+    "\r",
+    "\x0b",
+    "\x0c",
+    "\xa0",
+    "\xe9",
+    "\xdf",
+    "İ",
+    "ı",
+    "ſ",
+    "٣",
+    " ",
+    "　",
+    "中",
+)
+_CATEGORY_PATTERNS = {
+    _parser.CATEGORY_DIGIT: re.compile(r"\d"),
+    _parser.CATEGORY_NOT_DIGIT: re.compile(r"\D"),
+    _parser.CATEGORY_SPACE: re.compile(r"\s"),
+    _parser.CATEGORY_NOT_SPACE: re.compile(r"\S"),
+    _parser.CATEGORY_WORD: re.compile(r"\w"),
+    _parser.CATEGORY_NOT_WORD: re.compile(r"\W"),
+}
+_ALL_CHARS = frozenset(_SAMPLE_CHARS)
+_REPEATS = (_parser.MAX_REPEAT, _parser.MIN_REPEAT)
+_ZERO_WIDTH = (_parser.AT, _parser.ASSERT, _parser.ASSERT_NOT)
+
+# Probe lengths: small steps first so exponential patterns exceed the budget before a
+# single probe can run for long, then doubling to expose polynomial growth.
+_PROBE_LENGTHS = (4, 8, 12, 16, 20, 24, 28, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+_PROBE_TERMINATORS = ("!", "\n")
+_PROBE_REPEATS = 3
+
+
+@dataclass(frozen=True)
+class LintFinding:
+    """A rule-pack pattern that can make matching slow on adversarial input."""
+
+    severity: str  # "error" or "warning"
+    field: str
+    index: int
+    pattern: str
+    message: str
+
+    def __str__(self) -> str:
+        return (
+            f"{self.severity.upper()} {self.field}[{self.index}] {self.pattern!r}: {self.message}"
+        )
+
+
+def backtracking_risks(pattern: str) -> list[tuple[str, str]]:
+    """Statically find constructs prone to super-linear backtracking.
+
+    Returns ``(severity, message)`` pairs. Errors are nested quantifiers whose inner repeat
+    can consume the characters that follow it in the body or start another outer
+    iteration, e.g. ``(a+)+`` or ``(\\w+\\s?)*``, which backtrack exponentially when the
+    overall match fails. Warnings are overlapping alternatives inside a repeat and adjacent
+    repeats over overlapping characters (polynomial). Atomic groups and possessive
+    quantifiers are never flagged. Raises `re.error` for patterns that do not compile.
+    """
+    parsed = _parser.parse(pattern, re.IGNORECASE)
+    risks: list[tuple[str, str]] = []
+    _check_sequence(parsed, parsed.state, risks)
+    # Keep the first occurrence of each message, in pattern order.
+    return list(dict.fromkeys(risks))
+
+
+def check_pattern_safety(pattern: str) -> None:
+    """Raise `ValueError` when ``pattern`` can backtrack exponentially."""
+    for severity, message in backtracking_risks(pattern):
+        if severity == "error":
+            raise ValueError(message)
+
+
+def probe_pattern(
+    pattern: Pattern[str], *, budget: float = 0.05, max_length: int = 4096
+) -> tuple[float, int, float | None]:
+    """Time ``pattern.search`` on worst-case probes built from the pattern's own characters.
+
+    Each probe repeats one character the pattern can consume (optionally after its
+    required literal) and ends in a character that makes the match fail, which is where
+    backtracking cost shows. Lengths grow until a probe exceeds ``budget`` seconds or
+    ``max_length`` is reached. Each probe is timed as the best of `_PROBE_REPEATS` runs to
+    damp scheduler noise. Returns the slowest probe time, its length, and the smaller
+    time ratio of the last two doublings (None if not reached).
+    """
+    parsed = _parser.parse(pattern.pattern, pattern.flags)
+    fill = sorted(_representatives(parsed, parsed.state)) or ["a"]
+    literal = required_literal(pattern.pattern) or ""
+    prefixes = ("", literal) if literal else ("",)
+
+    times: list[float] = []
+    slowest = 0.0
+    for length in _PROBE_LENGTHS:
+        if length > max_length:
+            break
+        worst = 0.0
+        for prefix in prefixes:
+            for char in fill:
+                for terminator in _PROBE_TERMINATORS:
+                    probe = prefix + char * length + terminator
+                    best = budget
+                    for _ in range(_PROBE_REPEATS):
+                        started = perf_counter()
+                        pattern.search(probe)
+                        elapsed = perf_counter() - started
+                        if elapsed > budget:
+                            return elapsed, length, _growth(times)
+                        best = min(best, elapsed)
+                    worst = max(worst, best)
+        if length > 32:
+            times.append(worst)
+        slowest = max(slowest, worst)
+    return slowest, min(max_length, _PROBE_LENGTHS[-1]), _growth(times)
+
+
+def _growth(times: list[float]) -> float | None:
+    """Smaller time ratio of the last two doublings, so one noisy timing cannot inflate it."""
+    if len(times) < 3 or min(times[-3:]) <= 0:
+        return None
+    return min(times[-1] / times[-2], times[-2] / times[-3])
+
+
+def lint_patterns(
+    fields: Mapping[str, Sequence[str]],
+    *,
+    probe: bool = True,
+    budget: float = 0.05,
+    max_length: int = 4096,
+) -> list[LintFinding]:
+    """Lint every pattern in ``fields`` (e.g. ``{"instruction_patterns": [...]}``).
+
+    Patterns with exponential-backtracking constructs are reported as errors and are not
+    probed (a probe could run for hours). Others are probed with `probe_pattern`: a probe
+    over ``budget`` is an error, and time growing faster than ~n^1.6 per doubling at the
+    longest probes is a warning.
+    """
+    findings: list[LintFinding] = []
+    for field, patterns in fields.items():
+        for index, pattern in enumerate(patterns):
+            try:
+                compiled = re.compile(pattern, re.IGNORECASE)
+                risks = backtracking_risks(pattern)
+            except re.error as exc:
+                findings.append(LintFinding("error", field, index, pattern, f"invalid: {exc}"))
+                continue
+            findings.extend(
+                LintFinding(severity, field, index, pattern, message) for severity, message in risks
+            )
+            if not probe or any(severity == "error" for severity, _ in risks):
+                continue
+            seconds, length, growth = probe_pattern(compiled, budget=budget, max_length=max_length)
+            if seconds > budget:
+                findings.append(
+                    LintFinding(
+                        "error",
+                        field,
+                        index,
+                        pattern,
+                        f"slow: {seconds * 1000:.1f} ms on a {length}-char probe",
+                    )
+                )
+            elif growth is not None and growth > 3.0 and seconds > 0.001:
+                findings.append(
+                    LintFinding(
+                        "warning",
+                        field,
+                        index,
+                        pattern,
+                        f"super-linear: probe time grows {growth:.1f}x per doubling "
+                        f"({seconds * 1000:.1f} ms at {length} chars)",
+                    )
+                )
+    return findings
+
+
+def _check_sequence(items: Any, state: Any, risks: list[tuple[str, str]]) -> None:
+    # Character sets of the unbounded repeats that the current item directly follows,
+    # with only nullable items in between.
+    open_repeats: list[frozenset[str]] = []
+    for op, av in items:
+        if op not in _REPEATS:
+            for child in _children(op, av):
+                _check_sequence(child, state, risks)
+            if _item_min_width(op, av, state) > 0:
+                open_repeats = []
+            continue
+        body = av[2]
+        _check_sequence(body, state, risks)
+        if not _is_unbounded(av):
+            if av[0] > 0:
+                open_repeats = []
+            continue
+        _check_nested(body, state, risks)
+        chars = _chars(body)
+        if any(chars & earlier for earlier in open_repeats):
+            risks.append(("warning", "adjacent repeats overlap; backtracking grows polynomially"))
+        open_repeats = [*open_repeats, chars] if av[0] == 0 else [chars]
+
+
+def _check_nested(body: Any, state: Any, risks: list[tuple[str, str]]) -> None:
+    """Flag constructs inside a repeated ``body`` that give an input many parses."""
+    if _ambiguous_repeat(body, (), state, _first_chars(body, state)):
+        risks.append(
+            (
+                "error",
+                "nested quantifiers can backtrack exponentially; rewrite without the outer "
+                "repeat or use (?>...)/possessive quantifiers",
+            )
+        )
+    elif any(_overlapping(branch, state) for branch in _branches(body)):
+        risks.append(
+            ("warning", "overlapping alternatives inside a repeat can backtrack exponentially")
+        )
+
+
+def _branches(items: Any) -> list[Any]:
+    found = []
+    for op, av in items:
+        if op is _parser.BRANCH:
+            found.append(av[1])
+        if op not in (_parser.ATOMIC_GROUP, _parser.POSSESSIVE_REPEAT, *_ZERO_WIDTH):
+            for child in _children(op, av):
+                found.extend(_branches(child))
+    return found
+
+
+def _overlapping(alternatives: Any, state: Any) -> bool:
+    """Whether two alternatives can start the same way (or both match the empty string)."""
+    firsts = [_first_chars(alternative, state) for alternative in alternatives]
+    nullable = [_min_width(alternative, state) == 0 for alternative in alternatives]
+    return any(
+        firsts[first] & firsts[second] or (nullable[first] and nullable[second])
+        for first in range(len(firsts))
+        for second in range(first + 1, len(firsts))
+    )
+
+
+def _ambiguous_repeat(items: Any, rest: tuple[Any, ...], state: Any, wrap: frozenset[str]) -> bool:
+    """Whether an unbounded repeat in ``items`` can also consume what comes after it.
+
+    ``rest`` holds the sequences that follow ``items`` up to the end of the outer repeat's
+    body, and ``wrap`` the characters that start its next iteration. Only then can the
+    same input be split between the inner and outer repeats in many ways; ``(\\w+\\.)+``
+    is unambiguous because ``\\w+`` cannot take the ``.`` that ends it.
+    """
+    for position, (op, av) in enumerate(items):
+        after = (items[position + 1 :], *rest)
+        if op in _REPEATS:
+            body = av[2]
+            if _is_unbounded(av) and _min_width(body, state) > 0:
+                if _chars(body) & _follow_chars(after, state, wrap):
+                    return True
+            if _ambiguous_repeat(body, after, state, wrap):
+                return True
+        elif op not in (_parser.ATOMIC_GROUP, _parser.POSSESSIVE_REPEAT, *_ZERO_WIDTH):
+            for child in _children(op, av):
+                if _ambiguous_repeat(child, after, state, wrap):
+                    return True
+    return False
+
+
+def _follow_chars(rest: tuple[Any, ...], state: Any, wrap: frozenset[str]) -> frozenset[str]:
+    """Characters that can come next after ``rest``'s predecessor: ``wrap`` if all nullable."""
+    chars: set[str] = set()
+    for items in rest:
+        chars |= _first_chars(items, state)
+        if _min_width(items, state) > 0:
+            return frozenset(chars)
+    return frozenset(chars | wrap)
+
+
+def _children(op: Any, av: Any) -> list[Any]:
+    if op is _parser.SUBPATTERN:
+        return [av[3]]
+    if op is _parser.BRANCH:
+        return list(av[1])
+    if op in _REPEATS or op is _parser.POSSESSIVE_REPEAT:
+        return [av[2]]
+    if op is _parser.ATOMIC_GROUP:
+        return [av]
+    if op in (_parser.ASSERT, _parser.ASSERT_NOT):
+        return [av[1]]
+    if op is _parser.GROUPREF_EXISTS:
+        return [branch for branch in av[1:] if branch is not None]
+    return []
+
+
+def _is_unbounded(av: Any) -> bool:
+    return bool(av[1] == _parser.MAXREPEAT or av[1] >= _LARGE_REPEAT)
+
+
+def _min_width(items: Any, state: Any) -> int:
+    return int(_parser.SubPattern(state, list(items)).getwidth()[0])
+
+
+def _item_min_width(op: Any, av: Any, state: Any) -> int:
+    return _min_width([(op, av)], state)
+
+
+def _first_chars(items: Any, state: Any) -> frozenset[str]:
+    """Characters that can start a match of the sequence ``items``."""
+    first: set[str] = set()
+    for op, av in items:
+        if op in _ZERO_WIDTH:
+            continue
+        if op is _parser.GROUPREF:
+            return _ALL_CHARS
+        children = _children(op, av)
+        if children:
+            for child in children:
+                first |= _first_chars(child, state)
+        else:
+            first |= _atom_chars(op, av)
+        if _item_min_width(op, av, state) > 0:
+            break
+    return frozenset(first)
+
+
+def _chars(items: Any) -> frozenset[str]:
+    """Characters that a match of ``items`` can consume anywhere."""
+    chars: set[str] = set()
+    for op, av in items:
+        if op in _ZERO_WIDTH:
+            continue
+        if op is _parser.GROUPREF:
+            return _ALL_CHARS
+        children = _children(op, av)
+        if children:
+            for child in children:
+                chars |= _chars(child)
+        else:
+            chars |= _atom_chars(op, av)
+    return frozenset(chars)
+
+
+def _representatives(items: Any, state: Any) -> set[str]:
+    """A few characters per atom of the pattern, to build probes from."""
+    found: set[str] = set()
+    for op, av in items:
+        children = _children(op, av)
+        if children:
+            for child in children:
+                found |= _representatives(child, state)
+        elif op not in _ZERO_WIDTH:
+            chars = sorted(_atom_chars(op, av))
+            found.update(chars[:1])
+    return found
+
+
+def _atom_chars(op: Any, av: Any) -> frozenset[str]:
+    return frozenset(char for char in _SAMPLE_CHARS if _atom_matches(op, av, char))
+
+
+def _atom_matches(op: Any, av: Any, char: str) -> bool:
+    variants = {char, char.lower(), char.upper()}
+    if op is _parser.LITERAL:
+        return any(ord(variant) == av for variant in variants if len(variant) == 1)
+    if op is _parser.NOT_LITERAL:
+        return not _atom_matches(_parser.LITERAL, av, char)
+    if op is _parser.ANY:
+        return char != "\n"
+    if op is _parser.IN:
+        negate = bool(av) and av[0][0] is _parser.NEGATE
+        members = av[1:] if negate else av
+        hit = any(_set_member(item_op, item_av, variants) for item_op, item_av in members)
+        return hit != negate
+    # Anything else (unknown opcodes) is assumed to match, which only adds findings.
+    return True
+
+
+def _set_member(op: Any, av: Any, variants: set[str]) -> bool:
+    singles = [variant for variant in variants if len(variant) == 1]
+    if op is _parser.LITERAL:
+        return any(ord(variant) == av for variant in singles)
+    if op is _parser.RANGE:
+        return any(av[0] <= ord(variant) <= av[1] for variant in singles)
+    if op is _parser.CATEGORY:
+        category = _CATEGORY_PATTERNS.get(av)
+        return category is None or any(category.match(variant) for variant in singles)
+    return True
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Callable, Generator, Iterable, Sequence
+from dataclasses import dataclass
+
+# Region kinds `segment` reports, in the order they are documented.
+REGION_KINDS = (
+    "fenced_code",
+    "indented_code",
+    "inline_code",
+    "html_comment",
+    "blockquote",
+    "table",
+)
+# What `markdown_aware` mode skips unless a rule pack says otherwise.
+DEFAULT_SKIP_REGIONS = ("fenced_code",)
+
+# Any indentation is accepted before a fence, and a closing fence may carry trailing
+# text; this matches how fences have always been recognised here.
+_FENCE = re.compile(r"\s*([`~]{3,})")
+_INDENTED = re.compile(r" {0,3}\t| {4}")
+_BLOCKQUOTE = re.compile(r" {0,3}>")
+_LIST_ITEM = re.compile(r" {0,3}(?:[-+*]|\d{1,9}[.)])(?:[ \t]|$)")
+_TABLE_DELIMITER = re.compile(r" {0,3}\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)*\|?[ \t]*$")
+_BACKTICKS = re.compile(r"`+")
+# A line starting with none of these cannot open or continue a block-level construct
+# other than a table, which lets plain prose skip the block checks.
+_BLOCK_STARTS = frozenset(" \t`~>-+*0123456789")
+
+
+@dataclass(frozen=True, slots=True)
+class MarkdownRegion:
+    """Columns ``start:end`` of line ``line`` (0-based) belong to a region of ``kind``.
+
+    Block regions (code blocks, blockquotes, tables) cover their lines whole; inline code
+    spans and HTML comments cover part of a line, and a comment spanning several lines
+    is reported once per line.
+    """
+
+    kind: str
+    line: int
+    start: int
+    end: int
+
+
+def check_region_kinds(kinds: Iterable[str]) -> tuple[str, ...]:
+    """Return ``kinds`` as a tuple, raising ValueError for an unknown kind."""
+    kinds = tuple(kinds)
+    for kind in kinds:
+        if kind not in REGION_KINDS:
+            raise ValueError(
+                f"unknown Markdown region {kind!r}; expected one of {', '.join(REGION_KINDS)}"
+            )
+    return kinds
+
+
+def segment(lines: Sequence[str], kinds: Iterable[str] = REGION_KINDS) -> list[MarkdownRegion]:
+    """Find the Markdown regions of a chunk in one pass over its lines.
+
+    This is a pragmatic subset of CommonMark/GFM tuned for scanning: inline code spans
+    end on their own line, an HTML comment without a closing ``-->`` is plain text, and
+    indented code needs a blank line (or the chunk start) before it and is not
+    recognised inside list items. Comments only hide the lines they span (fences
+    included) when ``"html_comment"`` is among the ``kinds`` to be skipped; otherwise
+    fences open and close wherever they appear, as they always have.
+    """
+    regions: list[MarkdownRegion] = []
+    # Comments are only opened where a "-->" follows on a later line or the same one.
+    last_close = -1
+    for index in range(len(lines) - 1, -1, -1):
+        if "-->" in lines[index]:
+            last_close = index
+            break
+
+    feed = segmenter(regions.append, kinds)
+    last = len(lines) - 1
+    for index, line in enumerate(lines):
+        feed.send((index, line, lines[index + 1] if index < last else None, index < last_close))
+    return regions
+
+
+def segmenter(
+    add: Callable[[MarkdownRegion], None], kinds: Iterable[str] = REGION_KINDS
+) -> Generator[None, tuple[int, str, str | None, bool], None]:
+    """`segment` as a primed coroutine that is sent one line at a time.
+
+    Send ``(index, line, next_line, closes_later)``, where ``next_line`` is None for the
+    last line and ``closes_later`` tells whether any later line contains ``-->``; the
+    regions of the line are passed to ``add``. For texts too long to split up front.
+    """
+    feed = _segment_lines(add, "html_comment" in kinds)
+    next(feed)
+    return feed
+
+
+def _segment_lines(
+    add: Callable[[MarkdownRegion], None], multiline_comments: bool
+) -> Generator[None, tuple[int, str, str | None, bool], None]:
+    fence = ""
+    in_comment = False
+    in_indented = False
+    in_list = False
+    in_table = False
+    previous_blank = True
+    while True:
+        index, line, next_line, closes_later = yield
+        if fence:
+            add(MarkdownRegion("fenced_code", index, 0, len(line)))
+            match = _FENCE.match(line) if fence[0] in line else None
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                fence = ""
+            previous_blank = False
+            continue
+
+        inline_from = 0
+        if in_comment:
+            close = line.find("-->")
+            if close == -1:
+                add(MarkdownRegion("html_comment", index, 0, len(line)))
+                continue
+            inline_from = close + 3
+            add(MarkdownRegion("html_comment", index, 0, inline_from))
+            in_comment = False
+        elif line and line[0] not in _BLOCK_STARTS and not line[0].isspace():
+            in_indented = in_list = False
+            if in_table or _starts_table(line, next_line):
+                in_table = True
+                add(MarkdownRegion("table", index, 0, len(line)))
+            previous_blank = False
+        else:
+            blank = not line.strip()
+            if blank:
+                in_table = False
+                previous_blank = True
+                continue
+            match = _FENCE.match(line)
+            if match:
+                fence = match.group(1)
+                in_indented = in_table = False
+                add(MarkdownRegion("fenced_code", index, 0, len(line)))
+                previous_blank = False
+                continue
+            if _INDENTED.match(line) and not in_list and (previous_blank or in_indented):
+                in_indented = True
+                add(MarkdownRegion("indented_code", index, 0, len(line)))
+                previous_blank = False
+                continue
+            in_indented = False
+            if _LIST_ITEM.match(line):
+                in_list = True
+            elif not _INDENTED.match(line):
+                in_list = False
+            if _BLOCKQUOTE.match(line):
+                in_table = False
+                add(MarkdownRegion("blockquote", index, 0, len(line)))
+            elif in_table or _starts_table(line, next_line):
+                in_table = True
+                add(MarkdownRegion("table", index, 0, len(line)))
+            previous_blank = False
+
+        if "`" in line or "<!--" in line:
+            in_comment = _inline_regions(
+                line, index, inline_from, multiline_comments and closes_later, add
+            )
+
+
+def skipped_spans(
+    regions: Iterable[MarkdownRegion], kinds: Iterable[str]
+) -> dict[int, list[tuple[int, int]]]:
+    """Map line index -> sorted, merged ``(start, end)`` columns of regions of ``kinds``."""
+    wanted = frozenset(kinds)
+    spans: dict[int, list[tuple[int, int]]] = {}
+    for region in regions:
+        if region.kind not in wanted:
+            continue
+        line_spans = spans.setdefault(region.line, [])
+        if line_spans and region.start <= line_spans[-1][1]:
+            if region.end > line_spans[-1][1]:
+                line_spans[-1] = (line_spans[-1][0], region.end)
+        else:
+            line_spans.append((region.start, region.end))
+    return spans
+
+
+def unskipped_parts(line: str, spans: list[tuple[int, int]]) -> list[str] | None:
+    """Return the parts of ``line`` outside ``spans``, or None if nothing is left."""
+    if spans[0][0] <= 0 and spans[0][1] >= len(line):
+        return None
+    parts: list[str] = []
+    kept_from = 0
+    for start, end in spans:
+        if start > kept_from:
+            parts.append(line[kept_from:start])
+        kept_from = end
+    if kept_from < len(line):
+        parts.append(line[kept_from:])
+    return parts
+
+
+def _starts_table(line: str, next_line: str | None) -> bool:
+    """Whether ``line`` is a table header row (followed by a delimiter row)."""
+    return (
+        "|" in line
+        and next_line is not None
+        and "|" in next_line
+        and _TABLE_DELIMITER.match(next_line) is not None
+    )
+
+
+def _inline_regions(
+    line: str,
+    index: int,
+    position: int,
+    can_span_lines: bool,
+    add: Callable[[MarkdownRegion], None],
+) -> bool:
+    """Add the code spans and comments of ``line`` from ``position``; True if a comment
+    is left open at the end of the line."""
+    while position < len(line):
+        tick = line.find("`", position)
+        comment = line.find("<!--", position)
+        if comment != -1 and (tick == -1 or comment < tick):
+            close = line.find("-->", comment + 4)
+            if close == -1:
+                if not can_span_lines:
+                    position = comment + 4
+                    continue
+                add(MarkdownRegion("html_comment", index, comment, len(line)))
+                return True
+            position = close + 3
+            add(MarkdownRegion("html_comment", index, comment, position))
+            continue
+        if tick == -1:
+            return False
+        opening = _BACKTICKS.match(line, tick)
+        assert opening is not None
+        run = opening.end() - tick
+        closing = _BACKTICKS.search(line, opening.end())
+        while closing is not None and closing.end() - closing.start() != run:
+            closing = _BACKTICKS.search(line, closing.end())
+        if closing is None:
+            position = opening.end()
+            continue
+        add(MarkdownRegion("inline_code", index, tick, closing.end()))
+        position = closing.end()
+    return False
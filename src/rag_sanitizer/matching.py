@@ -0,0 +1,443 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import cached_property
+from re import Pattern
+from typing import Any
+
+try:
+    import ahocorasick  # type: ignore[import-not-found, unused-ignore]
+except ImportError:  # pragma: no cover - optional accelerator
+    ahocorasick = None
+
+_GROUP_PREFIX = "_rs"
+
+# Literals shorter than this match almost every chunk, so such patterns are treated as
+# having no usable literal and are evaluated everywhere.
+MIN_LITERAL_LENGTH = 3
+
+# Below this many literals, repeated substring checks beat an automaton pass.
+_AUTOMATON_MIN_LITERALS = 16
+
+# Characters that `re.IGNORECASE` matches against an ASCII letter although `str.lower()`
+# does not map them onto it.
+_FOLD_TABLE = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s"})
+
+# Non-ASCII characters whose case fold contains an ASCII letter. Text without any of them
+# folds exactly like its ASCII-lowercased form, which vectorized pre-screens rely on.
+ASCII_FOLDING_CHARS = "\u0130\u0131\u017f\u212a"
+
+# Numbered backreferences and conditionals break once patterns are renumbered inside a
+# combined alternation, so those patterns are always evaluated on their own.
+_NUMBERED_REFERENCE = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]|\(\?\(")
+_BRACE_QUANTIFIER = re.compile(r"\{\d*(?:,\d*)?\}")
+
+# Lookarounds and absolute anchors see different context on a whole chunk than on a single
+# line, so literal-free patterns using them force line-by-line scanning.
+_CONTEXT_SENSITIVE = re.compile(r"\(\?<?[=!]|\\[AZ]")
+
+
+@dataclass(frozen=True)
+class MatcherIndex:
+    """What `PatternMatcher` derives from its patterns, stored in rule-pack artifacts.
+
+    ``standalone`` lists the patterns evaluated on their own instead of inside the
+    combined alternation; ``literals`` holds each pattern's required literal (see
+    `required_literal`), or None.
+    """
+
+    standalone: tuple[int, ...]
+    literals: tuple[str | None, ...]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"standalone": list(self.standalone), "literals": list(self.literals)}
+
+    @classmethod
+    def from_dict(cls, payload: dict[str, Any], pattern_count: int) -> MatcherIndex:
+        standalone = payload.get("standalone")
+        literals = payload.get("literals")
+        if not isinstance(standalone, list) or not all(
+            isinstance(index, int) and 0 <= index < pattern_count for index in standalone
+        ):
+            raise ValueError("index standalone must list pattern indices")
+        if (
+            not isinstance(literals, list)
+            or len(literals) != pattern_count
+            or not all(literal is None or isinstance(literal, str) for literal in literals)
+        ):
+            raise ValueError("index literals must hold one string or null per pattern")
+        return cls(tuple(standalone), tuple(literals))
+
+
+class PatternMatcher:
+    """Evaluate an ordered list of patterns with one combined regex pass per text.
+
+    Patterns that can be embedded in a single alternation are scanned together; a text
+    that does not match the alternation is known to match none of them. Only texts with a
+    hit fall back to per-pattern searches to report every matching pattern in order.
+
+    Given a precomputed ``index`` (from a rule-pack artifact) the patterns are not
+    analysed again, and the alternation is only compiled once it is first needed.
+    """
+
+    def __init__(self, patterns: Sequence[Pattern[str]], index: MatcherIndex | None = None) -> None:
+        self.patterns: tuple[Pattern[str], ...] = tuple(patterns)
+        self.all_indices: tuple[int, ...] = tuple(range(len(self.patterns)))
+        if index is None:
+            standalone = [
+                position
+                for position, pattern in enumerate(self.patterns)
+                if not _can_combine(pattern)
+            ]
+            try:
+                combined = self._compile_combined(standalone)
+            except re.error:
+                # e.g. two patterns defining the same named group.
+                standalone = list(range(len(self.patterns)))
+                combined = None
+            # Prime the cached property with the alternation compiled above.
+            self.__dict__["combined"] = combined
+            index = MatcherIndex(
+                tuple(standalone),
+                tuple(required_literal(pattern.pattern) for pattern in self.patterns),
+            )
+
+        self.index = index
+        self._standalone = index.standalone
+        self.prefilter = LiteralPrefilter(
+            [pattern.pattern for pattern in self.patterns], literals=index.literals
+        )
+        self._always_buffer_safe = all(
+            index not in self._standalone
+            and not _CONTEXT_SENSITIVE.search(self.patterns[index].pattern)
+            for index in self.prefilter.always
+        )
+
+    @cached_property
+    def combined(self) -> Pattern[str] | None:
+        """Alternation of every pattern not evaluated standalone, or None if there are none."""
+        return self._compile_combined(self._standalone)
+
+    def _compile_combined(self, standalone: Sequence[int]) -> Pattern[str] | None:
+        skipped = set(standalone)
+        combinable = [index for index in self.all_indices if index not in skipped]
+        if not combinable:
+            return None
+        return re.compile(
+            "|".join(
+                f"(?P<{_GROUP_PREFIX}{index}>{self.patterns[index].pattern})"
+                for index in combinable
+            ),
+            re.IGNORECASE,
+        )
+
+    @cached_property
+    def _always_buffer_pattern(self) -> Pattern[str] | None:
+        """Alternation of the literal-free patterns, compiled for multi-line buffers.
+
+        With `re.MULTILINE`, ``^``/``$`` match at line boundaries. A line matching one of
+        these patterns also yields a buffer match starting at or before that line (extra
+        matches may span newlines), so only the line holding each hit needs verifying.
+        """
+        if not self.prefilter.always:
+            return None
+        try:
+            return re.compile(
+                "|".join(f"(?:{self.patterns[index].pattern})" for index in self.prefilter.always),
+                re.IGNORECASE | re.MULTILINE,
+            )
+        except re.error:
+            # e.g. a pattern with global inline flags, which only work at the start.
+            return None
+
+    def candidates(self, text: str, folded: str | None = None) -> tuple[int, ...]:
+        """Return the indices of patterns that could match somewhere in ``text``.
+
+        ``folded`` is ``fold_text(text)`` when the caller already has it.
+        """
+        return self.prefilter.candidates(text, folded)
+
+    def candidate_lines(
+        self, text: str, folded: str | None = None
+    ) -> tuple[tuple[int, ...], list[int]] | None:
+        """Locate the lines of a "\\n"-separated buffer that may match, in one pass.
+
+        Returns the candidate pattern indices together with the sorted start offsets of
+        every line that contains a candidate's required literal (or, for literal-free
+        patterns, a buffer-wide regex hit). Lines not listed cannot match any pattern.
+        Returns None when offsets cannot be mapped back to ``text``, in which case the
+        caller must fall back to line-by-line evaluation.
+        """
+        if folded is None:
+            folded = fold_text(text)
+        if len(folded) != len(text):
+            return None
+        found = self.prefilter.found(folded)
+        candidates = self.prefilter.resolve(found)
+        if not candidates:
+            return candidates, []
+
+        starts: set[int] = set()
+        for literal_id in found:
+            literal = self.prefilter.literals[literal_id]
+            if "\n" in literal:
+                return None
+            position = folded.find(literal)
+            while position != -1:
+                starts.add(folded.rfind("\n", 0, position) + 1)
+                line_end = folded.find("\n", position)
+                if line_end == -1:
+                    break
+                position = folded.find(literal, line_end + 1)
+
+        if self.prefilter.always:
+            # Standalone patterns (such as those with global inline flags) cannot be
+            # joined into the buffer regex, so they need line-by-line evaluation.
+            if not self._always_buffer_safe:
+                return None
+            scan = self._always_buffer_pattern
+            if scan is None:
+                return None
+            position = 0
+            while True:
+                match = scan.search(text, position)
+                if match is None:
+                    break
+                starts.add(text.rfind("\n", 0, match.start()) + 1)
+                line_end = text.find("\n", match.start())
+                if line_end == -1:
+                    break
+                position = line_end + 1
+
+        # A start at len(text) is the empty remainder after a trailing newline, which
+        # str.splitlines() does not count as a line.
+        starts.discard(len(text))
+        return candidates, sorted(starts)
+
+    def search(self, text: str, candidates: Sequence[int] | None = None) -> list[int]:
+        """Return the indices of all patterns that match ``text``, in pattern order.
+
+        ``candidates`` restricts evaluation to patterns that survived the prefilter for
+        the surrounding chunk (see `candidates`); it must be sorted.
+        """
+        if candidates is None:
+            candidates = self.all_indices
+        if not candidates:
+            return []
+        if self.combined is None or 2 * len(candidates) < len(self.patterns):
+            # Few candidates left: individual searches are cheaper than the full alternation.
+            return [index for index in candidates if self.patterns[index].search(text)]
+
+        match = self.combined.search(text)
+        if match is None:
+            return [index for index in self._standalone if self.patterns[index].search(text)]
+
+        first = _group_index(match)
+        return [
+            index for index in candidates if index == first or self.patterns[index].search(text)
+        ]
+
+    def spans(
+        self, text: str, candidates: Sequence[int] | None = None
+    ) -> tuple[bool, list[tuple[int, int, int]]]:
+        """Find every match of the candidate patterns anywhere in ``text``.
+
+        Returns whether any pattern matched, together with the ``(start, end, index)`` of
+        each non-empty match, ordered by position. As in `search`, a miss of the combined
+        alternation rules out all combinable patterns with a single pass.
+        """
+        if candidates is None:
+            candidates = self.all_indices
+        if not candidates:
+            return False, []
+        if (
+            self.combined is not None
+            and 2 * len(candidates) >= len(self.patterns)
+            and self.combined.search(text) is None
+        ):
+            candidates = [index for index in candidates if index in self._standalone]
+        hit = False
+        spans: list[tuple[int, int, int]] = []
+        for index in candidates:
+            for match in self.patterns[index].finditer(text):
+                hit = True
+                if match.end() > match.start():
+                    spans.append((match.start(), match.end(), index))
+        spans.sort()
+        return hit, spans
+
+
+class LiteralPrefilter:
+    """Find which patterns can possibly match a text by looking for required literals.
+
+    Every pattern with an extractable literal (see `required_literal`) is only a candidate
+    when the case-folded text contains that literal. Patterns without one are always
+    candidates. Large literal sets are looked up with an Aho-Corasick automaton when
+    ``pyahocorasick`` is installed; otherwise each literal is a substring check.
+    """
+
+    def __init__(
+        self, patterns: Sequence[str], literals: Sequence[str | None] | None = None
+    ) -> None:
+        if literals is None:
+            literals = [required_literal(pattern) for pattern in patterns]
+        always: list[int] = []
+        by_literal: dict[str, list[int]] = {}
+        for index, literal in enumerate(literals):
+            if literal is None:
+                always.append(index)
+            else:
+                by_literal.setdefault(fold_text(literal), []).append(index)
+
+        self.always: tuple[int, ...] = tuple(always)
+        self.literals: tuple[str, ...] = tuple(by_literal)
+        self._owners: tuple[tuple[int, ...], ...] = tuple(
+            tuple(owners) for owners in by_literal.values()
+        )
+        self._automaton = None
+        if ahocorasick is not None and len(self.literals) >= _AUTOMATON_MIN_LITERALS:
+            automaton = ahocorasick.Automaton()
+            for literal_id, literal in enumerate(self.literals):
+                automaton.add_word(literal, literal_id)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def candidates(self, text: str, folded: str | None = None) -> tuple[int, ...]:
+        if not self.literals:
+            return self.always
+        return self.resolve(self.found(fold_text(text) if folded is None else folded))
+
+    def found(self, folded: str) -> set[int]:
+        """Return the ids of literals occurring in ``folded`` (see `fold_text`)."""
+        if self._automaton is not None:
+            return {literal_id for _, literal_id in self._automaton.iter(folded)}
+        return {literal_id for literal_id, literal in enumerate(self.literals) if literal in folded}
+
+    def resolve(self, found: set[int]) -> tuple[int, ...]:
+        """Map found literal ids to the sorted candidate pattern indices."""
+        if not found:
+            return self.always
+        indices = set(self.always)
+        for literal_id in found:
+            indices.update(self._owners[literal_id])
+        return tuple(sorted(indices))
+
+
+def fold_text(text: str) -> str:
+    """Case-fold ``text`` so that literal containment agrees with `re.IGNORECASE`."""
+    if text.isascii():
+        return text.lower()
+    # translate() copies the whole text, so only pay for it when a folded character is there.
+    if "\u0130" in text or "\u0131" in text or "\u017f" in text:
+        return text.translate(_FOLD_TABLE).lower()
+    return text.lower()
+
+
+def required_literal(pattern: str) -> str | None:
+    """Return the longest literal that every match of ``pattern`` must contain.
+
+    Only top-level, unquantified runs of ASCII characters are considered; anything the
+    scanner does not fully understand (groups, classes, escapes, inline flags) ends the
+    current run, so the result is conservative. Returns None when no run reaches
+    `MIN_LITERAL_LENGTH` or when the pattern is a top-level alternation.
+    """
+    if pattern.startswith("(?") and not pattern.startswith(("(?:", "(?P", "(?=", "(?!", "(?<")):
+        return None  # global inline flags such as "(?x)" change how the pattern reads
+
+    runs: list[str] = []
+    run: list[str] = []
+    depth = 0
+    index = 0
+    length = len(pattern)
+
+    def flush() -> None:
+        if run:
+            runs.append("".join(run))
+            run.clear()
+
+    while index < length:
+        char = pattern[index]
+        if char == "\\":
+            escaped = pattern[index + 1 : index + 2]
+            index += 2
+            if depth == 0 and escaped and escaped.isascii() and not escaped.isalnum():
+                run.append(escaped)
+                continue
+            flush()
+            continue
+        if char == "[":
+            flush()
+            index = _skip_class(pattern, index)
+            continue
+        if char == "(":
+            flush()
+            depth += 1
+        elif char == ")":
+            depth = max(depth - 1, 0)
+        elif char == "|":
+            if depth == 0:
+                return None
+        elif char in "?*{":
+            # The previous atom may be optional; if it was part of the run, drop it.
+            if depth == 0 and run:
+                run.pop()
+            flush()
+            if char == "{":
+                quantifier = _BRACE_QUANTIFIER.match(pattern, index)
+                if quantifier is not None:
+                    index = quantifier.end()
+                    continue
+        elif char == "+":
+            flush()
+        elif char in ".^$":
+            flush()
+        elif depth == 0 and char.isascii():
+            run.append(char)
+        else:
+            flush()
+        index += 1
+    flush()
+
+    best = max(runs, key=len, default="")
+    if len(best) < MIN_LITERAL_LENGTH:
+        return None
+    return best
+
+
+def _can_combine(pattern: Pattern[str]) -> bool:
+    if pattern.flags & ~(re.IGNORECASE | re.UNICODE):
+        return False
+    if pattern.groups and _NUMBERED_REFERENCE.search(pattern.pattern):
+        return False
+    try:
+        re.compile(f"(?P<{_GROUP_PREFIX}0>{pattern.pattern})", re.IGNORECASE)
+    except re.error:
+        # Global inline flags such as "(?x)" are only valid at the start of a pattern.
+        return False
+    return True
+
+
+def _skip_class(pattern: str, index: int) -> int:
+    """Return the index just past the character class starting at ``index``."""
+    index += 1
+    if pattern[index : index + 1] == "^":
+        index += 1
+    if pattern[index : index + 1] == "]":
+        index += 1
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            index += 2
+            continue
+        index += 1
+        if char == "]":
+            break
+    return index
+
+
+def _group_index(match: re.Match[str]) -> int:
+    name = match.lastgroup
+    assert name is not None and name.startswith(_GROUP_PREFIX)
+    return int(name[len(_GROUP_PREFIX) :])
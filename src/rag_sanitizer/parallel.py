@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import shutil
+import tempfile
+import warnings
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+from typing import IO, TYPE_CHECKING
+
+from rag_sanitizer.cache import ResultCache, SqliteResultStore
+from rag_sanitizer.codec import iter_jsonl_lines
+from rag_sanitizer.compression import compression_for_path, open_input, open_output
+from rag_sanitizer.profiling import Profiler
+from rag_sanitizer.sanitizer import (
+    Chunk,
+    RulePack,
+    SanitizedChunk,
+    Sanitizer,
+    UnsafePatternWarning,
+    default_rule_pack,
+    load_rule_pack,
+    parse_chunk,
+    with_secret_mask,
+)
+from rag_sanitizer.summary import ChunkStats, RunSummary
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+
+@dataclass(frozen=True)
+class LineResult:
+    """Outcome of sanitizing one JSONL line: serialized output, or a parse error."""
+
+    line_number: int
+    output: bytes | None
+    error: str | None
+    flags: list[str]
+    risk_score: float
+    cache_hit: bool | None = None
+    stats: ChunkStats | None = None
+
+
+@dataclass
+class FileResult:
+    """Outcome of sanitizing one input file of a multi-file run.
+
+    ``error`` is the ``(line_number, message)`` of the invalid line that stopped the file
+    when invalid lines are not skipped; skipped ones are listed in ``skipped``.
+    """
+
+    path: Path
+    summary: RunSummary
+    skipped: list[tuple[int, str]] = field(default_factory=list)
+    error: tuple[int, str] | None = None
+    profile: Profiler | None = None
+
+
+@dataclass(frozen=True)
+class LineOptions:
+    require_citations: bool = True
+    markdown_aware: bool = False
+    cache_size: int = 0
+    cache_db: Path | None = None
+    scan_budget: float | None = None
+    mask_secrets: bool = False
+
+    def sanitizer(self, rule_pack: RulePack | None) -> Sanitizer:
+        if self.mask_secrets:
+            rule_pack = with_secret_mask(rule_pack or default_rule_pack())
+        cache = None
+        if self.cache_size > 0 or self.cache_db is not None:
+            store = SqliteResultStore(self.cache_db) if self.cache_db is not None else None
+            cache = ResultCache(max_entries=self.cache_size, store=store)
+        return Sanitizer(
+            require_citations=self.require_citations,
+            rule_pack=rule_pack,
+            markdown_aware=self.markdown_aware,
+            cache=cache,
+            scan_budget=self.scan_budget,
+        )
+
+
+def sanitize_line(line_number: int, line: str | bytes, sanitizer: Sanitizer) -> LineResult:
+    profiler = sanitizer.profiler
+    if profiler is not None:
+        started = perf_counter()
+    try:
+        chunk = parse_chunk(line)
+    except Exception as exc:  # noqa: BLE001 - reported per line by the caller
+        return LineResult(line_number, None, str(exc), [], 0.0)
+    if profiler is not None:
+        profiler.add("parse", started)
+    cache = sanitizer.cache
+    hits_before = cache.hits if cache is not None else 0
+    sanitized = sanitizer.sanitize(chunk)
+    if profiler is not None:
+        started = perf_counter()
+    output = sanitized.to_json_bytes()
+    if profiler is not None:
+        profiler.add("serialize", started)
+    return LineResult(
+        line_number,
+        output,
+        None,
+        sanitized.flags,
+        sanitized.risk_score,
+        cache_hit=None if cache is None else cache.hits > hits_before,
+        stats=sanitized.chunk_stats(len(chunk.text)),
+    )
+
+
+def iter_line_results(
+    numbered_lines: Iterable[tuple[int, str | bytes]],
+    *,
+    rule_pack: RulePack | None,
+    rules_path: Path | None,
+    options: LineOptions,
+    workers: int = 1,
+    batch_size: int = 256,
+    profiler: Profiler | None = None,
+) -> Iterator[LineResult]:
+    """Sanitize ``(line_number, line)`` pairs, yielding results in input order.
+
+    Serial runs use ``rule_pack`` directly. With ``workers > 1`` batches of lines are
+    handed to a process pool whose workers each load ``rules_path`` (or the default
+    rules) once at startup. At most ``2 * workers`` batches are in flight, so memory
+    stays bounded however long the input is. When ``profiler`` is given, every worker's
+    per-batch profile is merged into it.
+    """
+    if workers <= 1:
+        sanitizer = options.sanitizer(rule_pack)
+        sanitizer.profiler = profiler
+        try:
+            for line_number, line in numbered_lines:
+                yield sanitize_line(line_number, line, sanitizer)
+        finally:
+            if sanitizer.cache is not None:
+                sanitizer.cache.close()
+        return
+
+    # Importing the process pool pulls in multiprocessing, which serial runs never need.
+    from concurrent.futures import ProcessPoolExecutor
+
+    iterator = iter(numbered_lines)
+    pending: deque[Future[tuple[list[LineResult], Profiler | None]]] = deque()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(rules_path, options, profiler is not None),
+    ) as pool:
+        try:
+            while True:
+                while len(pending) < 2 * workers:
+                    batch = list(islice(iterator, batch_size))
+                    if not batch:
+                        break
+                    pending.append(pool.submit(_sanitize_batch, batch))
+                if not pending:
+                    return
+                results, batch_profile = pending.popleft().result()
+                if profiler is not None and batch_profile is not None:
+                    profiler.merge(batch_profile)
+                yield from results
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def sanitize_file(
+    path: Path,
+    outfile: IO[bytes],
+    sanitizer: Sanitizer,
+    summary: RunSummary,
+    *,
+    skip_invalid: bool,
+) -> FileResult:
+    """Sanitize the JSONL file ``path`` (possibly compressed) into ``outfile``."""
+    result = FileResult(path, summary)
+    with path.open("rb") as source, open_input(source, path) as lines:
+        for line_number, line in iter_jsonl_lines(lines):
+            line_result = sanitize_line(line_number, line, sanitizer)
+            if line_result.output is None:
+                assert line_result.error is not None
+                if not skip_invalid:
+                    result.error = (line_number, line_result.error)
+                    break
+                result.skipped.append((line_number, line_result.error))
+                continue
+            outfile.write(line_result.output)
+            outfile.write(b"\n")
+            summary.record(line_result.flags, line_result.risk_score, line_result.stats)
+            if line_result.cache_hit is not None:
+                summary.record_cache(line_result.cache_hit)
+    return result
+
+
+def iter_file_results(
+    paths: Sequence[Path],
+    *,
+    outputs: Sequence[Path] | None,
+    outfile: IO[bytes] | None,
+    rule_pack: RulePack | None,
+    rules_path: Path | None,
+    options: LineOptions,
+    summary: RunSummary,
+    skip_invalid: bool,
+    workers: int = 1,
+    profiler: Profiler | None = None,
+) -> Iterator[FileResult]:
+    """Sanitize whole files, yielding one `FileResult` per file in input order.
+
+    Each file gets its own output path from ``outputs`` (compressed by extension), or,
+    when ``outputs`` is None, all files are written to ``outfile`` one after another.
+    Every result carries a `RunSummary.fresh` copy of ``summary`` holding that file's
+    counters; merging them is left to the caller.
+
+    With ``workers > 1`` whole files are handed to a process pool set up like
+    `iter_line_results`, at most ``2 * workers`` at a time. Workers writing to
+    ``outfile`` write to temporary part files, which are appended to it in order.
+    """
+    if workers <= 1:
+        sanitizer = options.sanitizer(rule_pack)
+        sanitizer.profiler = profiler
+        try:
+            for index, path in enumerate(paths):
+                if outputs is None:
+                    assert outfile is not None
+                    yield sanitize_file(
+                        path, outfile, sanitizer, summary.fresh(), skip_invalid=skip_invalid
+                    )
+                    continue
+                with _open_file_output(outputs[index]) as output:
+                    result = sanitize_file(
+                        path, output, sanitizer, summary.fresh(), skip_invalid=skip_invalid
+                    )
+                yield result
+        finally:
+            if sanitizer.cache is not None:
+                sanitizer.cache.close()
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    pending: deque[tuple[Path, Future[FileResult]]] = deque()
+    with (
+        tempfile.TemporaryDirectory(prefix="rag-sanitize-") as parts_dir,
+        ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(rules_path, options, profiler is not None),
+        ) as pool,
+    ):
+        try:
+            for index, path in enumerate(paths):
+                target = outputs[index] if outputs is not None else Path(parts_dir) / str(index)
+                future = pool.submit(
+                    _sanitize_file_in_worker, path, target, summary.fresh(), skip_invalid
+                )
+                pending.append((target, future))
+                if len(pending) >= 2 * workers:
+                    yield _collect_file(*pending.popleft(), outputs is None, outfile, profiler)
+            while pending:
+                yield _collect_file(*pending.popleft(), outputs is None, outfile, profiler)
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def _collect_file(
+    target: Path,
+    future: Future[FileResult],
+    is_part: bool,
+    outfile: IO[bytes] | None,
+    profiler: Profiler | None,
+) -> FileResult:
+    result = future.result()
+    if is_part:
+        assert outfile is not None
+        with target.open("rb") as part:
+            shutil.copyfileobj(part, outfile)
+        target.unlink()
+    if profiler is not None and result.profile is not None:
+        profiler.merge(result.profile)
+        result.profile = None
+    return result
+
+
+@contextmanager
+def _open_file_output(path: Path) -> Iterator[IO[bytes]]:
+    """Open ``path`` for a file's output, compressing it as its extension says."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as target, open_output(target, compression_for_path(path)) as output:
+        yield output
+
+
+_worker_sanitizer: Sanitizer | None = None
+_worker_profile = False
+
+
+def init_worker(rules_path: Path | None, options: LineOptions, profile: bool = False) -> None:
+    """Process-pool initializer: build the worker's `Sanitizer` once."""
+    global _worker_sanitizer, _worker_profile
+    # The parent process loaded the same rules and already reported their risky patterns.
+    warnings.simplefilter("ignore", UnsafePatternWarning)
+    rule_pack = load_rule_pack(rules_path) if rules_path is not None else None
+    _worker_sanitizer = options.sanitizer(rule_pack)
+    _worker_profile = profile
+
+
+def _sanitize_batch(
+    batch: list[tuple[int, str | bytes]],
+) -> tuple[list[LineResult], Profiler | None]:
+    assert _worker_sanitizer is not None
+    if _worker_profile:
+        _worker_sanitizer.profiler = Profiler()
+    results = [sanitize_line(line_number, line, _worker_sanitizer) for line_number, line in batch]
+    if _worker_sanitizer.cache is not None:
+        # Pool workers are not shut down gracefully, so persist each batch as it completes.
+        _worker_sanitizer.cache.flush()
+    return results, _worker_sanitizer.profiler
+
+
+def _sanitize_file_in_worker(
+    path: Path, output: Path, summary: RunSummary, skip_invalid: bool
+) -> FileResult:
+    assert _worker_sanitizer is not None
+    _worker_sanitizer.profiler = Profiler() if _worker_profile else None
+    with _open_file_output(output) as outfile:
+        result = sanitize_file(path, outfile, _worker_sanitizer, summary, skip_invalid=skip_invalid)
+    if _worker_sanitizer.cache is not None:
+        _worker_sanitizer.cache.flush()
+    result.profile = _worker_sanitizer.profiler
+    return result
+
+
+def sanitize_chunks_in_worker(chunks: list[Chunk]) -> list[SanitizedChunk]:
+    """Sanitize parsed chunks inside a pool worker set up by `init_worker`."""
+    assert _worker_sanitizer is not None
+    return [_worker_sanitizer.sanitize(chunk) for chunk in chunks]
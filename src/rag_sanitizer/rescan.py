@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from rag_sanitizer.codec import loads
+from rag_sanitizer.sanitizer import (
+    Chunk,
+    PatternHits,
+    RulePack,
+    SanitizedChunk,
+    find_pattern_hits,
+    result_from_scan,
+    rule_pack_from_dict,
+    scan_from_hits,
+)
+
+# Identifies sidecar index files; bump the version when the record layout changes.
+INDEX_FORMAT = "rag-sanitizer-index"
+INDEX_VERSION = 1
+
+# Hits of one kind as stored in an index record, keyed by pattern string so that they
+# survive reordering, additions and removals in the rule pack.
+_StoredHits = dict[str, list[Any]]
+
+
+@dataclass(frozen=True)
+class RuleDiff:
+    """What changed between the rules an index was written with and the current ones."""
+
+    added_instruction: tuple[str, ...]
+    removed_instruction: tuple[str, ...]
+    added_secret: tuple[str, ...]
+    removed_secret: tuple[str, ...]
+    weights_changed: bool
+    secret_mask_changed: bool
+    markdown_skip_changed: bool
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            key: list(value) if isinstance(value, tuple) else value
+            for key, value in asdict(self).items()
+        }
+
+
+def diff_rules(old: dict[str, Any], new: RulePack) -> RuleDiff:
+    """Diff a rules-file object (as stored in an index header) against ``new``."""
+    old_instruction = _string_list(old, "instruction_patterns")
+    old_secret = _string_list(old, "secret_patterns")
+    return RuleDiff(
+        added_instruction=_missing(new.instruction_pattern_strings, old_instruction),
+        removed_instruction=_missing(old_instruction, new.instruction_pattern_strings),
+        added_secret=_missing(new.secret_pattern_strings, old_secret),
+        removed_secret=_missing(old_secret, new.secret_pattern_strings),
+        weights_changed=old.get("weights") != new.weights,
+        secret_mask_changed=old.get("secret_mask") != new.secret_mask,
+        markdown_skip_changed=old.get("markdown_skip") != list(new.markdown_skip),
+    )
+
+
+def text_digest(text: str) -> str:
+    """The content hash an index record keys its hits by."""
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def index_header(rule_pack: RulePack, *, markdown_aware: bool) -> dict[str, Any]:
+    return {
+        "format": INDEX_FORMAT,
+        "version": INDEX_VERSION,
+        "fingerprint": rule_pack.fingerprint,
+        "markdown": markdown_aware,
+        "rules": rule_pack.to_dict(),
+    }
+
+
+@contextmanager
+def open_index(path: Path) -> Iterator[tuple[dict[str, Any], Iterator[dict[str, Any]]]]:
+    """Yield an index file's header and a lazy iterator over its chunk records.
+
+    Raises ValueError for files that are not an index of this version.
+    """
+    with path.open("r", encoding="utf-8") as handle:
+        try:
+            header = json.loads(handle.readline())
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get("format") != INDEX_FORMAT:
+            raise ValueError(f"{path} is not a rag-sanitizer index")
+        if header.get("version") != INDEX_VERSION:
+            raise ValueError(
+                f"{path} is index version {header.get('version')}, expected {INDEX_VERSION}"
+            )
+        if not isinstance(header.get("rules"), dict):
+            raise ValueError(f"{path} has no rules in its header")
+        yield header, (loads(line) for line in handle)
+
+
+class IndexWriter:
+    """Write an index file, replacing ``path`` only once the run has finished.
+
+    Records go to a temporary file next to ``path`` that is moved into place on a clean
+    exit and removed on an error, so an index can be rescanned into itself.
+    """
+
+    def __init__(self, path: Path, header: dict[str, Any]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._temporary = path.with_name(path.name + ".tmp")
+        self._handle = self._temporary.open("w", encoding="utf-8")
+        self._write(header)
+
+    def write(self, record: dict[str, Any]) -> None:
+        self._write(record)
+
+    def __enter__(self) -> IndexWriter:
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, *_: object) -> None:
+        self._handle.close()
+        if exc_type is None:
+            os.replace(self._temporary, self.path)
+        else:
+            self._temporary.unlink(missing_ok=True)
+
+    def _write(self, payload: dict[str, Any]) -> None:
+        self._handle.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+
+class Rescanner:
+    """Sanitize chunks through per-pattern hits, reusing the hits of an earlier index.
+
+    Without ``previous`` (an index header) every chunk is matched in full. With it,
+    chunks whose text hash equals their record's take the stored hits of patterns the
+    rule pack still has, drop those of removed patterns, and are matched against the
+    added patterns only; weight, mask and removal-only changes need no matching at all.
+    Either way the result equals `sanitize_chunk`, and `sanitize` also returns the
+    chunk's record for a new index.
+    """
+
+    def __init__(
+        self,
+        rule_pack: RulePack,
+        *,
+        markdown_aware: bool = False,
+        require_citations: bool = True,
+        previous: dict[str, Any] | None = None,
+    ) -> None:
+        self.rule_pack = rule_pack
+        self.markdown_aware = markdown_aware
+        self.require_citations = require_citations
+        self.diff: RuleDiff | None = None
+        self.reused = 0
+        self.scanned = 0
+        self._added: RulePack | None = None
+        self._instruction_indices = _positions(rule_pack.instruction_pattern_strings)
+        self._secret_indices = _positions(rule_pack.secret_pattern_strings)
+        if previous is None:
+            return
+        if previous.get("markdown") != markdown_aware:
+            state = "with" if previous.get("markdown") else "without"
+            raise ValueError(f"the index was written {state} Markdown-aware scanning")
+        self.diff = diff_rules(previous["rules"], rule_pack)
+        if markdown_aware and self.diff.markdown_skip_changed:
+            raise ValueError("markdown_skip changed since the index was written")
+        if self.diff.added_instruction or self.diff.added_secret:
+            self._added = rule_pack_from_dict(
+                {
+                    "instruction_patterns": list(self.diff.added_instruction),
+                    "secret_patterns": list(self.diff.added_secret),
+                    "markdown_skip": list(rule_pack.markdown_skip),
+                }
+            )
+
+    def sanitize(
+        self, chunk: Chunk, record: dict[str, Any] | None = None
+    ) -> tuple[SanitizedChunk, dict[str, Any]]:
+        """Sanitize ``chunk`` given its record in the previous index (if any)."""
+        if record is not None and not isinstance(record, dict):
+            raise ValueError("malformed index record")
+        rules = self.rule_pack
+        text = chunk.text
+        digest = text_digest(text)
+        if self.diff is None or record is None or record.get("hash") != digest:
+            instruction, secrets = _stored_hits(self._find(text, rules), rules)
+            self.scanned += 1
+        else:
+            instruction = _kept(record, "instruction", self._instruction_indices)
+            secrets = _kept(record, "secrets", self._secret_indices)
+            if self._added is not None:
+                added_instruction, added_secrets = _stored_hits(
+                    self._find(text, self._added), self._added
+                )
+                instruction.update(added_instruction)
+                secrets.update(added_secrets)
+            self.reused += 1
+        hits = PatternHits(
+            instruction=tuple(
+                sorted(
+                    (line_number, index)
+                    for pattern, lines in instruction.items()
+                    for index in self._instruction_indices[pattern]
+                    for line_number in lines
+                )
+            ),
+            secrets={
+                index: tuple((start, end) for start, end in spans)
+                for pattern, spans in secrets.items()
+                for index in self._secret_indices[pattern]
+            },
+        )
+        scan = scan_from_hits(text, rules, hits)
+        result = result_from_scan(chunk, scan, rules, require_citations=self.require_citations)
+        # Clean chunks, the vast majority, are stored as just their hash.
+        new_record: dict[str, Any] = {"hash": digest}
+        if instruction:
+            new_record["instruction"] = instruction
+        if secrets:
+            new_record["secrets"] = secrets
+        return result, new_record
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "reused": self.reused,
+            "scanned": self.scanned,
+            "diff": None if self.diff is None else self.diff.to_dict(),
+        }
+
+    def _find(self, text: str, rules: RulePack) -> PatternHits:
+        return find_pattern_hits(text, rules, markdown_aware=self.markdown_aware)
+
+
+def _stored_hits(hits: PatternHits, rules: RulePack) -> tuple[_StoredHits, _StoredHits]:
+    """``hits`` keyed by pattern string: instruction line numbers and secret spans."""
+    instruction: _StoredHits = {}
+    for line_number, index in hits.instruction:
+        lines = instruction.setdefault(rules.instruction_pattern_strings[index], [])
+        if not lines or lines[-1] != line_number:  # a pattern listed twice hits twice
+            lines.append(line_number)
+    secrets: _StoredHits = {
+        rules.secret_pattern_strings[index]: [list(span) for span in spans]
+        for index, spans in hits.secrets.items()
+    }
+    return instruction, secrets
+
+
+def _kept(record: dict[str, Any], key: str, patterns: dict[str, list[int]]) -> _StoredHits:
+    """The hits in ``record[key]`` of patterns the rule pack still has."""
+    stored = record.get(key, {})
+    if not isinstance(stored, dict):
+        raise ValueError("malformed index record")
+    return {pattern: value for pattern, value in stored.items() if pattern in patterns}
+
+
+def _positions(patterns: list[str]) -> dict[str, list[int]]:
+    positions: dict[str, list[int]] = {}
+    for index, pattern in enumerate(patterns):
+        positions.setdefault(pattern, []).append(index)
+    return positions
+
+
+def _missing(patterns: list[str], other: list[str]) -> tuple[str, ...]:
+    """``patterns`` that are not in ``other``, once each, in order."""
+    present = set(other)
+    return tuple(pattern for pattern in dict.fromkeys(patterns) if pattern not in present)
+
+
+def _string_list(rules: dict[str, Any], key: str) -> list[str]:
+    value = rules.get(key)
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"index rules {key} must be a list of strings")
+    return value
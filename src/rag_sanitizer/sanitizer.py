@@ -1,12 +1,36 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import math
 import re
-from collections.abc import Iterable
-from dataclasses import dataclass
+import sys
+import threading
+import warnings
+from array import array
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field, replace
+from json.encoder import encode_basestring_ascii
 from pathlib import Path
 from re import Pattern
-from typing import Any
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
+
+from rag_sanitizer import __version__
+from rag_sanitizer.codec import dumps_ascii, loads
+from rag_sanitizer.markdown import (
+    DEFAULT_SKIP_REGIONS,
+    check_region_kinds,
+    segment,
+    skipped_spans,
+    unskipped_parts,
+)
+from rag_sanitizer.matching import MatcherIndex, PatternMatcher, fold_text
+from rag_sanitizer.summary import ChunkStats, RunSummary
+
+if TYPE_CHECKING:
+    from rag_sanitizer.cache import ResultCache
+    from rag_sanitizer.profiling import Profiler
 
 DEFAULT_RULES: dict[str, Any] = {
     "instruction_patterns": [
@@ -29,9 +53,48 @@ DEFAULT_RULES: dict[str, Any] = {
         "tool_instruction": 0.2,
         "secret_like": 0.2,
         "missing_citation": 0.2,
+        "scan_timeout": 0.5,
     },
+    "markdown_skip": list(DEFAULT_SKIP_REGIONS),
+    "secret_mask": None,
 }
 
+# What `--mask-secrets` puts in place of a secret when the rule pack names no mask.
+DEFAULT_SECRET_MASK = "[REDACTED]"
+
+# Identifies files written by `compile_rule_pack`; bump the version when their layout or
+# the meaning of the stored matcher indexes changes.
+RULE_ARTIFACT_FORMAT = "rag-sanitizer-rules"
+RULE_ARTIFACT_VERSION = 1
+
+
+class UnsafePatternWarning(UserWarning):
+    """A rule pattern that can backtrack exponentially, loaded without ``strict_patterns``."""
+
+
+# Every flag a result can carry, in output order. Results store them as a bitmask over
+# this tuple; bit i stands for FLAGS[i].
+FLAGS = ("instruction_like", "tool_instruction", "secret_like", "scan_timeout", "missing_citation")
+_INSTRUCTION_LIKE, _TOOL_INSTRUCTION, _SECRET_LIKE, _SCAN_TIMEOUT, _MISSING_CITATION = (
+    1 << position for position in range(len(FLAGS))
+)
+_FLAG_NAMES = tuple(
+    tuple(name for position, name in enumerate(FLAGS) if bits >> position & 1)
+    for bits in range(1 << len(FLAGS))
+)
+_FLAGS_JSON = tuple(dumps_ascii(list(names)) for names in _FLAG_NAMES)
+
+_EMPTY_TEXT_JSON = ', "sanitized_text": ""'
+
+# Redaction arrays of results without redactions; never mutated.
+_NO_REDACTIONS: Sequence[int] = ()
+
+# Parallel (line number, instruction-pattern index) arrays collected by a scan.
+_Redactions = tuple["array[int]", "array[int]"]
+
+# Characters str.splitlines() breaks on; masking keeps them so line numbers stay valid.
+_LINE_BREAKS = frozenset("\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029")
+
 
 @dataclass(frozen=True)
 class Chunk:
@@ -41,29 +104,102 @@ class Chunk:
     citations: list[str]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SanitizedChunk:
+    """A sanitize result, stored compactly for large in-memory batches.
+
+    Flags are a bitmask over `FLAGS` and redactions are parallel arrays with one entry
+    per (line number, instruction-pattern index) match, grouped by line. Secret matches
+    are flat ``(start, end, secret-pattern index)`` triples of character offsets into
+    the input text. ``flags``, ``redactions`` and ``secret_spans`` rebuild the usual
+    lists on access, and `to_json` writes them straight from the compact form; the
+    ``*pattern_names`` fields are the rule pack's shared pattern lists.
+    """
+
     chunk_id: str
     sanitized_text: str
     risk_score: float
-    flags: list[str]
     source: str | None
     citations: list[str]
     citation_ok: bool
-    redactions: list[dict[str, Any]]
+    flag_bits: int
+    redaction_lines: Sequence[int]
+    redaction_patterns: Sequence[int]
+    secret_offsets: Sequence[int]
+    pattern_names: Sequence[str] = field(repr=False, compare=False)
+    secret_pattern_names: Sequence[str] = field(repr=False, compare=False)
+
+    @property
+    def flags(self) -> list[str]:
+        return list(_FLAG_NAMES[self.flag_bits])
+
+    @property
+    def redactions(self) -> list[dict[str, Any]]:
+        return _redaction_dicts(self.redaction_lines, self.redaction_patterns, self.pattern_names)
+
+    @property
+    def secret_spans(self) -> list[dict[str, Any]]:
+        return _secret_span_dicts(self.secret_offsets, self.secret_pattern_names)
 
     def to_json(self) -> str:
-        payload = {
-            "id": self.chunk_id,
-            "sanitized_text": self.sanitized_text,
-            "risk_score": self.risk_score,
-            "flags": self.flags,
-            "source": self.source,
-            "citations": self.citations,
-            "citation_ok": self.citation_ok,
-            "redactions": self.redactions,
-        }
-        return json.dumps(payload, ensure_ascii=True)
+        # Same bytes as `dumps_ascii` of the equivalent dict, without building it.
+        source = self.source
+        if source is None:
+            source_json = "null"
+        elif type(source) is str:
+            source_json = encode_basestring_ascii(source)
+        else:
+            source_json = dumps_ascii(source)
+        risk_score = self.risk_score
+        risk_json = repr(risk_score) if math.isfinite(risk_score) else dumps_ascii(risk_score)
+        return "".join(
+            (
+                '{"id": ',
+                encode_basestring_ascii(self.chunk_id),
+                ', "sanitized_text": ',
+                encode_basestring_ascii(self.sanitized_text),
+                ', "risk_score": ',
+                risk_json,
+                ', "flags": ',
+                _FLAGS_JSON[self.flag_bits],
+                ', "source": ',
+                source_json,
+                ', "citations": [',
+                ", ".join(map(encode_basestring_ascii, self.citations)),
+                '], "citation_ok": ',
+                "true" if self.citation_ok else "false",
+                ', "redactions": ',
+                _redactions_json(self.redaction_lines, self.redaction_patterns, self.pattern_names),
+                ', "secret_spans": ',
+                _secret_spans_json(self.secret_offsets, self.secret_pattern_names),
+                "}",
+            )
+        )
+
+    def to_json_bytes(self) -> bytes:
+        """`to_json` as bytes, for writing to binary streams."""
+        return self.to_json().encode("ascii")
+
+    def to_json_parts(self) -> tuple[str, str]:
+        """`to_json` split around the ``sanitized_text`` string, which is left out.
+
+        Lets a sanitized text that is not held in memory be written between the two.
+        """
+        # Quotes inside the id are escaped, so the first occurrence is the field itself.
+        head, _, tail = replace(self, sanitized_text="").to_json().partition(_EMPTY_TEXT_JSON)
+        return head + ', "sanitized_text": ', tail
+
+    def chunk_stats(self, text_length: int) -> ChunkStats:
+        """The `ChunkStats` of this result, for an input text of ``text_length`` characters."""
+        source = self.source
+        return ChunkStats(
+            text_length=text_length,
+            source=source if source is None or type(source) is str else dumps_ascii(source),
+            instruction_hits=tuple(self.pattern_names[index] for index in self.redaction_patterns),
+            secret_hits=tuple(
+                self.secret_pattern_names[index] for index in self.secret_offsets[2::3]
+            ),
+        )
 
 
 @dataclass(frozen=True)
@@ -73,10 +209,158 @@ class RulePack:
     secret_patterns: list[Pattern[str]]
     secret_pattern_strings: list[str]
     weights: dict[str, float]
+    # Markdown regions (see `rag_sanitizer.markdown.REGION_KINDS`) that markdown-aware
+    # scans leave unmatched.
+    markdown_skip: tuple[str, ...] = DEFAULT_SKIP_REGIONS
+    # Replacement for matched secrets in the sanitized text; None only reports them.
+    secret_mask: str | None = None
+    # Matcher indexes read from a rule-pack artifact; derived from the patterns if None.
+    instruction_index: MatcherIndex | None = field(default=None, repr=False, compare=False)
+    secret_index: MatcherIndex | None = field(default=None, repr=False, compare=False)
+    instruction_matcher: PatternMatcher = field(init=False, repr=False, compare=False)
+    secret_matcher: PatternMatcher = field(init=False, repr=False, compare=False)
+    fingerprint: str = field(init=False, repr=False, compare=False)
+    # Risk score for every flag bitmask, so scoring a result is one lookup.
+    risk_by_flags: tuple[float, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(
+            self,
+            "instruction_matcher",
+            PatternMatcher(self.instruction_patterns, self.instruction_index),
+        )
+        object.__setattr__(
+            self, "secret_matcher", PatternMatcher(self.secret_patterns, self.secret_index)
+        )
+        object.__setattr__(
+            self,
+            "risk_by_flags",
+            tuple(_risk_score(names, self.weights) for names in _FLAG_NAMES),
+        )
+        canonical = json.dumps(self.to_dict(), sort_keys=True)
+        object.__setattr__(
+            self, "fingerprint", hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """The rules as a rules-file object; `rule_pack_from_dict` reads it back."""
+        return {
+            "instruction_patterns": self.instruction_pattern_strings,
+            "secret_patterns": self.secret_pattern_strings,
+            "weights": self.weights,
+            "markdown_skip": list(self.markdown_skip),
+            "secret_mask": self.secret_mask,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class TextScan:
+    """The part of a sanitize result that depends only on the chunk text and rules.
+
+    Stored in the same compact form as `SanitizedChunk`.
+    """
+
+    sanitized_text: str
+    flag_bits: int
+    redaction_lines: Sequence[int]
+    redaction_patterns: Sequence[int]
+    secret_offsets: Sequence[int]
+    pattern_names: Sequence[str] = field(repr=False, compare=False)
+    secret_pattern_names: Sequence[str] = field(repr=False, compare=False)
+
+    @property
+    def flags(self) -> list[str]:
+        return list(_FLAG_NAMES[self.flag_bits])
+
+    @property
+    def redactions(self) -> list[dict[str, Any]]:
+        return _redaction_dicts(self.redaction_lines, self.redaction_patterns, self.pattern_names)
+
+    @property
+    def secret_spans(self) -> list[dict[str, Any]]:
+        return _secret_span_dicts(self.secret_offsets, self.secret_pattern_names)
+
+
+@dataclass(frozen=True, slots=True)
+class PatternHits:
+    """Where each pattern of a rule pack matched one chunk text, pattern by pattern.
+
+    ``instruction`` holds ``(line number, pattern index)`` pairs, ordered like a
+    result's redactions. ``secrets`` maps every secret pattern that matched (possibly
+    with empty matches only) to its non-empty ``(start, end)`` spans. Unlike a
+    `TextScan`, hits of different patterns are independent, so `scan_from_hits` can
+    combine hits found under different rule packs.
+    """
+
+    instruction: tuple[tuple[int, int], ...]
+    secrets: dict[int, tuple[tuple[int, int], ...]]
+
+
+class RulePackCache:
+    """Process-wide cache of compiled rule packs.
+
+    The default rules are compiled once. Rule files are keyed by resolved path and the
+    SHA-256 of their content, so an edited file is recompiled on its next load while an
+    unchanged one is served from the cache.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._default: RulePack | None = None
+        self._files: dict[Path, tuple[str, RulePack]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def default(self) -> RulePack:
+        with self._lock:
+            if self._default is not None:
+                self.hits += 1
+                return self._default
+            self.misses += 1
+            self._default = rule_pack_from_dict(DEFAULT_RULES)
+            return self._default
+
+    def load(self, path: Path) -> RulePack:
+        content = path.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+        key = path.resolve()
+        with self._lock:
+            cached = self._files.get(key)
+            if cached is not None and cached[0] == digest:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        payload = json.loads(content.decode("utf-8"))
+        if not isinstance(payload, dict):
+            raise ValueError("rules must be a JSON object")
+        if payload.get("format") == RULE_ARTIFACT_FORMAT:
+            rule_pack = rule_pack_from_artifact(payload)
+        else:
+            rule_pack = rule_pack_from_dict(payload)
+        with self._lock:
+            self._files[key] = (digest, rule_pack)
+        return rule_pack
+
+    def invalidate(self, path: Path | None = None) -> None:
+        """Drop the cached pack for ``path``, or every cached pack when omitted."""
+        with self._lock:
+            if path is None:
+                self._default = None
+                self._files.clear()
+            else:
+                self._files.pop(path.resolve(), None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            entries = len(self._files) + (self._default is not None)
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+RULE_PACK_CACHE = RulePackCache()
 
 
 def default_rule_pack() -> RulePack:
-    return rule_pack_from_dict(DEFAULT_RULES)
+    return RULE_PACK_CACHE.default()
 
 
 def dump_default_rules_json() -> str:
@@ -84,18 +368,94 @@ def dump_default_rules_json() -> str:
 
 
 def load_rule_pack(path: Path) -> RulePack:
-    payload = json.loads(path.read_text(encoding="utf-8"))
-    if not isinstance(payload, dict):
-        raise ValueError("rules must be a JSON object")
-    return rule_pack_from_dict(payload)
+    return RULE_PACK_CACHE.load(path)
+
+
+def with_secret_mask(rule_pack: RulePack, mask: str = DEFAULT_SECRET_MASK) -> RulePack:
+    """Return ``rule_pack`` set to mask secrets, keeping a mask it already names."""
+    if rule_pack.secret_mask is not None:
+        return rule_pack
+    return replace(rule_pack, secret_mask=mask)
+
+
+def compile_rule_pack(rule_pack: RulePack) -> dict[str, Any]:
+    """Return a precompiled rule-pack artifact for ``rule_pack``.
+
+    Compiled regexes cannot be serialized, so the artifact holds the checked rules and
+    what the matchers derive from them: which patterns share the combined alternation and
+    the prefilter literal of each pattern. Loading it (`rule_pack_from_artifact`, or
+    `load_rule_pack` on the written file) skips the safety check and that analysis, and
+    the combined alternation is compiled on first use.
+    """
+    return {
+        "format": RULE_ARTIFACT_FORMAT,
+        "version": RULE_ARTIFACT_VERSION,
+        "python": _python_version(),
+        "rag_sanitizer": __version__,
+        "fingerprint": rule_pack.fingerprint,
+        "rules": rule_pack.to_dict(),
+        "instruction_index": rule_pack.instruction_matcher.index.to_dict(),
+        "secret_index": rule_pack.secret_matcher.index.to_dict(),
+    }
+
+
+def rule_pack_from_artifact(payload: dict[str, Any]) -> RulePack:
+    """Load an artifact written from `compile_rule_pack`.
+
+    Artifacts from another format version, Python minor version or rag-sanitizer version
+    are rejected, because pattern analysis may differ between them; recompile those.
+    """
+    if payload.get("format") != RULE_ARTIFACT_FORMAT:
+        raise ValueError(f"not a rule-pack artifact (format must be {RULE_ARTIFACT_FORMAT!r})")
+    built_with = (payload.get("version"), payload.get("python"), payload.get("rag_sanitizer"))
+    expected = (RULE_ARTIFACT_VERSION, _python_version(), __version__)
+    if built_with != expected:
+        raise ValueError(
+            "rule-pack artifact was compiled for format {}, Python {}, rag-sanitizer {}; "
+            "this is format {}, Python {}, rag-sanitizer {}: recompile it with "
+            "--compile-rules".format(*built_with, *expected)
+        )
+    rules = payload.get("rules")
+    if not isinstance(rules, dict):
+        raise ValueError("rule-pack artifact rules must be an object")
+    indexes = {}
+    for field_name, patterns_field in (
+        ("instruction_index", "instruction_patterns"),
+        ("secret_index", "secret_patterns"),
+    ):
+        index = payload.get(field_name)
+        patterns = rules.get(patterns_field)
+        if not isinstance(index, dict) or not isinstance(patterns, list):
+            raise ValueError(f"rule-pack artifact is missing {field_name}")
+        try:
+            indexes[field_name] = MatcherIndex.from_dict(index, len(patterns))
+        except ValueError as exc:
+            raise ValueError(f"rule-pack artifact {field_name}: {exc}") from None
+    rule_pack = _rule_pack(rules, check_safety=False, **indexes)
+    if rule_pack.fingerprint != payload.get("fingerprint"):
+        raise ValueError("rule-pack artifact fingerprint does not match its rules")
+    return rule_pack
 
 
 def rule_pack_from_dict(payload: dict[str, Any]) -> RulePack:
+    return _rule_pack(payload, check_safety=True)
+
+
+def _rule_pack(
+    payload: dict[str, Any],
+    *,
+    check_safety: bool,
+    instruction_index: MatcherIndex | None = None,
+    secret_index: MatcherIndex | None = None,
+) -> RulePack:
     instruction_patterns_raw = payload.get(
         "instruction_patterns", DEFAULT_RULES["instruction_patterns"]
     )
     secret_patterns_raw = payload.get("secret_patterns", DEFAULT_RULES["secret_patterns"])
     weights_raw = payload.get("weights", DEFAULT_RULES["weights"])
+    markdown_skip_raw = payload.get("markdown_skip", DEFAULT_RULES["markdown_skip"])
+    secret_mask = payload.get("secret_mask", DEFAULT_RULES["secret_mask"])
+    strict_patterns = payload.get("strict_patterns", False)
 
     if not isinstance(instruction_patterns_raw, list) or not all(
         isinstance(item, str) for item in instruction_patterns_raw
@@ -110,9 +470,23 @@ def rule_pack_from_dict(payload: dict[str, Any]) -> RulePack:
         for key, value in weights_raw.items()
     ):
         raise ValueError("weights must be an object mapping flag -> number")
+    if not isinstance(markdown_skip_raw, list) or not all(
+        isinstance(item, str) for item in markdown_skip_raw
+    ):
+        raise ValueError("markdown_skip must be a list of strings")
+    markdown_skip = check_region_kinds(markdown_skip_raw)
+    if secret_mask is not None and not isinstance(secret_mask, str):
+        raise ValueError("secret_mask must be a string or null")
+    if secret_mask is not None and any(char in _LINE_BREAKS for char in secret_mask):
+        raise ValueError("secret_mask must not contain line breaks")
+    if not isinstance(strict_patterns, bool):
+        raise ValueError("strict_patterns must be true or false")
 
     instruction_pattern_strings = list(instruction_patterns_raw)
     secret_pattern_strings = list(secret_patterns_raw)
+    if check_safety:
+        _check_patterns("instruction_patterns", instruction_pattern_strings, strict_patterns)
+        _check_patterns("secret_patterns", secret_pattern_strings, strict_patterns)
     instruction_patterns = [_compile_pattern(pattern) for pattern in instruction_pattern_strings]
     secret_patterns = [_compile_pattern(pattern) for pattern in secret_pattern_strings]
     weights = {key: float(value) for key, value in weights_raw.items()}
@@ -123,15 +497,52 @@ def rule_pack_from_dict(payload: dict[str, Any]) -> RulePack:
         secret_patterns=secret_patterns,
         secret_pattern_strings=secret_pattern_strings,
         weights=weights,
+        markdown_skip=markdown_skip,
+        secret_mask=secret_mask,
+        instruction_index=instruction_index,
+        secret_index=secret_index,
     )
 
 
+def _python_version() -> str:
+    return "{}.{}".format(*sys.version_info)
+
+
 def _compile_pattern(pattern: str) -> Pattern[str]:
     return re.compile(pattern, re.IGNORECASE)
 
 
-def parse_chunk(line: str) -> Chunk:
-    payload = json.loads(line)
+def check_rule_pack_safety(rule_pack: RulePack) -> None:
+    """Raise ValueError for the first pattern of ``rule_pack`` that can backtrack
+    exponentially, as loading it with ``strict_patterns`` would."""
+    _check_patterns("instruction_patterns", rule_pack.instruction_pattern_strings, True)
+    _check_patterns("secret_patterns", rule_pack.secret_pattern_strings, True)
+
+
+def _check_patterns(field_name: str, patterns: list[str], strict: bool) -> None:
+    """Reject (``strict``) or warn about patterns that can backtrack exponentially; see
+    `rag_sanitizer.lint`."""
+    # Imported here so that loading a precompiled artifact never imports the linter.
+    from rag_sanitizer.lint import check_pattern_safety
+
+    for index, pattern in enumerate(patterns):
+        try:
+            check_pattern_safety(pattern)
+        except re.error:
+            continue  # reported by _compile_pattern with the usual message
+        except ValueError as exc:
+            message = f"{field_name}[{index}] {pattern!r}: {exc}"
+            if strict:
+                raise ValueError(message) from None
+            warnings.warn(message, UnsafePatternWarning, stacklevel=2)
+
+
+def parse_chunk(line: str | bytes) -> Chunk:
+    return chunk_from_dict(loads(line))
+
+
+def chunk_from_dict(payload: dict[str, Any]) -> Chunk:
+    """Build a `Chunk` from a decoded input object, normalizing like `parse_chunk`."""
     chunk_id = str(payload.get("id", ""))
     text = str(payload.get("text", ""))
     source = payload.get("source")
@@ -148,89 +559,658 @@ def sanitize_chunk(
     require_citations: bool = True,
     rule_pack: RulePack | None = None,
     markdown_aware: bool = False,
+    cache: ResultCache | None = None,
+    profiler: Profiler | None = None,
+    scan_budget: float | None = None,
 ) -> SanitizedChunk:
     rules = rule_pack or default_rule_pack()
-    flags: list[str] = []
-    lines = chunk.text.splitlines()
-    kept_lines: list[str] = []
-    redactions: list[dict[str, Any]] = []
+    if cache is None:
+        scan = scan_text(
+            chunk.text,
+            rules,
+            markdown_aware=markdown_aware,
+            profiler=profiler,
+            scan_budget=scan_budget,
+        )
+    else:
+        scan = cache.scan(
+            chunk.text,
+            rules,
+            markdown_aware=markdown_aware,
+            profiler=profiler,
+            scan_budget=scan_budget,
+        )
+
+    return result_from_scan(chunk, scan, rules, require_citations=require_citations)
+
+
+def result_from_scan(
+    chunk: Chunk, scan: TextScan, rules: RulePack, *, require_citations: bool = True
+) -> SanitizedChunk:
+    """Combine a text scan of ``chunk`` with its citation check into a sanitize result."""
+    flag_bits = scan.flag_bits
+    citations_present = len(chunk.citations) > 0
+    citation_ok = citations_present or not require_citations
+    if not citations_present and require_citations:
+        flag_bits |= _MISSING_CITATION
+
+    return SanitizedChunk(
+        chunk_id=chunk.chunk_id,
+        sanitized_text=scan.sanitized_text,
+        risk_score=rules.risk_by_flags[flag_bits],
+        source=chunk.source,
+        citations=chunk.citations,
+        citation_ok=citation_ok,
+        flag_bits=flag_bits,
+        redaction_lines=scan.redaction_lines,
+        redaction_patterns=scan.redaction_patterns,
+        secret_offsets=scan.secret_offsets,
+        pattern_names=scan.pattern_names,
+        secret_pattern_names=scan.secret_pattern_names,
+    )
+
+
+def scan_text(
+    text: str,
+    rules: RulePack,
+    *,
+    markdown_aware: bool = False,
+    profiler: Profiler | None = None,
+    scan_budget: float | None = None,
+) -> TextScan:
+    """Run the rule pack over ``text``; everything except citation handling.
+
+    With ``scan_budget`` (seconds), matching stops once the budget is spent: lines not
+    yet verified are kept as they are and the result is flagged ``scan_timeout``. The
+    budget is checked between lines and patterns, since a running regex cannot be
+    interrupted.
+    """
+    deadline = None if scan_budget is None else perf_counter() + scan_budget
+
+    # One case-folded copy serves the instruction and secret prefilters alike.
+    folded = fold_text(text)
+    scanned = _scan_buffer(text, rules, markdown_aware, profiler, deadline, folded)
+    if scanned is None:
+        scanned = _scan_lines(text, rules, markdown_aware, profiler, deadline, folded)
+    sanitized_text, found, tool_like, timed_out = scanned
+
+    secret_like = False
+    spans: list[tuple[int, int, int]] = []
+    if not timed_out:
+        secret_like, spans, timed_out = _secret_spans(text, folded, rules, profiler, deadline)
+    return _text_scan(text, rules, sanitized_text, found, tool_like, secret_like, spans, timed_out)
+
+
+def find_pattern_hits(text: str, rules: RulePack, *, markdown_aware: bool = False) -> PatternHits:
+    """Match ``text`` against every pattern of ``rules`` and record the hits per pattern.
+
+    ``scan_from_hits(text, rules, find_pattern_hits(text, rules))`` equals
+    ``scan_text(text, rules)``.
+    """
+    folded = fold_text(text)
+    instruction, _ = find_instruction_hits(
+        text, rules, markdown_aware=markdown_aware, folded=folded
+    )
+    secrets: dict[int, tuple[tuple[int, int], ...]] = {}
+    for index in rules.secret_matcher.candidates(text, folded):
+        hit, spans = rules.secret_matcher.spans(text, (index,))
+        if hit:
+            secrets[index] = tuple((start, end) for start, end, _ in spans)
+    return PatternHits(instruction=instruction, secrets=secrets)
 
-    instruction_like = False
+
+def find_instruction_hits(
+    text: str,
+    rules: RulePack,
+    *,
+    markdown_aware: bool = False,
+    skipped: dict[int, list[tuple[int, int]]] | None = None,
+    folded: str | None = None,
+) -> tuple[tuple[tuple[int, int], ...], bool]:
+    """Return the `PatternHits.instruction` pairs of ``text`` and whether a hit line is a
+    tool instruction.
+
+    ``skipped`` replaces the Markdown segmentation of a markdown-aware scan with
+    precomputed skip spans per line index, for callers that segment a long text in
+    pieces (see `rag_sanitizer.markdown.segmenter`).
+    """
+    if folded is None:
+        folded = fold_text(text)
+    scanned = _scan_buffer(text, rules, markdown_aware, folded=folded, skipped=skipped)
+    if scanned is None:
+        scanned = _scan_lines(text, rules, markdown_aware, folded=folded, skipped=skipped)
+    found = scanned[1]
+    instruction = tuple(zip(found[0], found[1], strict=True)) if found else ()
+    return instruction, scanned[2]
+
+
+def scan_from_hits(text: str, rules: RulePack, hits: PatternHits) -> TextScan:
+    """Build the `scan_text` result for ``text`` from already known pattern hits.
+
+    No pattern is matched: redacted lines are cut from the text, tool instructions are
+    recognized on them and secrets are masked from the stored spans.
+    """
+    found: _Redactions | None = None
     tool_like = False
+    if hits.instruction:
+        found = (array("I"), array("I"))
+        for line_number, pattern in hits.instruction:
+            found[0].append(line_number)
+            found[1].append(pattern)
+        lines = text.splitlines()
+        removed = set(found[0])
+        tool_like = any(is_tool_line(lines[line_number - 1]) for line_number in removed)
+        kept = (line for number, line in enumerate(lines, 1) if number not in removed)
+        sanitized_text = "\n".join(kept).strip()
+    elif any(line_break in text for line_break in OTHER_LINE_BREAKS):
+        sanitized_text = "\n".join(text.splitlines()).strip()
+    else:
+        sanitized_text = text.strip()
+    spans = sorted(
+        (start, end, index)
+        for index, found_spans in hits.secrets.items()
+        for start, end in found_spans
+    )
+    return _text_scan(
+        text, rules, sanitized_text, found, tool_like, bool(hits.secrets), spans, False
+    )
 
-    in_fenced_code_block = False
-    fence_char: str | None = None
-    fence_len: int | None = None
-
-    for line_number, line in enumerate(lines, start=1):
-        if markdown_aware:
-            fence_match = re.match(r"^\s*([`~]{3,})", line)
-            if fence_match:
-                fence = fence_match.group(1)
-                if not in_fenced_code_block:
-                    in_fenced_code_block = True
-                    fence_char = fence[0]
-                    fence_len = len(fence)
-                else:
-                    if fence_char == fence[0] and fence_len is not None and len(fence) >= fence_len:
-                        in_fenced_code_block = False
-                        fence_char = None
-                        fence_len = None
-                kept_lines.append(line)
-                continue
-
-            if in_fenced_code_block:
-                kept_lines.append(line)
-                continue
-
-        matched_patterns = [
-            pattern_str
-            for pattern, pattern_str in zip(
-                rules.instruction_patterns, rules.instruction_pattern_strings, strict=True
-            )
-            if pattern.search(line)
-        ]
-        if matched_patterns:
-            instruction_like = True
-            if "tool" in line.lower() or "function" in line.lower():
+
+def scan_without_text(rules: RulePack, hits: PatternHits, *, tool_like: bool) -> TextScan:
+    """The `scan_from_hits` result with an empty ``sanitized_text``, for callers that
+    write the sanitized text out themselves (see `rag_sanitizer.streaming`)."""
+    found: _Redactions | None = None
+    if hits.instruction:
+        found = (array("I"), array("I"))
+        for line_number, pattern in hits.instruction:
+            found[0].append(line_number)
+            found[1].append(pattern)
+    spans = sorted(
+        (start, end, index)
+        for index, found_spans in hits.secrets.items()
+        for start, end in found_spans
+    )
+    return _text_scan(None, rules, "", found, tool_like, bool(hits.secrets), spans, False)
+
+
+def _text_scan(
+    text: str | None,
+    rules: RulePack,
+    sanitized_text: str,
+    found: _Redactions | None,
+    tool_like: bool,
+    secret_like: bool,
+    spans: list[tuple[int, int, int]],
+    timed_out: bool,
+) -> TextScan:
+    redaction_lines, redaction_patterns = found or (_NO_REDACTIONS, _NO_REDACTIONS)
+
+    flag_bits = 0
+    if found:
+        flag_bits |= _INSTRUCTION_LIKE
+    if tool_like:
+        flag_bits |= _TOOL_INSTRUCTION
+
+    secret_offsets: Sequence[int] = _NO_REDACTIONS
+    if spans:
+        secret_offsets = array("I", [value for span in spans for value in span])
+        if rules.secret_mask is not None and text is not None:
+            sanitized_text = _masked_text(text, spans, rules.secret_mask, redaction_lines)
+    if secret_like:
+        flag_bits |= _SECRET_LIKE
+    if timed_out:
+        flag_bits |= _SCAN_TIMEOUT
+
+    return TextScan(
+        sanitized_text=sanitized_text,
+        flag_bits=flag_bits,
+        redaction_lines=redaction_lines,
+        redaction_patterns=redaction_patterns,
+        secret_offsets=secret_offsets,
+        pattern_names=rules.instruction_pattern_strings,
+        secret_pattern_names=rules.secret_pattern_strings,
+    )
+
+
+ChunkInput = Chunk | str | bytes
+
+
+class Sanitizer:
+    """Sanitize many chunks with one resolved rule pack and option set.
+
+    Shared by `sanitize_iter`/`sanitize_many`, the CLI and its worker processes, so
+    every caller takes the same path without re-resolving rules per chunk.
+    """
+
+    def __init__(
+        self,
+        *,
+        require_citations: bool = True,
+        rule_pack: RulePack | None = None,
+        markdown_aware: bool = False,
+        cache: ResultCache | None = None,
+        profiler: Profiler | None = None,
+        scan_budget: float | None = None,
+    ) -> None:
+        self.require_citations = require_citations
+        self.rule_pack = rule_pack or default_rule_pack()
+        self.markdown_aware = markdown_aware
+        self.cache = cache
+        self.profiler = profiler
+        self.scan_budget = scan_budget
+
+    def sanitize(self, chunk: Chunk) -> SanitizedChunk:
+        return sanitize_chunk(
+            chunk,
+            require_citations=self.require_citations,
+            rule_pack=self.rule_pack,
+            markdown_aware=self.markdown_aware,
+            cache=self.cache,
+            profiler=self.profiler,
+            scan_budget=self.scan_budget,
+        )
+
+    def sanitize_unmatched(self, chunk: Chunk) -> SanitizedChunk:
+        """`sanitize` for a chunk that a pre-screen has shown cannot match, without a scan.
+
+        The caller vouches that the case-folded text holds none of the rule pack's
+        prefilter literals and none of `OTHER_LINE_BREAKS`; the result is then identical
+        to `sanitize`. Rule packs with patterns that lack a literal still scan.
+        """
+        rules = self.rule_pack
+        if rules.instruction_matcher.prefilter.always or rules.secret_matcher.prefilter.always:
+            return self.sanitize(chunk)
+        citation_ok = len(chunk.citations) > 0 or not self.require_citations
+        flag_bits = 0 if citation_ok else _MISSING_CITATION
+        return SanitizedChunk(
+            chunk_id=chunk.chunk_id,
+            sanitized_text=chunk.text.strip(),
+            risk_score=rules.risk_by_flags[flag_bits],
+            source=chunk.source,
+            citations=chunk.citations,
+            citation_ok=citation_ok,
+            flag_bits=flag_bits,
+            redaction_lines=_NO_REDACTIONS,
+            redaction_patterns=_NO_REDACTIONS,
+            secret_offsets=_NO_REDACTIONS,
+            pattern_names=rules.instruction_pattern_strings,
+            secret_pattern_names=rules.secret_pattern_strings,
+        )
+
+    def iter(
+        self,
+        items: Iterable[ChunkInput],
+        *,
+        summary: RunSummary | None = None,
+        on_error: Callable[[int, Exception], None] | None = None,
+    ) -> Iterator[SanitizedChunk]:
+        """Lazily sanitize ``items``; see `sanitize_iter`."""
+        for position, item in enumerate(items, start=1):
+            if isinstance(item, Chunk):
+                chunk = item
+            else:
+                if not item.strip():
+                    continue
+                try:
+                    chunk = parse_chunk(item)
+                except Exception as exc:
+                    if on_error is None:
+                        raise
+                    on_error(position, exc)
+                    continue
+            sanitized = self.sanitize(chunk)
+            if summary is not None:
+                summary.record(
+                    sanitized.flags, sanitized.risk_score, sanitized.chunk_stats(len(chunk.text))
+                )
+            yield sanitized
+
+
+def sanitize_iter(
+    items: Iterable[ChunkInput],
+    *,
+    require_citations: bool = True,
+    rule_pack: RulePack | None = None,
+    markdown_aware: bool = False,
+    summary: RunSummary | None = None,
+    on_error: Callable[[int, Exception], None] | None = None,
+    cache: ResultCache | None = None,
+) -> Iterator[SanitizedChunk]:
+    """Lazily sanitize ``Chunk`` objects or raw JSONL lines (``str`` or ``bytes``).
+
+    Rules and options are resolved once for the whole iterable. Blank raw lines are
+    skipped. Invalid lines raise unless ``on_error`` is given, in which case it is
+    called with the 1-based position of the item and the exception. When ``summary`` is
+    given it is updated with every result, producing the same aggregate as the CLI
+    ``--summary-json``.
+    """
+    sanitizer = Sanitizer(
+        require_citations=require_citations,
+        rule_pack=rule_pack,
+        markdown_aware=markdown_aware,
+        cache=cache,
+    )
+    return sanitizer.iter(items, summary=summary, on_error=on_error)
+
+
+def sanitize_many(
+    items: Iterable[ChunkInput],
+    *,
+    require_citations: bool = True,
+    rule_pack: RulePack | None = None,
+    markdown_aware: bool = False,
+    summary: RunSummary | None = None,
+    on_error: Callable[[int, Exception], None] | None = None,
+    cache: ResultCache | None = None,
+) -> list[SanitizedChunk]:
+    """Eager form of `sanitize_iter`."""
+    return list(
+        sanitize_iter(
+            items,
+            require_citations=require_citations,
+            rule_pack=rule_pack,
+            markdown_aware=markdown_aware,
+            summary=summary,
+            on_error=on_error,
+            cache=cache,
+        )
+    )
+
+
+# Line boundaries recognised by `str.splitlines` other than "\n". Chunks containing any of
+# them are scanned line by line so that line numbers and output stay identical. Single
+# character containment checks are much faster than a character-class regex search.
+OTHER_LINE_BREAKS = ("\r", "\x0b", "\x0c", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029")
+
+
+def _scan_lines(
+    text: str,
+    rules: RulePack,
+    markdown_aware: bool,
+    profiler: Profiler | None = None,
+    deadline: float | None = None,
+    folded: str | None = None,
+    skipped: dict[int, list[tuple[int, int]]] | None = None,
+) -> tuple[str, _Redactions | None, bool, bool]:
+    """Evaluate instruction patterns line by line (general path)."""
+    kept_lines: list[str] = []
+    found: _Redactions | None = None
+    tool_like = False
+    timed_out = False
+    lines = text.splitlines()
+    # Patterns whose required literal does not occur anywhere in the chunk cannot match
+    # any of its lines; clean chunks usually leave no candidates at all.
+    if profiler is not None:
+        started = perf_counter()
+    candidates = rules.instruction_matcher.candidates(text, folded)
+    if profiler is not None:
+        profiler.add("prefilter", started)
+    if not markdown_aware:
+        skipped = {}
+    elif skipped is None and rules.markdown_skip:
+        if profiler is not None:
+            started = perf_counter()
+        skipped = skipped_spans(segment(lines, rules.markdown_skip), rules.markdown_skip)
+        if profiler is not None:
+            profiler.add("markdown", started)
+
+    if profiler is not None:
+        started = perf_counter()
+    for index, line in enumerate(lines):
+        spans = skipped.get(index) if skipped else None
+        parts = None if spans is None else unskipped_parts(line, spans)
+        if spans is not None and parts is None:
+            kept_lines.append(line)
+            continue
+        if deadline is not None and perf_counter() >= deadline:
+            timed_out = True
+            kept_lines.extend(lines[index:])
+            break
+        if parts is None:
+            matched = _line_matches(line, rules, candidates, profiler)
+        else:
+            matched = _parts_matches(parts, rules, candidates, profiler)
+        if matched:
+            found = _add_redaction(found, index + 1, matched)
+            if is_tool_line(line):
                 tool_like = True
+            continue
+        kept_lines.append(line)
+    if profiler is not None:
+        profiler.add("instructions", started)
+
+    return "\n".join(kept_lines).strip(), found, tool_like, timed_out
+
+
+def _scan_buffer(
+    text: str,
+    rules: RulePack,
+    markdown_aware: bool,
+    profiler: Profiler | None = None,
+    deadline: float | None = None,
+    folded: str | None = None,
+    skipped: dict[int, list[tuple[int, int]]] | None = None,
+) -> tuple[str, _Redactions | None, bool, bool] | None:
+    """Evaluate instruction patterns over the whole chunk buffer.
+
+    Candidate lines are located in one pass over the buffer and mapped back to line
+    numbers by counting newlines between hits; only those lines are sliced out and
+    verified. The sanitized text is built by cutting the redacted line ranges out of the
+    original buffer. Output is identical to `_scan_lines`. Returns None for chunks this
+    path cannot handle (line boundaries other than "\\n", or rule packs that need
+    line-by-line evaluation).
+    """
+    if any(line_break in text for line_break in OTHER_LINE_BREAKS):
+        return None
+    if profiler is not None:
+        started = perf_counter()
+    located = rules.instruction_matcher.candidate_lines(text, folded)
+    if profiler is not None:
+        profiler.add("prefilter", started)
+    if located is None:
+        return None
+    candidates, line_starts = located
+    if not line_starts:
+        return text.strip(), None, False, False
+
+    if not markdown_aware:
+        skipped = {}
+    elif skipped is None and rules.markdown_skip:
+        if profiler is not None:
+            started = perf_counter()
+        skipped = skipped_spans(segment(text.split("\n"), rules.markdown_skip), rules.markdown_skip)
+        if profiler is not None:
+            profiler.add("markdown", started)
+    if profiler is not None:
+        started = perf_counter()
+    found: _Redactions | None = None
+    removed: list[tuple[int, int]] = []
+    tool_like = False
+    timed_out = False
+    counted_to = 0
+    line_number = 1
+
+    for line_start in line_starts:
+        line_number += text.count("\n", counted_to, line_start)
+        counted_to = line_start
+        line_end = text.find("\n", line_start)
+        if line_end == -1:
+            line_end = len(text)
+        line = text[line_start:line_end]
+        spans = skipped.get(line_number - 1) if skipped else None
+        parts = None if spans is None else unskipped_parts(line, spans)
+        if spans is not None and parts is None:
+            continue
+        if deadline is not None and perf_counter() >= deadline:
+            timed_out = True
+            break
+        if parts is None:
+            matched = _line_matches(line, rules, candidates, profiler)
+        else:
+            matched = _parts_matches(parts, rules, candidates, profiler)
+        if not matched:
+            continue
+        found = _add_redaction(found, line_number, matched)
+        removed.append((line_start, line_end + 1))
+        if is_tool_line(line):
+            tool_like = True
+    if profiler is not None:
+        profiler.add("instructions", started)
+
+    if not removed:
+        return text.strip(), found, tool_like, timed_out
+
+    pieces: list[str] = []
+    kept_from = 0
+    for removed_start, removed_end in removed:
+        pieces.append(text[kept_from:removed_start])
+        kept_from = removed_end
+    pieces.append(text[kept_from:])
+    # Dropping a line together with its "\n" leaves at most a trailing newline that the
+    # line-joined form does not have, which strip() removes anyway.
+    return "".join(pieces).strip(), found, tool_like, timed_out
+
+
+def _line_matches(
+    line: str,
+    rules: RulePack,
+    candidates: tuple[int, ...],
+    profiler: Profiler | None = None,
+) -> list[int]:
+    if profiler is None:
+        return rules.instruction_matcher.search(line, candidates)
+    return profiler.match("instruction", rules.instruction_patterns, line, candidates)
+
+
+def _parts_matches(
+    parts: list[str],
+    rules: RulePack,
+    candidates: tuple[int, ...],
+    profiler: Profiler | None = None,
+) -> list[int]:
+    """Match the parts of a line left between skipped Markdown regions separately."""
+    if len(parts) == 1:
+        return _line_matches(parts[0], rules, candidates, profiler)
+    matched: set[int] = set()
+    for part in parts:
+        matched.update(_line_matches(part, rules, candidates, profiler))
+    return sorted(matched)
+
+
+def _add_redaction(found: _Redactions | None, line_number: int, matched: list[int]) -> _Redactions:
+    if found is None:
+        found = (array("I"), array("I"))
+    found[0].extend([line_number] * len(matched))
+    found[1].extend(matched)
+    return found
+
+
+def _redaction_dicts(
+    lines: Sequence[int], patterns: Sequence[int], names: Sequence[str]
+) -> list[dict[str, Any]]:
+    redactions: list[dict[str, Any]] = []
+    previous = 0
+    for line_number, pattern in zip(lines, patterns, strict=True):
+        if line_number != previous:
+            matched: list[str] = []
             redactions.append(
                 {
                     "line_number": line_number,
                     "type": "instruction_like",
-                    "matched_patterns": matched_patterns,
+                    "matched_patterns": matched,
                 }
             )
-            continue
-        kept_lines.append(line)
+            previous = line_number
+        matched.append(names[pattern])
+    return redactions
 
-    if instruction_like:
-        flags.append("instruction_like")
-    if tool_like:
-        flags.append("tool_instruction")
 
-    secret_like = any(pattern.search(chunk.text) for pattern in rules.secret_patterns)
-    if secret_like:
-        flags.append("secret_like")
+def _redactions_json(lines: Sequence[int], patterns: Sequence[int], names: Sequence[str]) -> str:
+    if not lines:
+        return "[]"
+    return dumps_ascii(_redaction_dicts(lines, patterns, names))
 
-    citations_present = len(chunk.citations) > 0
-    citation_ok = citations_present or not require_citations
-    if not citations_present and require_citations:
-        flags.append("missing_citation")
 
-    sanitized_text = "\n".join(kept_lines).strip()
-    risk_score = _risk_score(flags, rules.weights)
+def _secret_spans(
+    text: str,
+    folded: str,
+    rules: RulePack,
+    profiler: Profiler | None,
+    deadline: float | None,
+) -> tuple[bool, list[tuple[int, int, int]], bool]:
+    """Find secret matches over the whole text; returns (secret_like, spans, timed_out)."""
+    if profiler is not None:
+        started = perf_counter()
+    candidates = rules.secret_matcher.candidates(text, folded)
+    if profiler is not None:
+        profiler.add("prefilter", started)
+    if not candidates:
+        return False, [], False
+    if profiler is not None:
+        started = perf_counter()
+        secret_like, spans = profiler.spans("secret", rules.secret_patterns, text, candidates)
+        profiler.add("secrets", started)
+        return secret_like, spans, False
+    if deadline is None:
+        secret_like, spans = rules.secret_matcher.spans(text, candidates)
+        return secret_like, spans, False
+    secret_like = False
+    spans = []
+    for index in candidates:
+        if perf_counter() >= deadline:
+            return secret_like, sorted(spans), True
+        hit, found = rules.secret_matcher.spans(text, (index,))
+        secret_like = secret_like or hit
+        spans.extend(found)
+    spans.sort()
+    return secret_like, spans, False
 
-    return SanitizedChunk(
-        chunk_id=chunk.chunk_id,
-        sanitized_text=sanitized_text,
-        risk_score=risk_score,
-        flags=flags,
-        source=chunk.source,
-        citations=chunk.citations,
-        citation_ok=citation_ok,
-        redactions=redactions,
-    )
+
+def _masked_text(
+    text: str, spans: list[tuple[int, int, int]], mask: str, redaction_lines: Sequence[int]
+) -> str:
+    """Sanitize ``text`` again with each run of overlapping secret spans replaced by ``mask``.
+
+    A span keeps the line breaks it covers, so line numbers (and the redacted lines) are
+    the same as in ``text``; lines are then dropped and joined as in `_scan_lines`.
+    """
+    merged: list[list[int]] = []
+    for start, end, _ in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    pieces: list[str] = []
+    kept_from = 0
+    for start, end in merged:
+        pieces.append(text[kept_from:start])
+        pieces.append(mask)
+        pieces.extend(char for char in text[start:end] if char in _LINE_BREAKS)
+        kept_from = end
+    pieces.append(text[kept_from:])
+    lines = "".join(pieces).splitlines()
+    if redaction_lines:
+        removed = set(redaction_lines)
+        lines = [line for number, line in enumerate(lines, 1) if number not in removed]
+    return "\n".join(lines).strip()
+
+
+def _secret_span_dicts(offsets: Sequence[int], names: Sequence[str]) -> list[dict[str, Any]]:
+    return [
+        {"start": offsets[index], "end": offsets[index + 1], "pattern": names[offsets[index + 2]]}
+        for index in range(0, len(offsets), 3)
+    ]
+
+
+def _secret_spans_json(offsets: Sequence[int], names: Sequence[str]) -> str:
+    if not offsets:
+        return "[]"
+    return dumps_ascii(_secret_span_dicts(offsets, names))
+
+
+def is_tool_line(line: str) -> bool:
+    lowered = line.lower()
+    return "tool" in lowered or "function" in lowered
 
 
 def _risk_score(flags: Iterable[str], weights: dict[str, float]) -> float:
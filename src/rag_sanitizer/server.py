@@ -0,0 +1,617 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+import stat
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import monotonic, perf_counter
+from typing import Any
+
+import typer
+
+from rag_sanitizer.aio import AsyncSanitizer
+from rag_sanitizer.codec import iter_jsonl_lines, loads
+from rag_sanitizer.sanitizer import (
+    Chunk,
+    RulePack,
+    check_rule_pack_safety,
+    chunk_from_dict,
+    default_rule_pack,
+    load_rule_pack,
+    parse_chunk,
+)
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Upper bounds (seconds) of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MAX_HEADER_LINES = 100
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Content Too Large",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+
+@dataclass
+class ServerStats:
+    """Throughput and latency counters for `SanitizerServer`, reported by ``/metrics``."""
+
+    started: float = field(default_factory=monotonic)
+    responses: dict[int, int] = field(default_factory=dict)
+    chunks: int = 0
+    request_bytes: int = 0
+    latency_buckets: list[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    latency_seconds: float = 0.0
+    latency_count: int = 0
+    reloads: dict[str, int] = field(default_factory=lambda: {"ok": 0, "error": 0})
+
+    def observe(self, status: int, chunks: int, size: int, seconds: float) -> None:
+        """Record one ``/sanitize`` request."""
+        self.responses[status] = self.responses.get(status, 0) + 1
+        self.chunks += chunks
+        self.request_bytes += size
+        self.latency_seconds += seconds
+        self.latency_count += 1
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        if bucket < len(LATENCY_BUCKETS):
+            self.latency_buckets[bucket] += 1
+
+    def to_dict(self, *, fingerprint: str, batches: int, batched_chunks: int) -> dict[str, Any]:
+        uptime = monotonic() - self.started
+        return {
+            "uptime_seconds": round(uptime, 3),
+            "rules": fingerprint,
+            "responses": {str(status): count for status, count in sorted(self.responses.items())},
+            "chunks": self.chunks,
+            "request_bytes": self.request_bytes,
+            "chunks_per_s": round(self.chunks / uptime, 1) if uptime > 0 else 0.0,
+            "mean_latency_ms": (
+                round(1000 * self.latency_seconds / self.latency_count, 3)
+                if self.latency_count
+                else 0.0
+            ),
+            "batches": batches,
+            "mean_batch_size": round(batched_chunks / batches, 2) if batches else 0.0,
+            "reloads": dict(self.reloads),
+        }
+
+    def to_prometheus(self, *, fingerprint: str, batches: int, batched_chunks: int) -> str:
+        """Render the counters in the Prometheus text exposition format."""
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: list[tuple[str, float]]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(
+                f"{name}{{{labels}}} {value}" if labels else f"{name} {value}"
+                for labels, value in samples
+            )
+
+        metric(
+            "rag_sanitizer_server_uptime_seconds",
+            "gauge",
+            "Seconds since the server started.",
+            [("", round(monotonic() - self.started, 3))],
+        )
+        metric(
+            "rag_sanitizer_server_rules_info",
+            "gauge",
+            "Fingerprint of the rule pack being served.",
+            [(f'fingerprint="{fingerprint}"', 1)],
+        )
+        metric(
+            "rag_sanitizer_server_responses_total",
+            "counter",
+            "Sanitize requests answered, by HTTP status.",
+            [(f'status="{status}"', count) for status, count in sorted(self.responses.items())],
+        )
+        metric(
+            "rag_sanitizer_server_chunks_total",
+            "counter",
+            "Chunks sanitized.",
+            [("", self.chunks)],
+        )
+        metric(
+            "rag_sanitizer_server_request_bytes_total",
+            "counter",
+            "Bytes of sanitize request bodies.",
+            [("", self.request_bytes)],
+        )
+        metric(
+            "rag_sanitizer_server_batches_total",
+            "counter",
+            "Batches run by the sanitizer pool.",
+            [("", batches)],
+        )
+        metric(
+            "rag_sanitizer_server_batched_chunks_total",
+            "counter",
+            "Chunks in the batches run by the sanitizer pool.",
+            [("", batched_chunks)],
+        )
+        metric(
+            "rag_sanitizer_server_reloads_total",
+            "counter",
+            "Rules reloads, by result.",
+            [(f'result="{result}"', count) for result, count in self.reloads.items()],
+        )
+        cumulative = 0
+        buckets: list[tuple[str, float]] = []
+        for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets, strict=True):
+            cumulative += count
+            buckets.append((f'le="{bound}"', cumulative))
+        buckets.append(('le="+Inf"', self.latency_count))
+        name = "rag_sanitizer_server_request_seconds"
+        lines.append(f"# HELP {name} Latency of sanitize requests.")
+        lines.append(f"# TYPE {name} histogram")
+        lines.extend(f"{name}_bucket{{{labels}}} {value}" for labels, value in buckets)
+        lines.append(f"{name}_sum {self.latency_seconds}")
+        lines.append(f"{name}_count {self.latency_count}")
+        return "\n".join(lines) + "\n"
+
+
+class _Generation:
+    """One rule pack's sanitizer pool, and the requests still using it."""
+
+    def __init__(self, sanitizer: AsyncSanitizer, fingerprint: str) -> None:
+        self.sanitizer = sanitizer
+        self.fingerprint = fingerprint
+        self.users = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    def acquire(self) -> None:
+        self.users += 1
+        self.idle.clear()
+
+    def release(self) -> None:
+        self.users -= 1
+        if self.users == 0:
+            self.idle.set()
+
+    async def retire(self) -> None:
+        """Close the pool once every request that started on it has finished."""
+        await self.idle.wait()
+        await self.sanitizer.close()
+
+
+class _HttpError(ValueError):
+    """A request the server answers with an HTTP error status."""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class SanitizerServer:
+    """Serve sanitization over HTTP on localhost and/or a Unix domain socket.
+
+    The rule pack stays compiled for the server's lifetime. Concurrent requests are
+    sanitized by one `AsyncSanitizer`, which coalesces their chunks into batches; with
+    ``workers > 1`` batches run in worker processes. ``rules_path`` is checked every
+    ``reload_interval`` seconds (0 disables polling; `reload` forces a check), and a
+    changed file is compiled and swapped in without dropping requests. A file that fails
+    to load, or is missing, keeps the previous rules until it changes again. With
+    ``strict_patterns`` a pack with a pattern that can backtrack exponentially fails to
+    load, as if the file set ``"strict_patterns": true``.
+
+    Endpoints: ``POST /sanitize`` (JSONL body, or a JSON object or array with
+    ``Content-Type: application/json``), ``POST /reload``, ``GET /metrics`` (Prometheus),
+    ``GET /stats`` (JSON) and ``GET /healthz``.
+    """
+
+    def __init__(
+        self,
+        *,
+        rules_path: Path | None = None,
+        require_citations: bool = True,
+        markdown_aware: bool = False,
+        mask_secrets: bool = False,
+        workers: int = 1,
+        max_batch_size: int = 64,
+        max_batch_delay: float = 0.0,
+        queue_depth: int = 1024,
+        max_request_bytes: int = 64 << 20,
+        reload_interval: float = 2.0,
+        strict_patterns: bool = False,
+    ) -> None:
+        self.rules_path = rules_path
+        self.require_citations = require_citations
+        self.markdown_aware = markdown_aware
+        self.mask_secrets = mask_secrets
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.queue_depth = queue_depth
+        self.max_request_bytes = max_request_bytes
+        self.reload_interval = reload_interval
+        self.strict_patterns = strict_patterns
+        self.stats = ServerStats()
+        self.port: int | None = None
+        self.socket_path: Path | None = None
+
+        self._generation: _Generation | None = None
+        self._rules_stamp: tuple[int, int] | None = None
+        self._reload_lock = asyncio.Lock()
+        self._servers: list[asyncio.Server] = []
+        self._tasks: set[asyncio.Task[None]] = set()
+        # Counters of retired pools, so totals survive reloads.
+        self._retired_batches = 0
+        self._retired_chunks = 0
+
+    @property
+    def fingerprint(self) -> str:
+        assert self._generation is not None
+        return self._generation.fingerprint
+
+    async def start(self, *, port: int | None = None, socket_path: Path | None = None) -> None:
+        """Load the rules and listen on ``port`` (0 picks a free one) and/or ``socket_path``.
+
+        Raises ValueError for invalid rules, like `load_rule_pack`.
+        """
+        if port is None and socket_path is None:
+            raise ValueError("serve needs a port or a socket path")
+        rule_pack = await asyncio.to_thread(self._load_rules)
+        self._generation = await self._start_generation(rule_pack)
+        if port is not None:
+            server = await asyncio.start_server(self._handle, HOST, port)
+            self.port = server.sockets[0].getsockname()[1]
+            self._servers.append(server)
+        if socket_path is not None:
+            _remove_stale_socket(socket_path)
+            self._servers.append(await asyncio.start_unix_server(self._handle, socket_path))
+            self.socket_path = socket_path
+        if self.rules_path is not None and self.reload_interval > 0:
+            self._spawn(self._watch_rules())
+
+    async def serve_forever(self) -> None:
+        await asyncio.gather(*(server.serve_forever() for server in self._servers))
+
+    async def close(self) -> None:
+        """Stop listening, finish queued work and shut the sanitizer pool down."""
+        for server in self._servers:
+            server.close()
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers.clear()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._generation is not None:
+            await self._generation.retire()
+            self._generation = None
+        if self.socket_path is not None:
+            self.socket_path.unlink(missing_ok=True)
+            self.socket_path = None
+
+    async def reload(self) -> bool:
+        """Reload ``rules_path`` if it changed; return whether new rules were swapped in."""
+        if self.rules_path is None:
+            return False
+        async with self._reload_lock:
+            try:
+                stamp = _file_stamp(self.rules_path)
+            except OSError as exc:
+                # Report a missing file once; it is reloaded as soon as it reappears.
+                if self._rules_stamp is not None:
+                    self._rules_stamp = None
+                    self.stats.reloads["error"] += 1
+                    typer.echo(f"Keeping previous rules: {exc}", err=True)
+                return False
+            if stamp == self._rules_stamp:
+                return False
+            try:
+                rule_pack = await asyncio.to_thread(self._load_rules)
+            except (OSError, ValueError) as exc:
+                self._rules_stamp = stamp  # do not retry until the file changes again
+                self.stats.reloads["error"] += 1
+                typer.echo(f"Keeping previous rules: {self.rules_path}: {exc}", err=True)
+                return False
+            self.stats.reloads["ok"] += 1
+            if rule_pack.fingerprint == self.fingerprint:
+                return False
+            previous = self._generation
+            self._generation = await self._start_generation(rule_pack)
+            assert previous is not None
+            self._retired_batches += previous.sanitizer.batches
+            self._retired_chunks += previous.sanitizer.batched_chunks
+            self._spawn(previous.retire())
+            typer.echo(f"Reloaded rules {rule_pack.fingerprint[:12]}", err=True)
+            return True
+
+    def _load_rules(self) -> RulePack:
+        if self.rules_path is None:
+            return default_rule_pack()
+        self._rules_stamp = _file_stamp(self.rules_path)
+        rule_pack = load_rule_pack(self.rules_path)
+        if self.strict_patterns:
+            check_rule_pack_safety(rule_pack)
+        return rule_pack
+
+    async def _start_generation(self, rule_pack: RulePack) -> _Generation:
+        use_processes = self.workers > 1
+        sanitizer = AsyncSanitizer(
+            require_citations=self.require_citations,
+            # Worker processes compile the rules file themselves (it was just checked here).
+            rule_pack=None if use_processes else rule_pack,
+            rules_path=self.rules_path if use_processes else None,
+            markdown_aware=self.markdown_aware,
+            mask_secrets=self.mask_secrets,
+            max_batch_size=self.max_batch_size,
+            max_batch_delay=self.max_batch_delay,
+            queue_depth=self.queue_depth,
+            workers=self.workers,
+            use_processes=use_processes,
+        )
+        await sanitizer.start()
+        return _Generation(sanitizer, rule_pack.fingerprint)
+
+    def _spawn(self, coroutine: Any) -> None:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _watch_rules(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self._safe_reload()
+
+    async def _safe_reload(self) -> tuple[bool, str | None]:
+        """`reload`, reporting an unexpected failure instead of raising it."""
+        try:
+            return await self.reload(), None
+        except Exception as exc:  # noqa: BLE001 - the previous rules keep serving
+            self.stats.reloads["error"] += 1
+            typer.echo(f"Rules reload failed: {exc}", err=True)
+            return False, str(exc)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, keep_alive, content_type, body = request
+                status, response_type, payload = await self._respond(
+                    method, target, content_type, body
+                )
+                head = (
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {response_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                )
+                writer.write(head.encode("ascii") + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except _HttpError as exc:
+            # The request could not be framed, so the connection cannot be reused.
+            payload = _error_json(str(exc))
+            writer.write(
+                f"HTTP/1.1 {exc.status} {_REASONS.get(exc.status, '')}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                "Connection: close\r\n\r\n".encode("ascii")
+                + payload
+            )
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> tuple[str, str, bool, str, bytes] | None:
+        """Read one HTTP/1.x request; None at a clean end of the connection."""
+        request_line = await _read_line(reader, "request line")
+        if not request_line.strip():
+            return None
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise _HttpError("malformed request line") from None
+        headers: dict[str, str] = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await _read_line(reader, "header line")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise _HttpError("too many headers")
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise _HttpError("chunked request bodies are not supported", 411)
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise _HttpError("invalid Content-Length") from None
+        if length < 0:
+            raise _HttpError("invalid Content-Length")
+        if length > self.max_request_bytes:
+            raise _HttpError(f"request body exceeds {self.max_request_bytes} bytes", 413)
+        body = await reader.readexactly(length) if length else b""
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method, target, keep_alive, headers.get("content-type", ""), body
+
+    async def _respond(
+        self, method: str, target: str, content_type: str, body: bytes
+    ) -> tuple[int, str, bytes]:
+        path = target.split("?", 1)[0]
+        routes = {
+            "/sanitize": "POST",
+            "/reload": "POST",
+            "/metrics": "GET",
+            "/stats": "GET",
+            "/healthz": "GET",
+        }
+        if path not in routes:
+            return 404, "application/json", _error_json(f"no route {path}")
+        if method != routes[path]:
+            return 405, "application/json", _error_json(f"{path} expects {routes[path]}")
+        if path == "/sanitize":
+            return await self._sanitize(content_type, body)
+        if path == "/reload":
+            reloaded, error = await self._safe_reload()
+            if error is not None:
+                return 500, "application/json", _error_json(f"reload failed: {error}")
+            payload = {"reloaded": reloaded, "rules": self.fingerprint}
+            return 200, "application/json", json.dumps(payload).encode("ascii")
+        fingerprint = self.fingerprint
+        batches = self._retired_batches + self._sanitizer.batches
+        batched_chunks = self._retired_chunks + self._sanitizer.batched_chunks
+        if path == "/metrics":
+            text = self.stats.to_prometheus(
+                fingerprint=fingerprint, batches=batches, batched_chunks=batched_chunks
+            )
+            return 200, "text/plain; version=0.0.4", text.encode("utf-8")
+        if path == "/stats":
+            stats = self.stats.to_dict(
+                fingerprint=fingerprint, batches=batches, batched_chunks=batched_chunks
+            )
+            return 200, "application/json", json.dumps(stats, sort_keys=True).encode("ascii")
+        return 200, "application/json", b'{"status": "ok"}'
+
+    @property
+    def _sanitizer(self) -> AsyncSanitizer:
+        assert self._generation is not None
+        return self._generation.sanitizer
+
+    async def _sanitize(self, content_type: str, body: bytes) -> tuple[int, str, bytes]:
+        started = perf_counter()
+        is_json = content_type.split(";", 1)[0].strip().lower() == "application/json"
+        chunks: list[Chunk] = []
+        try:
+            single = _parse_body(body, is_json, chunks)
+        except _HttpError as exc:
+            self.stats.observe(exc.status, 0, len(body), perf_counter() - started)
+            return exc.status, "application/json", _error_json(str(exc))
+
+        generation = self._generation
+        assert generation is not None
+        generation.acquire()
+        try:
+            results = await asyncio.gather(
+                *(generation.sanitizer.sanitize(chunk) for chunk in chunks)
+            )
+        except Exception as exc:  # noqa: BLE001 - reported to the client
+            self.stats.observe(500, 0, len(body), perf_counter() - started)
+            return 500, "application/json", _error_json(f"sanitize failed: {exc}")
+        finally:
+            generation.release()
+
+        lines = [result.to_json() for result in results]
+        if not is_json:
+            response_type = "application/x-ndjson"
+            payload = "".join(line + "\n" for line in lines)
+        elif single:
+            response_type = "application/json"
+            payload = lines[0]
+        else:
+            response_type = "application/json"
+            payload = "[" + ", ".join(lines) + "]"
+        self.stats.observe(200, len(chunks), len(body), perf_counter() - started)
+        return 200, response_type, payload.encode("ascii")
+
+
+async def serve(server: SanitizerServer, *, port: int | None, socket_path: Path | None) -> None:
+    """Run ``server`` until interrupted or sent SIGTERM; SIGHUP reloads the rules."""
+    import signal
+
+    await server.start(port=port, socket_path=socket_path)
+    loop = asyncio.get_running_loop()
+    main = asyncio.current_task()
+    assert main is not None
+    try:
+        loop.add_signal_handler(signal.SIGTERM, main.cancel)
+        loop.add_signal_handler(signal.SIGHUP, lambda: server._spawn(server._safe_reload()))
+    except (AttributeError, NotImplementedError):  # pragma: no cover - Windows
+        pass
+    where = []
+    if server.port is not None:
+        where.append(f"http://{HOST}:{server.port}")
+    if server.socket_path is not None:
+        where.append(f"unix:{server.socket_path}")
+    typer.echo(f"Serving rules {server.fingerprint[:12]} on {' and '.join(where)}", err=True)
+    try:
+        await server.serve_forever()
+    except asyncio.CancelledError:
+        pass  # a clean shutdown
+    finally:
+        await server.close()
+
+
+def serve_until_stopped(
+    server: SanitizerServer, *, port: int | None, socket_path: Path | None
+) -> None:
+    """Blocking entry point for `serve`; returns once the server has shut down."""
+    try:
+        asyncio.run(serve(server, port=port, socket_path=socket_path))
+    except KeyboardInterrupt:
+        pass
+
+
+def _parse_body(body: bytes, is_json: bool, chunks: list[Chunk]) -> bool:
+    """Append the chunks of a request body to ``chunks``; True for a single JSON object."""
+    if not is_json:
+        for line_number, line in iter_jsonl_lines(io.BytesIO(body)):
+            try:
+                chunks.append(parse_chunk(line))
+            except Exception as exc:  # noqa: BLE001 - reported like the CLI does
+                raise _HttpError(f"Invalid JSONL line {line_number}: {exc}") from None
+        return False
+    try:
+        payload = loads(body)
+    except ValueError as exc:
+        raise _HttpError(f"Invalid JSON body: {exc}") from None
+    items = [payload] if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        raise _HttpError("JSON body must be a chunk object or a non-empty array of them")
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise _HttpError(f"JSON item {index} is not an object")
+        chunks.append(chunk_from_dict(item))
+    return isinstance(payload, dict)
+
+
+async def _read_line(reader: asyncio.StreamReader, what: str) -> bytes:
+    """`StreamReader.readline`, failing the request when the line exceeds the stream limit."""
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise _HttpError(f"{what} too long", 431) from None
+
+
+def _error_json(message: str) -> bytes:
+    return json.dumps({"error": message}).encode("ascii")
+
+
+def _file_stamp(path: Path) -> tuple[int, int]:
+    status = path.stat()
+    return status.st_mtime_ns, status.st_size
+
+
+def _remove_stale_socket(path: Path) -> None:
+    """Remove a socket file left behind by a previous server; refuse other files."""
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(f"{path} exists and is not a socket")
+    path.unlink()
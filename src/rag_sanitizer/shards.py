@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import mmap
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from rag_sanitizer.profiling import Profiler
+from rag_sanitizer.summary import RunSummary
+
+# Bytes copied out of the mapping at a time; lines longer than this are read whole.
+_BLOCK_SIZE = 1 << 20
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """Shard ``index`` (0-based) of ``count`` equal byte ranges of one input file."""
+
+    index: int
+    count: int
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+def parse_shard_spec(value: str) -> ShardSpec:
+    """Parse ``"i/N"`` with ``0 <= i < N``."""
+    index_text, separator, count_text = value.partition("/")
+    try:
+        index, count = int(index_text), int(count_text)
+    except ValueError:
+        index = count = -1
+    if not separator or count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard must be 'i/N' with 0 <= i < N, got {value!r}")
+    return ShardSpec(index, count)
+
+
+def shard_bounds(data: bytes | mmap.mmap, spec: ShardSpec) -> tuple[int, int]:
+    """Return the ``[start, end)`` byte range of ``spec``, aligned to line starts.
+
+    The file is cut at ``size * i // N`` and every cut is moved forward to the start of
+    the next line, so the shards partition the lines: each line belongs to the shard its
+    first byte falls in.
+    """
+    size = len(data)
+    return _line_start(data, size * spec.index // spec.count), _line_start(
+        data, size * (spec.index + 1) // spec.count
+    )
+
+
+def iter_range_lines(data: bytes | mmap.mmap, start: int, end: int) -> Iterator[bytes]:
+    """Yield the raw lines in ``data[start:end]``, copying a block at a time.
+
+    Lines split like a binary file's iterator, except that a lone ``"\\r"`` also ends a
+    line; `iter_jsonl_lines` numbers the result the same way either way.
+    """
+    position = start
+    while position < end:
+        stop = min(position + _BLOCK_SIZE, end)
+        if stop < end:
+            newline = data.rfind(b"\n", position, stop)
+            if newline == -1:
+                newline = data.find(b"\n", stop, end)
+            stop = end if newline == -1 else newline + 1
+        yield from data[position:stop].splitlines(keepends=True)
+        position = stop
+
+
+@contextmanager
+def open_shard(
+    path: Path, spec: ShardSpec, *, offset: int | None = None
+) -> Iterator[tuple[Iterator[bytes], int, int]]:
+    """Memory-map ``path`` and yield ``(raw lines, start, end)`` for shard ``spec``.
+
+    With ``offset`` (a line start inside the shard, e.g. from a checkpoint) lines are
+    read from there instead of from ``start``.
+    """
+    with path.open("rb") as handle:
+        if path.stat().st_size == 0:
+            # Empty files cannot be mapped; every shard is empty.
+            yield iter(()), 0, 0
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start, end = shard_bounds(data, spec)
+            first = start if offset is None else offset
+            if not start <= first <= end:
+                raise ValueError(f"offset {first} is outside shard {spec} ({start}-{end})")
+            yield iter_range_lines(data, first, end), start, end
+
+
+def summary_fragment(
+    summary: RunSummary,
+    spec: ShardSpec,
+    *,
+    input_path: Path,
+    start: int,
+    end: int,
+    profiler: Profiler | None = None,
+) -> dict[str, Any]:
+    """The shard's `RunSummary.to_dict` plus the metadata `merge_fragments` checks."""
+    payload = summary.to_dict()
+    payload["shard"] = {
+        "index": spec.index,
+        "count": spec.count,
+        "input": str(input_path),
+        "input_bytes": input_path.stat().st_size,
+        "start": start,
+        "end": end,
+    }
+    if profiler is not None:
+        payload["profile"] = profiler.to_dict()
+    return payload
+
+
+def merge_fragments(fragments: list[dict[str, Any]]) -> dict[str, Any]:
+    """Combine one summary fragment per shard into the summary of a serial run.
+
+    Raises `ValueError` unless the fragments are exactly shards ``0..N-1`` of one input.
+    """
+    if not fragments:
+        raise ValueError("no summary fragments to merge")
+    shards = []
+    for fragment in fragments:
+        shard = fragment.get("shard")
+        if not isinstance(shard, dict):
+            raise ValueError("not a shard summary fragment (no 'shard' section)")
+        shards.append(shard)
+    count = shards[0]["count"]
+    inputs = {(shard["input"], shard["input_bytes"]) for shard in shards}
+    if len(inputs) > 1 or any(shard["count"] != count for shard in shards):
+        raise ValueError("fragments come from different inputs or shard counts")
+    indices = [shard["index"] for shard in shards]
+    duplicates = sorted({index for index in indices if indices.count(index) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate shards {duplicates}")
+    if any(not 0 <= index < count for index in indices):
+        raise ValueError(f"shard index out of range for {count} shards")
+    missing = sorted(set(range(count)) - set(indices))
+    if missing:
+        raise ValueError(f"fragments do not cover all {count} shards: missing shards {missing}")
+
+    merged = RunSummary()
+    profiles = []
+    for fragment in fragments:
+        merged.merge(RunSummary.from_dict(fragment))
+        if "profile" in fragment:
+            profiles.append(Profiler.from_dict(fragment["profile"]))
+    payload = merged.to_dict()
+    if profiles:
+        profiler = profiles[0]
+        for other in profiles[1:]:
+            profiler.merge(other)
+        payload["profile"] = profiler.to_dict()
+    return payload
+
+
+def _line_start(data: bytes | mmap.mmap, offset: int) -> int:
+    """The first line start at or after ``offset``."""
+    if offset == 0:
+        return 0
+    newline = data.find(b"\n", offset - 1)
+    return len(data) if newline == -1 else newline + 1
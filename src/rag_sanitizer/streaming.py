@@ -0,0 +1,733 @@
+from __future__ import annotations
+
+import codecs
+import json
+import re
+import sys
+import tempfile
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from json.encoder import encode_basestring_ascii
+from typing import IO, Any
+
+from rag_sanitizer.codec import iter_jsonl_lines
+from rag_sanitizer.markdown import MarkdownRegion, segmenter, skipped_spans, unskipped_parts
+from rag_sanitizer.sanitizer import (
+    OTHER_LINE_BREAKS,
+    PatternHits,
+    RulePack,
+    SanitizedChunk,
+    TextScan,
+    chunk_from_dict,
+    default_rule_pack,
+    find_instruction_hits,
+    is_tool_line,
+    result_from_scan,
+    scan_without_text,
+)
+from rag_sanitizer.summary import RunSummary
+
+# Characters of a streamed text held at a time, up to a small constant factor: lines and
+# secret matches shorter than half of it are handled exactly.
+DEFAULT_WINDOW = 1 << 20
+MIN_WINDOW = 64
+
+_BREAK_CHARS = ("\n", *OTHER_LINE_BREAKS)
+_LINE_BREAKS = frozenset(_BREAK_CHARS)
+# One `str.splitlines` line boundary; "\r\n" counts once.
+_BREAK = re.compile("\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+_JSON_SPACE = re.compile(r"[ \t\n\r]*")
+# Lines are stripped with `str.strip` before decoding, so any whitespace may surround them.
+_SPACE = re.compile(r"\s*")
+# A run of complete string tokens. A high-surrogate escape is only taken once what follows
+# it is known, so a pair is never split across two decoded pieces.
+_STRING_BODY = re.compile(
+    r'(?:[^"\\]+'
+    r"|\\[^u]"
+    r"|\\u[dD][89abAB][0-9a-fA-F]{2}(?=[^\\]|\\[^u]|\\u[0-9a-fA-F]{4})"
+    r"|\\u(?![dD][89abAB])[0-9a-fA-F]{4})*"
+)
+# The longest escape a piece can end inside: a surrogate pair.
+_LONGEST_ESCAPE = 12
+_DECODER = json.JSONDecoder()
+
+
+@dataclass
+class _LongLine:
+    """Progress through a line longer than half the window, matched in segments."""
+
+    searched: int
+    skip: bool
+    matched: set[int] = field(default_factory=set)
+    tool_like: bool = False
+
+
+class StreamScanner:
+    """Scan one chunk text that arrives in pieces, holding only a window of it.
+
+    Feed the text with `feed` and call `finish` for its `TextScan`, whose
+    ``sanitized_text`` is empty: the sanitized text goes to a temporary file as the
+    scan goes and is read back with `iter_text`. Line numbers, Markdown fence state,
+    ``"\\r\\n"`` pairs and secret matches carry across piece boundaries, so the result
+    equals `scan_text` as long as every line and every secret match is shorter than
+    half the window. Longer lines are matched in overlapping segments (a match must fit
+    in half a window, and their Markdown regions are read from their first half
+    window); longer secret matches are cut at the window.
+
+    Markdown-aware scans need ``last_comment_close``, the offset of the text's last
+    ``-->`` (-1 if none), because whether an HTML comment opens depends on it.
+    """
+
+    def __init__(
+        self,
+        rule_pack: RulePack | None = None,
+        *,
+        markdown_aware: bool = False,
+        window: int = DEFAULT_WINDOW,
+        last_comment_close: int = -1,
+    ) -> None:
+        if window < MIN_WINDOW:
+            raise ValueError(f"window must be at least {MIN_WINDOW} characters")
+        self.rule_pack = rules = rule_pack or default_rule_pack()
+        self.window = window
+        self._reach = window // 2
+        self._markdown = markdown_aware and bool(rules.markdown_skip)
+        self._last_comment_close = last_comment_close
+        self._buffer = ""
+        self._base = 0
+        self._fresh = 0
+        self._final = False
+
+        # Instruction lines. Markdown-aware scans hold the last complete line back until
+        # the line after it is known.
+        self._line_start = 0
+        self._line_number = 1
+        self._long: _LongLine | None = None
+        self._regions: list[MarkdownRegion] = []
+        self._segment = (
+            segmenter(self._regions.append, rules.markdown_skip) if self._markdown else None
+        )
+        self._instruction: list[tuple[int, int]] = []
+        self._tool_like = False
+        self._decided = 0
+        self._removed: deque[int] = deque()
+
+        # Secrets: where each pattern's next match may start, and whether an empty match
+        # was already taken there (as `re.finditer` does not repeat it).
+        count = len(rules.secret_patterns)
+        self._resume = [0] * count
+        self._empty_at = [-1] * count
+        self._secrets: dict[int, list[tuple[int, int]]] = {}
+        self._unmasked: list[tuple[int, int, int]] = []
+        self._run: list[int] | None = None
+        self._masked_to = 0
+
+        # Output: masked lines joined by "\n" with redacted lines rolled back; the
+        # stripped text is the byte range first:last.
+        self._out = tempfile.TemporaryFile()
+        self._written = 0
+        self._first = -1
+        self._last = 0
+        self._out_line = 1
+        self._snapshot = (0, -1, 0)
+        self._held: list[str] = []
+        self._lf_pending = False
+
+    def feed(self, text: str) -> None:
+        """Scan the next piece of the text."""
+        if self._final:
+            raise ValueError("feed() after finish()")
+        reach = self._reach
+        for start in range(0, len(text), reach):
+            piece = text[start : start + reach]
+            self._buffer += piece
+            self._fresh += len(piece)
+            # Small pieces are collected so that each pass covers a good part of a window.
+            if self._fresh >= reach:
+                self._advance()
+
+    def finish(self) -> TextScan:
+        """Scan the rest of the text and return its `TextScan` (without the text)."""
+        if not self._final:
+            self._final = True
+            self._advance()
+            # Lines past the end of the text (extra masked line breaks) are never redacted.
+            self._decided = sys.maxsize
+            self._release()
+            if self._removed and self._removed[0] == self._out_line:
+                self._rollback()
+        hits = PatternHits(
+            instruction=tuple(self._instruction),
+            secrets={index: tuple(spans) for index, spans in sorted(self._secrets.items())},
+        )
+        return scan_without_text(self.rule_pack, hits, tool_like=self._tool_like)
+
+    def iter_text(self) -> Iterator[str]:
+        """Yield the sanitized text in pieces of at most a window; call after `finish`."""
+        if not self._final:
+            raise ValueError("iter_text() before finish()")
+        if self._first < 0:
+            return
+        decoder = codecs.getincrementaldecoder("utf-8")("surrogatepass")
+        self._out.seek(self._first)
+        left = self._last - self._first
+        while left > 0:
+            data = self._out.read(min(left, self.window))
+            left -= len(data)
+            text = decoder.decode(data, final=left <= 0)
+            if text:
+                yield text
+
+    def close(self) -> None:
+        self._out.close()
+
+    def __enter__(self) -> StreamScanner:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _advance(self) -> None:
+        self._fresh = 0
+        self._match_lines()
+        self._match_secrets()
+        self._release()
+        self._emit()
+        self._trim()
+
+    # Instruction lines
+
+    def _match_lines(self) -> None:
+        text = self._buffer
+        base = self._base
+        reach = self._reach
+        while self._long is not None:
+            if not self._continue_long():
+                return
+        start = self._line_start - base
+        if self._final:
+            if start < len(text):
+                self._match_block(start, len(text), None, hold_last=False)
+            return
+        block_end = self._last_break(start)
+        partial_from = start if block_end < 0 else block_end
+        long_next = len(text) - partial_from > reach
+        if block_end >= 0:
+            lookahead = text[partial_from : partial_from + reach] if long_next else None
+            self._match_block(start, block_end, lookahead, hold_last=not long_next)
+        if long_next and self._line_start == base + partial_from:
+            self._start_long()
+            self._continue_long()
+
+    def _last_break(self, start: int) -> int:
+        """Index just past the buffer's last complete line break at or after ``start``."""
+        text = self._buffer
+        last = text.rfind("\n", start)
+        tail = max(start, last + 1)
+        for char in OTHER_LINE_BREAKS:
+            last = max(last, text.rfind(char, tail))
+        if last == len(text) - 1 and text[last] == "\r" and not self._final:
+            # Possibly the first half of a "\r\n" split across pieces.
+            last = max(text.rfind(char, start, last) for char in _BREAK_CHARS)
+        return last if last < 0 else last + 1
+
+    def _match_block(self, start: int, end: int, lookahead: str | None, *, hold_last: bool) -> None:
+        """Match the complete lines in ``buffer[start:end]``."""
+        rules = self.rule_pack
+        block = self._buffer[start:end]
+        skipped: dict[int, list[tuple[int, int]]] | None = None
+        if self._segment is not None:
+            ends = block.splitlines(keepends=True)
+            lines = block.splitlines()
+            count = len(lines) - 1 if hold_last else len(lines)
+            if count <= 0:
+                return
+            self._regions.clear()
+            position = self._base + start
+            for index in range(count):
+                position += len(ends[index])
+                next_line = lines[index + 1] if index + 1 < len(lines) else lookahead
+                closes_later = self._last_comment_close >= position
+                self._segment.send((index, lines[index], next_line, closes_later))
+            skipped = skipped_spans(self._regions, rules.markdown_skip)
+            block = block[: position - self._base - start]
+        elif any(char in block for char in OTHER_LINE_BREAKS):
+            count = len(block.splitlines())
+        else:
+            count = block.count("\n") + (0 if block.endswith("\n") else 1)
+        hits, tool_like = find_instruction_hits(
+            block, rules, markdown_aware=self._markdown, skipped=skipped
+        )
+        offset = self._line_number - 1
+        for line_number, pattern in hits:
+            line_number += offset
+            if not self._removed or self._removed[-1] != line_number:
+                self._removed.append(line_number)
+            self._instruction.append((line_number, pattern))
+        self._tool_like = self._tool_like or tool_like
+        self._line_number += count
+        self._decided = self._line_number - 1
+        self._line_start += len(block)
+
+    def _start_long(self) -> None:
+        skip = False
+        if self._segment is not None:
+            prefix = self._buffer[self._line_start - self._base :][: self._reach]
+            self._regions.clear()
+            closes_later = self._last_comment_close >= self._line_start + len(prefix)
+            self._segment.send((0, prefix, None, closes_later))
+            spans = skipped_spans(self._regions, self.rule_pack.markdown_skip).get(0)
+            skip = spans is not None and unskipped_parts(prefix, spans) is None
+        self._long = _LongLine(searched=self._line_start, skip=skip)
+
+    def _continue_long(self) -> bool:
+        """Match the long line's new text; True once the line has ended."""
+        long = self._long
+        assert long is not None
+        text = self._buffer
+        base = self._base
+        found = _BREAK.search(text, long.searched - base)
+        if found is not None and not (
+            found.group() == "\r" and found.end() == len(text) and not self._final
+        ):
+            line_end, break_end = base + found.start(), base + found.end()
+        else:
+            line_end = base + len(text) if found is None else base + found.start()
+            break_end = -1
+            if self._final:
+                break_end = line_end
+        if line_end > long.searched:
+            segment = text[
+                max(self._line_start, long.searched - self._reach) - base : line_end - base
+            ]
+            if not long.skip:
+                matcher = self.rule_pack.instruction_matcher
+                long.matched.update(matcher.search(segment, matcher.candidates(segment)))
+            long.tool_like = long.tool_like or is_tool_line(segment)
+            long.searched = line_end
+        if break_end < 0:
+            return False
+        line_number = self._line_number
+        if long.matched:
+            self._instruction.extend((line_number, pattern) for pattern in sorted(long.matched))
+            self._removed.append(line_number)
+            self._tool_like = self._tool_like or long.tool_like
+        self._decided = line_number
+        self._line_number += 1
+        self._line_start = break_end
+        self._long = None
+        return True
+
+    # Secrets
+
+    def _match_secrets(self) -> None:
+        patterns = self.rule_pack.secret_patterns
+        if not patterns:
+            return
+        text = self._buffer
+        base = self._base
+        end = base + len(text)
+        final = self._final
+        # Matches ending past ``limit`` may still grow; those starting before ``floor``
+        # have had a whole window and are taken as they are.
+        limit = end if final else end - self._reach
+        floor = end - self.window
+        low = min(self._resume)
+        candidates = set(self.rule_pack.secret_matcher.candidates(text[low - base :]))
+        collect = self.rule_pack.secret_mask is not None
+        for index, pattern in enumerate(patterns):
+            position = self._resume[index]
+            empty_at = self._empty_at[index]
+            deferred = -1
+            if index in candidates:
+                for match in pattern.finditer(text, position - base):
+                    start = base + match.start()
+                    stop = base + match.end()
+                    if start == stop == empty_at:
+                        continue
+                    if stop > limit and start >= floor and not final:
+                        deferred = start
+                        break
+                    spans = self._secrets.setdefault(index, [])
+                    if stop > start:
+                        spans.append((start, stop))
+                        if collect:
+                            self._unmasked.append((start, stop, index))
+                    position = stop
+                    empty_at = start if stop == start else -1
+            if deferred >= 0:
+                if deferred != empty_at:
+                    empty_at = -1
+                position = deferred
+            elif position < limit:
+                # No match shorter than half a window can start before ``limit`` now.
+                position = limit
+                empty_at = -1
+            self._resume[index] = position
+            self._empty_at[index] = empty_at
+
+    # Output
+
+    def _emit(self) -> None:
+        """Write the text that no later match can change, with secrets masked."""
+        text = self._buffer
+        base = self._base
+        end = base + len(text)
+        mask = self.rule_pack.secret_mask
+        if mask is None:
+            upto = end
+        else:
+            settled = end if self._final or not self._resume else min(self._resume)
+            self._unmasked.sort()
+            ready = [span for span in self._unmasked if span[0] < settled]
+            del self._unmasked[: len(ready)]
+            pieces: list[str] = []
+            for start, stop, _ in ready:
+                run = self._run
+                if run is not None and start <= run[1]:
+                    run[1] = max(run[1], stop)
+                    continue
+                if run is not None:
+                    self._close_run(pieces, mask)
+                self._run = [start, stop]
+            # A span starting at a run's end still joins it, so close it only below that.
+            if self._run is not None and (self._final or self._run[1] < settled):
+                self._close_run(pieces, mask)
+            upto = settled if self._run is None else self._run[0]
+            if pieces:
+                self._write("".join(pieces))
+        if upto > self._masked_to:
+            self._write(text[self._masked_to - base : upto - base])
+            self._masked_to = upto
+
+    def _close_run(self, pieces: list[str], mask: str) -> None:
+        run = self._run
+        assert run is not None
+        base = self._base
+        text = self._buffer
+        pieces.append(text[self._masked_to - base : run[0] - base])
+        pieces.append(mask)
+        # As in `_masked_text`, the mask keeps the line breaks it covers.
+        pieces.extend(char for char in text[run[0] - base : run[1] - base] if char in _LINE_BREAKS)
+        self._masked_to = run[1]
+        self._run = None
+
+    def _write(self, text: str) -> None:
+        if not text:
+            return
+        if self._lf_pending:
+            self._lf_pending = False
+            if text[0] == "\n":
+                text = text[1:]
+        if any(char in text for char in OTHER_LINE_BREAKS):
+            self._lf_pending = text.endswith("\r")
+            text = _BREAK.sub("\n", text)
+        self._write_lines(text)
+
+    def _write_lines(self, text: str) -> None:
+        """Write ``text`` (lines joined by "\\n") as the continuation of the output."""
+        if self._held:
+            self._held.append(text)
+            return
+        lines = text.split("\n")
+        # lines[0] continues the output line being written; lines[i] ends that line's
+        # i-th successor. Nothing past the line break of an undecided line is written.
+        count = len(lines) - 1
+        first_line = self._out_line
+        decided = self._decided - first_line + 1
+        if decided < count:
+            self._held.append("\n" + "\n".join(lines[decided + 1 :]))
+            count = max(decided, 0)
+            del lines[count + 1 :]
+        removed = self._removed
+        drop: set[int] = set()
+        while removed and removed[0] < first_line + count:
+            drop.add(removed.popleft() - first_line)
+        if 0 in drop:
+            # The line began in an earlier piece; take back what was written of it.
+            self._rollback()
+        middle = [lines[i] for i in range(1, count) if i not in drop] if drop else lines[1:count]
+        # Each line starts with its "\n" separator, which strip() drops at the start.
+        head = "" if 0 in drop else lines[0]
+        self._put(head + "\n" + "\n".join(middle) if middle else head)
+        if count:
+            self._snapshot = (self._written, self._first, self._last)
+            self._put("\n" + lines[count])
+            self._out_line += count
+
+    def _release(self) -> None:
+        """Write output held for a line verdict once the verdict is known."""
+        if self._held and self._out_line <= self._decided:
+            text = "".join(self._held)
+            self._held.clear()
+            self._write_lines(text)
+
+    def _put(self, text: str) -> None:
+        if not text:
+            return
+        data = text.encode("utf-8", "surrogatepass")
+        content = text.lstrip()
+        if content:
+            lead = len(text) - len(content)
+            tail = len(text.rstrip())
+            if not text.isascii():
+                lead = len(text[:lead].encode("utf-8", "surrogatepass"))
+                tail = len(text[:tail].encode("utf-8", "surrogatepass"))
+            if self._first < 0:
+                self._first = self._written + lead
+            self._last = self._written + tail
+        self._out.write(data)
+        self._written += len(data)
+
+    def _rollback(self) -> None:
+        """Drop the output line being written, a redacted one."""
+        self._written, self._first, self._last = self._snapshot
+        self._out.seek(self._written)
+        self._out.truncate()
+
+    def _trim(self) -> None:
+        keep = self._masked_to
+        if self._long is not None:
+            keep = min(keep, max(self._line_start, self._long.searched - self._reach))
+        else:
+            keep = min(keep, self._line_start)
+        if self._resume:
+            # Look-behinds and word boundaries see half a window of context.
+            keep = min(keep, min(self._resume) - self._reach)
+        drop = keep - self._base
+        if drop > self._reach:
+            self._buffer = self._buffer[drop:]
+            self._base = keep
+
+
+class LongLine:
+    """A JSONL line too long to read at once, as handed out by `iter_stream_lines`."""
+
+    def __init__(self, stream: IO[bytes], head: bytes, size: int) -> None:
+        self._stream = stream
+        self._head: bytes | None = head
+        self._size = size
+        self._done = head.endswith(b"\n")
+
+    def pieces(self) -> Iterator[bytes]:
+        """Yield the line's bytes in pieces of at most the window; once only."""
+        if self._head is not None:
+            head, self._head = self._head, None
+            yield head
+        while not self._done:
+            piece = self._stream.readline(self._size)
+            self._done = not piece or piece.endswith(b"\n")
+            if piece:
+                yield piece
+
+    def drain(self) -> None:
+        """Skip whatever of the line has not been read."""
+        for _ in self.pieces():
+            pass
+
+
+def iter_stream_lines(
+    stream: IO[bytes], window: int = DEFAULT_WINDOW, *, universal_newlines: bool = True
+) -> Iterator[tuple[int, bytes | LongLine]]:
+    """`iter_jsonl_lines` over a binary file object, without reading long lines whole.
+
+    Lines up to ``window`` bytes come as bytes; longer ones as a `LongLine` to be read
+    in pieces (for `sanitize_long_line`) before the next line is requested, as whatever
+    is left of it is skipped. A long line counts as one line even if it holds a lone
+    ``"\\r"``.
+    """
+    line_number = 0
+    while True:
+        raw = stream.readline(window)
+        if not raw:
+            return
+        if len(raw) < window or raw.endswith(b"\n"):
+            for number, line in iter_jsonl_lines([raw], universal_newlines=universal_newlines):
+                yield line_number + number, line
+            line_number += len(raw.splitlines()) if universal_newlines and b"\r" in raw else 1
+            continue
+        line_number += 1
+        long_line = LongLine(stream, raw, window)
+        yield line_number, long_line
+        long_line.drain()
+
+
+def sanitize_long_line(
+    pieces: Iterable[bytes],
+    out: IO[bytes],
+    *,
+    rule_pack: RulePack | None = None,
+    markdown_aware: bool = False,
+    require_citations: bool = True,
+    window: int = DEFAULT_WINDOW,
+    summary: RunSummary | None = None,
+) -> SanitizedChunk | None:
+    """Sanitize one JSONL line read in pieces and write its output line to ``out``.
+
+    Only the ``text`` field is streamed: it is decoded to a temporary file, scanned
+    with a `StreamScanner` and written out from another, so neither copy is held in
+    memory; other fields must fit in ``window``. Writes the same JSON as
+    `SanitizedChunk.to_json_bytes`, without a newline, and returns the result with an
+    empty ``sanitized_text``; returns None (writing nothing) for a blank line. Invalid
+    lines raise ValueError before anything is written. The result is recorded in
+    ``summary``, if given.
+    """
+    rules = rule_pack or default_rule_pack()
+    with tempfile.TemporaryFile() as spool:
+        closes = _CommentCloses()
+
+        def keep(text: str) -> None:
+            spool.write(text.encode("utf-8", "surrogatepass"))
+            closes.feed(text)
+
+        fields = _ObjectReader(iter(pieces), window).read(keep)
+        if fields is None:
+            return None
+        if "text" in fields:
+            keep(str(fields.pop("text")))
+        chunk = chunk_from_dict(fields)
+        spool.seek(0)
+        with StreamScanner(
+            rules,
+            markdown_aware=markdown_aware,
+            window=window,
+            last_comment_close=closes.last,
+        ) as scanner:
+            decoder = codecs.getincrementaldecoder("utf-8")("surrogatepass")
+            while data := spool.read(window):
+                scanner.feed(decoder.decode(data))
+            scan = scanner.finish()
+            result = result_from_scan(chunk, scan, rules, require_citations=require_citations)
+            head, tail = result.to_json_parts()
+            out.write(head.encode("ascii") + b'"')
+            for text in scanner.iter_text():
+                out.write(encode_basestring_ascii(text)[1:-1].encode("ascii"))
+            out.write(b'"' + tail.encode("ascii"))
+    if summary is not None:
+        summary.record(result.flags, result.risk_score, result.chunk_stats(closes.length))
+    return result
+
+
+class _CommentCloses:
+    """Track the length of a text seen in pieces and the offset of its last ``-->``."""
+
+    def __init__(self) -> None:
+        self.last = -1
+        self.length = 0
+        self._carry = ""
+
+    def feed(self, text: str) -> None:
+        joined = self._carry + text
+        found = joined.rfind("-->")
+        if found >= 0:
+            self.last = self.length - len(self._carry) + found
+        self.length += len(text)
+        self._carry = joined[-2:]
+
+
+class _ObjectReader:
+    """Decode one JSON object from byte pieces, streaming its ``text`` string."""
+
+    def __init__(self, pieces: Iterator[bytes], limit: int) -> None:
+        self._pieces = pieces
+        self._limit = limit
+        self._decoder = codecs.getincrementaldecoder("utf-8")("surrogatepass")
+        self._text = ""
+        self._position = 0
+        self._ended = False
+
+    def read(self, sink: Callable[[str], None]) -> dict[str, Any] | None:
+        """Return the object's fields other than a string ``text``, which goes to ``sink``."""
+        char = self._skip(_SPACE)
+        if not char:
+            return None
+        if char != "{":
+            raise ValueError("streamed lines must hold a JSON object")
+        self._position += 1
+        fields: dict[str, Any] = {}
+        streamed = False
+        char = self._skip(_JSON_SPACE)
+        if char == "}":
+            self._position += 1
+        else:
+            while True:
+                if char != '"':
+                    raise ValueError("Expecting property name enclosed in double quotes")
+                key = self._value()
+                if self._skip(_JSON_SPACE) != ":":
+                    raise ValueError("Expecting ':' delimiter")
+                self._position += 1
+                char = self._skip(_JSON_SPACE)
+                if key == "text" and (streamed or "text" in fields):
+                    raise ValueError('streamed lines must have a single "text" field')
+                if key == "text" and char == '"':
+                    self._position += 1
+                    self._string(sink)
+                    streamed = True
+                else:
+                    fields[key] = self._value()
+                char = self._skip(_JSON_SPACE)
+                self._position += 1
+                if char == "}":
+                    break
+                if char != ",":
+                    raise ValueError("Expecting ',' delimiter")
+                char = self._skip(_JSON_SPACE)
+        if self._skip(_SPACE):
+            raise ValueError("Extra data")
+        return fields
+
+    def _more(self) -> bool:
+        while not self._ended:
+            piece = next(self._pieces, None)
+            if piece is None:
+                self._ended = True
+                text = self._decoder.decode(b"", final=True)
+            else:
+                text = self._decoder.decode(piece)
+            if text:
+                self._text = self._text[self._position :] + text
+                self._position = 0
+                return True
+        return False
+
+    def _skip(self, space: re.Pattern[str]) -> str:
+        """Skip ``space``; return the next character, or "" at the end."""
+        while True:
+            self._position = space.match(self._text, self._position).end()  # type: ignore[union-attr]
+            if self._position < len(self._text):
+                return self._text[self._position]
+            if not self._more():
+                return ""
+
+    def _value(self) -> Any:
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._text, self._position)
+            except json.JSONDecodeError:
+                if len(self._text) - self._position > self._limit or not self._more():
+                    raise
+                continue
+            # A number at the end of the buffer may have more digits to come.
+            if end == len(self._text) and self._more():
+                continue
+            self._position = end
+            return value
+
+    def _string(self, sink: Callable[[str], None]) -> None:
+        """Decode the rest of a string into ``sink``, after its opening quote."""
+        while True:
+            text = self._text
+            stop = _STRING_BODY.match(text, self._position).end()  # type: ignore[union-attr]
+            if stop > self._position:
+                sink(json.loads('"' + text[self._position : stop] + '"'))
+                self._position = stop
+            if stop < len(text) and text[stop] == '"':
+                self._position += 1
+                return
+            if stop < len(text) - _LONGEST_ESCAPE or not self._more():
+                if stop < len(text):
+                    raise ValueError("Invalid \\escape")
+                raise ValueError("Unterminated string")
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+# Counters kept by the flagged-source sketch; its counts are exact, and the same however
+# the run is split, as long as a run has no more flagged sources than this.
+SOURCE_SKETCH_SIZE = 64
+# Quantiles reported for the risk and text-length distributions.
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+@dataclass(frozen=True)
+class ChunkStats:
+    """What a distribution-tracking `RunSummary` records of a chunk besides its flags.
+
+    ``source`` is the chunk's source as text (None if it has none); the hit tuples name
+    the matching pattern once per redaction or secret span.
+    """
+
+    text_length: int
+    source: str | None = None
+    instruction_hits: tuple[str, ...] = ()
+    secret_hits: tuple[str, ...] = ()
+
+
+@dataclass
+class HeavyHitters:
+    """Misra-Gries sketch of the most frequent keys, in at most ``size`` counters.
+
+    Every count is low by at most ``error``, and any key seen more than ``error`` times
+    is kept. ``error`` stays 0, and counts exact, while no more than ``size`` distinct
+    keys were added. Sketches merge with the same guarantee for the combined stream, but
+    once ``error`` is positive the kept keys and counts depend on how the stream was split.
+    """
+
+    size: int = SOURCE_SKETCH_SIZE
+    counts: dict[str, int] = field(default_factory=dict)
+    error: int = 0
+
+    def add(self, key: str) -> None:
+        if key in self.counts:
+            self.counts[key] += 1
+        elif len(self.counts) < self.size:
+            self.counts[key] = 1
+        else:
+            self._reduce(1)
+
+    def merge(self, other: HeavyHitters) -> None:
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.error += other.error
+        if len(self.counts) > self.size:
+            self._reduce(sorted(self.counts.values(), reverse=True)[self.size])
+
+    def top(self) -> list[tuple[str, int]]:
+        """The kept keys and their counts, most frequent first."""
+        return sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def _reduce(self, amount: int) -> None:
+        self.counts = {key: count - amount for key, count in self.counts.items() if count > amount}
+        self.error += amount
+
+
+@dataclass
+class RunSummary:
+    """Running counters for a sanitize run, plus its CI gate (`max_risk`/`fail_on_flags`).
+
+    Summaries from independent parts of a run (workers, shards) combine with `merge`
+    into exactly the summary a serial run produces. With ``track_distributions`` they
+    also keep fixed-size distributions: risk scores in 0.01 bins, text lengths in
+    power-of-two buckets, hits per pattern and a `HeavyHitters` sketch of flagged
+    sources. The sketch is the one exception to exact merges: once a run has more than
+    `SOURCE_SKETCH_SIZE` flagged sources it is reported as approximate, and its counts
+    then vary (within its error bound) with how the run was split.
+    """
+
+    max_risk: float | None = None
+    fail_on_flags: frozenset[str] = frozenset()
+    processed: int = 0
+    flagged: int = 0
+    max_seen_risk: float = 0.0
+    flags_count: dict[str, int] = field(default_factory=dict)
+    should_fail: bool = False
+    track_cache: bool = False
+    cache_hits: int = 0
+    cache_misses: int = 0
+    track_distributions: bool = False
+    risk_bins: dict[int, int] = field(default_factory=dict)
+    length_buckets: dict[int, int] = field(default_factory=dict)
+    max_text_length: int = 0
+    instruction_hits: dict[str, int] = field(default_factory=dict)
+    secret_hits: dict[str, int] = field(default_factory=dict)
+    flagged_sources: HeavyHitters = field(default_factory=HeavyHitters)
+
+    def fresh(self) -> RunSummary:
+        """An empty summary with the same gate, for one part of a run."""
+        return RunSummary(
+            max_risk=self.max_risk,
+            fail_on_flags=self.fail_on_flags,
+            track_cache=self.track_cache,
+            track_distributions=self.track_distributions,
+        )
+
+    def record(
+        self, flags: Iterable[str], risk_score: float, stats: ChunkStats | None = None
+    ) -> None:
+        flags = list(flags)
+        self.processed += 1
+        if flags:
+            self.flagged += 1
+            for flag in flags:
+                self.flags_count[flag] = self.flags_count.get(flag, 0) + 1
+        if risk_score > self.max_seen_risk:
+            self.max_seen_risk = risk_score
+        if self.max_risk is not None and risk_score >= self.max_risk:
+            self.should_fail = True
+        if self.fail_on_flags and any(flag in self.fail_on_flags for flag in flags):
+            self.should_fail = True
+        if self.track_distributions:
+            risk_bin = round(risk_score * 100)
+            self.risk_bins[risk_bin] = self.risk_bins.get(risk_bin, 0) + 1
+            if stats is not None:
+                self._record_stats(stats, flagged=bool(flags))
+
+    def _record_stats(self, stats: ChunkStats, *, flagged: bool) -> None:
+        bucket = stats.text_length.bit_length()
+        self.length_buckets[bucket] = self.length_buckets.get(bucket, 0) + 1
+        self.max_text_length = max(self.max_text_length, stats.text_length)
+        for pattern in stats.instruction_hits:
+            self.instruction_hits[pattern] = self.instruction_hits.get(pattern, 0) + 1
+        for pattern in stats.secret_hits:
+            self.secret_hits[pattern] = self.secret_hits.get(pattern, 0) + 1
+        if flagged and stats.source is not None:
+            self.flagged_sources.add(stats.source)
+
+    def record_cache(self, hit: bool) -> None:
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+    def merge(self, other: RunSummary) -> None:
+        self.processed += other.processed
+        self.flagged += other.flagged
+        self.max_seen_risk = max(self.max_seen_risk, other.max_seen_risk)
+        for flag, count in other.flags_count.items():
+            self.flags_count[flag] = self.flags_count.get(flag, 0) + count
+        self.should_fail = self.should_fail or other.should_fail
+        self.track_cache = self.track_cache or other.track_cache
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+        self.track_distributions = self.track_distributions or other.track_distributions
+        _add_counts(self.risk_bins, other.risk_bins)
+        _add_counts(self.length_buckets, other.length_buckets)
+        _add_counts(self.instruction_hits, other.instruction_hits)
+        _add_counts(self.secret_hits, other.secret_hits)
+        self.max_text_length = max(self.max_text_length, other.max_text_length)
+        self.flagged_sources.merge(other.flagged_sources)
+
+    @classmethod
+    def from_dict(cls, payload: dict[str, Any]) -> RunSummary:
+        """Rebuild the counters from `to_dict` output, e.g. a shard's summary fragment."""
+        cache = payload.get("cache")
+        summary = cls(
+            processed=payload["processed"],
+            flagged=payload["flagged"],
+            max_seen_risk=payload["max_risk"],
+            flags_count=dict(payload["flags_count"]),
+            should_fail=payload["failed"],
+            track_cache=cache is not None,
+            cache_hits=cache["hits"] if cache is not None else 0,
+            cache_misses=cache["misses"] if cache is not None else 0,
+        )
+        distributions = payload.get("distributions")
+        if distributions is not None:
+            summary.track_distributions = True
+            summary.risk_bins = {
+                round(value * 100): count for value, count in distributions["risk"]["histogram"]
+            }
+            lengths = distributions["text_length"]
+            summary.length_buckets = {
+                bound.bit_length(): count for bound, count in lengths["histogram"]
+            }
+            summary.max_text_length = lengths["max"]
+            summary.instruction_hits = dict(distributions["pattern_hits"]["instruction"])
+            summary.secret_hits = dict(distributions["pattern_hits"]["secret"])
+            sources = distributions["flagged_sources"]
+            summary.flagged_sources = HeavyHitters(
+                size=sources["size"],
+                counts={source: count for source, count in sources["top"]},
+                error=sources["error"],
+            )
+        return summary
+
+    def to_dict(self) -> dict[str, Any]:
+        payload: dict[str, Any] = {
+            "processed": self.processed,
+            "flagged": self.flagged,
+            "max_risk": round(self.max_seen_risk, 4),
+            "flags_count": self.flags_count,
+            "failed": self.should_fail,
+        }
+        if self.track_cache:
+            payload["cache"] = {"hits": self.cache_hits, "misses": self.cache_misses}
+        if self.track_distributions:
+            payload["distributions"] = self._distributions()
+        return payload
+
+    def _distributions(self) -> dict[str, Any]:
+        risk_quantiles = _quantiles(self.risk_bins)
+        length_quantiles = _quantiles(self.length_buckets)
+        sources = self.flagged_sources
+        # Histograms are ``[value, count]`` pairs in ascending order: JSON object keys
+        # would be sorted as strings when the summary is written.
+        return {
+            "risk": {
+                **{
+                    name: None if value is None else value / 100
+                    for name, value in risk_quantiles.items()
+                },
+                "histogram": [
+                    [value / 100, self.risk_bins[value]] for value in sorted(self.risk_bins)
+                ],
+            },
+            # Lengths in characters, bucketed by bit length, so quantiles are only known up
+            # to their bucket's upper bound; histogram values are upper bounds too.
+            "text_length": {
+                **{
+                    f"{name}_upper_bound": None if bucket is None else (1 << bucket) - 1
+                    for name, bucket in length_quantiles.items()
+                },
+                "max": self.max_text_length,
+                "histogram": [
+                    [(1 << bucket) - 1, self.length_buckets[bucket]]
+                    for bucket in sorted(self.length_buckets)
+                ],
+            },
+            "pattern_hits": {
+                "instruction": dict(sorted(self.instruction_hits.items())),
+                "secret": dict(sorted(self.secret_hits.items())),
+            },
+            "flagged_sources": {
+                "size": sources.size,
+                "error": sources.error,
+                "approximate": sources.error > 0,
+                "top": [list(item) for item in sources.top()],
+            },
+        }
+
+
+def _add_counts(counts: dict[Any, int], more: dict[Any, int]) -> None:
+    for key, count in more.items():
+        counts[key] = counts.get(key, 0) + count
+
+
+def _quantiles(histogram: dict[int, int]) -> dict[str, int | None]:
+    """Nearest-rank `QUANTILES` of a histogram, as ``{"p50": key, ...}``."""
+    total = sum(histogram.values())
+    result: dict[str, int | None] = {}
+    for quantile in QUANTILES:
+        name = f"p{quantile * 100:g}"
+        if not total:
+            result[name] = None
+            continue
+        rank = max(1, math.ceil(quantile * total))
+        seen = 0
+        for key in sorted(histogram):
+            seen += histogram[key]
+            if seen >= rank:
+                result[name] = key
+                break
+    return result
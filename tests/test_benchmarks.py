@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import json
+
+from benchmarks.corpus import CorpusSpec, generate_jsonl, iter_chunks, rules_payload
+from benchmarks.run import BenchResult, compare, default_benchmarks
+from rag_sanitizer.sanitizer import rule_pack_from_dict
+
+
+def test_corpus_is_deterministic_per_seed() -> None:
+    spec = CorpusSpec(chunks=50, fenced_code_ratio=0.5, injection_density=0.5)
+    assert generate_jsonl(spec) == generate_jsonl(spec)
+    assert generate_jsonl(spec) != generate_jsonl(CorpusSpec(chunks=50, seed=1))
+    lines = generate_jsonl(spec).splitlines()
+    assert len(lines) == 50
+    assert json.loads(lines[0])["id"] == "chunk-0"
+
+
+def test_corpus_respects_densities() -> None:
+    spec = CorpusSpec(chunks=200, injection_density=1.0, fenced_code_ratio=0.0, citation_ratio=0.0)
+    chunks = list(iter_chunks(spec))
+    assert all("citations" not in chunk for chunk in chunks)
+    assert all("```" not in chunk["text"] for chunk in chunks)
+    assert sum("instructions" in chunk["text"] or "act as" in chunk["text"] for chunk in chunks)
+
+
+def test_rules_payload_compiles_with_extra_patterns() -> None:
+    rules = rule_pack_from_dict(rules_payload(25))
+    assert len(rules.instruction_patterns) == 7 + 25
+
+
+def test_compare_flags_only_large_regressions() -> None:
+    baseline = {
+        "results": [
+            {"scenario": "short", "benchmark": "to_json", "chunks_per_s": 1000.0},
+            {"scenario": "short", "benchmark": "cli", "chunks_per_s": 1000.0},
+        ]
+    }
+    results = [
+        BenchResult("short", "to_json", 900, 1, 1.0, None),
+        BenchResult("short", "cli", 500, 1, 1.0, None),
+        BenchResult("long", "cli", 1, 1, 1.0, None),
+    ]
+    regressions = compare(results, baseline, max_regression=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("short/cli")
+
+
+def test_startup_benchmarks_only_run_in_startup_scenario() -> None:
+    assert default_benchmarks("startup") == ["cli", "cli_help", "cli_compiled"]
+    assert "cli_help" not in default_benchmarks("short")
+    assert "cli" in default_benchmarks("short")
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+from rag_sanitizer.checkpoint import Checkpoint, LineTracker, read_checkpoint, write_checkpoint
+from rag_sanitizer.codec import iter_jsonl_lines
+from rag_sanitizer.profiling import Profiler
+from rag_sanitizer.summary import RunSummary
+
+DATA = b'{"a": 1}\n\n{"b": 2}\r{"c": 3}\r\n  \n{"d": 4}'
+
+
+def test_line_tracker_numbers_lines_like_iter_jsonl_lines() -> None:
+    tracker = LineTracker(io.BytesIO(DATA))
+    assert list(tracker) == list(iter_jsonl_lines(io.BytesIO(DATA)))
+    assert tracker.last_yielded == 6
+
+
+def test_line_tracker_points_resume_at_raw_line_boundaries() -> None:
+    tracker = LineTracker(io.BytesIO(DATA))
+    lines = iter(tracker)
+    assert next(lines)[0] == 1
+    assert tracker.pop_point(1) == (1, 9, 1)
+    assert next(lines)[0] == 3
+    # Line 2 is blank. The raw line holding lines 3 and 4 gives no point until line 4.
+    assert tracker.pop_point(3) == (1, 10, 2)
+    assert next(lines)[0] == 4
+    assert tracker.pop_point(4) == (4, 29, 4)
+
+    offset, line_number = 29, 4
+    resumed = LineTracker(io.BytesIO(DATA[offset:]), offset=offset, line_number=line_number)
+    assert list(resumed) == [(6, b'{"d": 4}')]
+    assert resumed.pop_point(6) == (6, len(DATA), 6)
+
+
+def test_checkpoint_round_trip_and_restore(tmp_path: Path) -> None:
+    summary = RunSummary(max_risk=0.4)
+    summary.record(["instruction_like"], 0.5)
+    profiler = Profiler()
+    profiler.stage_calls["parse"] = 3
+    path = tmp_path / "run.ckpt"
+    assert read_checkpoint(path) is None
+    write_checkpoint(
+        path,
+        Checkpoint(
+            input_offset=10,
+            output_offset=20,
+            line_number=2,
+            summary=summary.to_dict(),
+            settings={"input": "in.jsonl"},
+            profile=profiler.to_dict(),
+        ),
+    )
+    loaded = read_checkpoint(path)
+    assert loaded is not None
+    assert (loaded.input_offset, loaded.output_offset, loaded.line_number) == (10, 20, 2)
+    assert not path.with_name("run.ckpt.tmp").exists()
+
+    restored = RunSummary(max_risk=0.4)
+    restored_profile = Profiler()
+    loaded.restore(restored, restored_profile)
+    restored.record([], 0.1)
+    assert restored.processed == 2
+    assert restored.flags_count == {"instruction_like": 1}
+    assert restored.should_fail
+    assert restored_profile.stage_calls["parse"] == 3
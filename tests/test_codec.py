@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from rag_sanitizer import codec
+from rag_sanitizer.codec import dumps_ascii, iter_jsonl_lines, loads
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        {"text": 'café \U0001f600 \ud800 "q" \\ \x00\n', "n": 1, "f": 0.1, "x": None},
+        {"nested": [{"a": [1e16, -0.0, float("nan"), float("inf")]}, True, False]},
+        {1: "int key", None: "null key"},
+        (1, "tuple"),
+        [],
+    ],
+)
+def test_dumps_ascii_matches_json_dumps(value: object) -> None:
+    assert dumps_ascii(value) == json.dumps(value, ensure_ascii=True)
+
+
+@pytest.mark.parametrize("fast", [True, False])
+@pytest.mark.parametrize(
+    "document",
+    [
+        '{"id": 123456789012345678901234567890, "text": "x"}',
+        '{"a": NaN, "b": 1.5}',
+        '"\\ud800"',
+        '{"a": 1, "a": 2}',
+        '{"t": "café"}',
+    ],
+)
+def test_loads_matches_json_loads(
+    document: str, fast: bool, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    if not fast:
+        monkeypatch.setattr(codec, "orjson", None)
+    for data in (document, document.encode("utf-8", "surrogatepass")):
+        assert repr(loads(data)) == repr(json.loads(data))
+
+
+def test_loads_reports_stdlib_errors() -> None:
+    with pytest.raises(json.JSONDecodeError) as excinfo:
+        loads(b'{"id": ')
+    with pytest.raises(json.JSONDecodeError) as expected:
+        json.loads(b'{"id": ')
+    assert str(excinfo.value) == str(expected.value)
+
+
+def test_iter_jsonl_lines_numbers_and_strips_like_text_mode() -> None:
+    data = "a\r\n\r\n b\rc\n\x1c\n d \n\n".encode()
+    expected = [
+        (number, line.strip())
+        for number, line in enumerate(io.TextIOWrapper(io.BytesIO(data), encoding="utf-8"), 1)
+        if line.strip()
+    ]
+    assert [
+        (number, line.decode()) for number, line in iter_jsonl_lines(io.BytesIO(data))
+    ] == expected
+    # POSIX sys.stdin only ends lines at "\n".
+    assert list(iter_jsonl_lines(io.BytesIO(data), universal_newlines=False)) == [
+        (1, b"a"),
+        (3, b"b\rc"),
+        (5, b"d"),
+    ]
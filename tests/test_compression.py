@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import gzip
+import io
+from pathlib import Path
+
+import pytest
+
+from rag_sanitizer import compression
+from rag_sanitizer.codec import iter_jsonl_lines
+from rag_sanitizer.compression import (
+    DecompressionError,
+    compression_for_path,
+    detect_compression,
+    open_input,
+    open_input_stream,
+    open_output,
+)
+
+DATA = b'{"id": "a"}\n\n  \r\n{"id": "b"}\r{"id": "c"}\n{"id": "d"}'
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(compression, "BLOCK_SIZE", 5)
+    monkeypatch.setattr(compression, "QUEUE_BLOCKS", 2)
+
+
+def test_detection() -> None:
+    assert detect_compression(gzip.compress(b"x")[:4]) == "gzip"
+    assert detect_compression(b"\x28\xb5\x2f\xfd") == "zstd"
+    assert detect_compression(b'{"id') is None
+    assert compression_for_path(Path("out.JSONL.GZ")) == "gzip"
+    assert compression_for_path(Path("out.jsonl")) is None
+
+
+def test_gzip_input_yields_the_same_numbered_lines() -> None:
+    expected = list(iter_jsonl_lines(io.BytesIO(DATA)))
+    stream = io.BufferedReader(io.BytesIO(gzip.compress(DATA)))
+    with open_input(stream) as lines:
+        assert list(iter_jsonl_lines(lines)) == expected
+    with open_input(io.BufferedReader(io.BytesIO(DATA))) as lines:
+        assert list(iter_jsonl_lines(lines)) == expected
+
+
+def test_input_stream_reads_gzip_and_plain_input() -> None:
+    for payload in (gzip.compress(DATA), DATA):
+        with open_input_stream(io.BufferedReader(io.BytesIO(payload))) as stream:
+            assert stream.readline(4) == b'{"id'
+            assert stream.read() == DATA[4:]
+
+
+def test_abandoned_reader_closes_without_hanging() -> None:
+    payload = gzip.compress(b"line\n" * 10_000)
+    with open_input(io.BufferedReader(io.BytesIO(payload))) as lines:
+        assert next(iter(lines)) == b"line"
+
+
+@pytest.mark.parametrize(
+    ("payload", "message"),
+    [
+        (gzip.compress(DATA)[:-6], "ended before"),
+        (gzip.compress(DATA)[:10] + b"\xff" * 40, "invalid block type"),
+        (gzip.compress(DATA)[:-4] + b"\0\0\0\0", "Incorrect length"),
+    ],
+    ids=["truncated", "corrupt", "bad-trailer"],
+)
+def test_corrupt_input_raises_in_the_consumer(payload: bytes, message: str) -> None:
+    with pytest.raises(DecompressionError, match=message):
+        with open_input(io.BufferedReader(io.BytesIO(payload))) as lines:
+            list(lines)
+    with pytest.raises(DecompressionError, match=message):
+        with open_input_stream(io.BufferedReader(io.BytesIO(payload))) as stream:
+            while stream.readline(8):
+                pass
+
+
+def test_gzip_output_is_deterministic() -> None:
+    outputs = []
+    for _ in range(2):
+        sink = io.BytesIO()
+        with open_output(sink, "gzip") as writer:
+            for index in range(100):
+                writer.write(b"row %d\n" % index)
+            writer.flush()
+        outputs.append(sink.getvalue())
+    assert outputs[0] == outputs[1]
+    assert gzip.decompress(outputs[0]) == b"".join(b"row %d\n" % index for index in range(100))
+
+
+def test_zstd_round_trip() -> None:
+    zstandard = pytest.importorskip("zstandard")
+    sink = io.BytesIO()
+    with open_output(sink, "zstd") as writer:
+        writer.write(DATA)
+    compressed = sink.getvalue()
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(compressed) == DATA
+    with open_input(io.BufferedReader(io.BytesIO(compressed))) as lines:
+        assert list(iter_jsonl_lines(lines)) == list(iter_jsonl_lines(io.BytesIO(DATA)))
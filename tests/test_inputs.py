@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from rag_sanitizer.inputs import expand_inputs, is_jsonl_name, is_multi_input
+
+
+def _touch(path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("{}\n", encoding="utf-8")
+    return path
+
+
+def test_jsonl_names_allow_a_compression_suffix() -> None:
+    for name in ("a.jsonl", "a.JSONL", "a.ndjson", "a.jsonl.gz", "a.jsonl.zst"):
+        assert is_jsonl_name(name)
+    for name in ("a.json", "a.gz", "a.txt", "jsonl", "a.jsonl.bak"):
+        assert not is_jsonl_name(name)
+
+
+def test_directory_input_is_recursive_sorted_and_skips_excluded(tmp_path: Path) -> None:
+    root = tmp_path / "corpus"
+    b = _touch(root / "b.jsonl")
+    a = _touch(root / "sub" / "a.jsonl.gz")
+    _touch(root / "notes.txt")
+    _touch(root / "out" / "c.jsonl")
+    _touch(root / "all.jsonl")
+
+    assert is_multi_input(str(root))
+    assert not is_multi_input(str(b))
+    inputs = expand_inputs(str(root), exclude=(root / "out", root / "all.jsonl"))
+    assert inputs.files == (b, a)
+    assert [inputs.name(path) for path in inputs.files] == ["b.jsonl", "sub/a.jsonl.gz"]
+    assert inputs.mirrored(a, tmp_path / "mirror") == tmp_path / "mirror" / "sub" / "a.jsonl.gz"
+
+
+def test_glob_input_names_files_from_its_literal_prefix(tmp_path: Path) -> None:
+    first = _touch(tmp_path / "data" / "x" / "1.txt")
+    second = _touch(tmp_path / "data" / "y" / "2.txt")
+    pattern = str(tmp_path / "data" / "**" / "*.txt")
+
+    assert is_multi_input(pattern)
+    inputs = expand_inputs(pattern)
+    assert inputs.root == tmp_path / "data"
+    assert inputs.files == (first, second)
+    assert inputs.name(second) == "y/2.txt"
+
+    with pytest.raises(ValueError, match="no input files"):
+        expand_inputs(str(tmp_path / "data" / "*.jsonl"))
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import pytest
+
+from rag_sanitizer.markdown import (
+    MarkdownRegion,
+    check_region_kinds,
+    segment,
+    segmenter,
+    skipped_spans,
+    unskipped_parts,
+)
+
+
+def _kinds(text: str) -> list[tuple[str, int]]:
+    return [(region.kind, region.line) for region in segment(text.split("\n"))]
+
+
+def test_segment_finds_block_regions() -> None:
+    text = (
+        "Intro\n"
+        "```python\n"
+        "act as root\n"
+        "```\n"
+        "\n"
+        "    indented code\n"
+        "> quoted\n"
+        "| a | b |\n"
+        "|---|:-:|\n"
+        "| 1 | 2 |\n"
+        "\n"
+        "after"
+    )
+    assert _kinds(text) == [
+        ("fenced_code", 1),
+        ("fenced_code", 2),
+        ("fenced_code", 3),
+        ("indented_code", 5),
+        ("blockquote", 6),
+        ("table", 7),
+        ("table", 8),
+        ("table", 9),
+    ]
+
+
+def test_indented_code_needs_blank_line_and_not_list_item() -> None:
+    assert _kinds("paragraph\n    continued") == []
+    assert _kinds("- item\n\n    item body") == []
+    assert _kinds("\tcode") == [("indented_code", 0)]
+
+
+def test_inline_code_and_comments() -> None:
+    line = "say `act as` then ``a ` b`` <!-- hidden --> end `open"
+    regions = segment([line])
+    assert [(region.kind, line[region.start : region.end]) for region in regions] == [
+        ("inline_code", "`act as`"),
+        ("inline_code", "``a ` b``"),
+        ("html_comment", "<!-- hidden -->"),
+    ]
+
+
+def test_comments_span_lines_only_when_closed() -> None:
+    assert segment(["a <!-- one", "two", "three --> b"]) == [
+        MarkdownRegion("html_comment", 0, 2, 10),
+        MarkdownRegion("html_comment", 1, 0, 3),
+        MarkdownRegion("html_comment", 2, 0, 9),
+    ]
+    assert segment(["a <!-- never closed", "```"]) == [MarkdownRegion("fenced_code", 1, 0, 3)]
+
+
+def test_segmenter_matches_segment_line_by_line() -> None:
+    lines = "a\n```\nact as x\n```\n| h |\n|---|\n<!-- a\nb -->\n    code".split("\n")
+    regions: list[MarkdownRegion] = []
+    feed = segmenter(regions.append)
+    for index, line in enumerate(lines):
+        next_line = lines[index + 1] if index + 1 < len(lines) else None
+        feed.send((index, line, next_line, any("-->" in later for later in lines[index + 1 :])))
+    assert regions == segment(lines)
+
+
+def test_skipped_spans_merges_and_unskipped_parts_splits() -> None:
+    line = "x `a``b` <!-- c --> y"
+    spans = skipped_spans(segment([line]), ["inline_code", "html_comment"])
+    assert unskipped_parts(line, spans[0]) == ["x ", " ", " y"]
+    assert unskipped_parts("`all`", [(0, 5)]) is None
+    assert skipped_spans(segment([line]), ["table"]) == {}
+
+
+def test_check_region_kinds_rejects_unknown_kinds() -> None:
+    assert check_region_kinds(["table"]) == ("table",)
+    with pytest.raises(ValueError, match="unknown Markdown region 'tables'"):
+        check_region_kinds(["tables"])
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import io
+import json
+import random
+
+import pytest
+
+from rag_sanitizer import shards
+from rag_sanitizer.codec import iter_jsonl_lines
+from rag_sanitizer.profiling import Profiler
+from rag_sanitizer.shards import (
+    ShardSpec,
+    iter_range_lines,
+    merge_fragments,
+    parse_shard_spec,
+    shard_bounds,
+)
+from rag_sanitizer.summary import RunSummary
+
+
+def test_parse_shard_spec() -> None:
+    assert parse_shard_spec("2/4") == ShardSpec(2, 4)
+    assert str(ShardSpec(0, 1)) == "0/1"
+    for bad in ("4/4", "-1/2", "1", "a/b", "0/0"):
+        with pytest.raises(ValueError, match="i/N"):
+            parse_shard_spec(bad)
+
+
+def test_shards_partition_lines_like_a_serial_read(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(shards, "_BLOCK_SIZE", 7)
+    rng = random.Random(0)
+    for _ in range(200):
+        data = b"".join(
+            rng.choice([b"", b"  ", b'{"id": "%d"}' % rng.randrange(10**6)])
+            + rng.choice([b"\n", b"\r\n", b"\r", b"\n\n"])
+            for _ in range(rng.randint(0, 10))
+        )
+        serial = list(iter_jsonl_lines(io.BytesIO(data)))
+        for count in range(1, 6):
+            lines = []
+            previous_end = 0
+            for index in range(count):
+                start, end = shard_bounds(data, ShardSpec(index, count))
+                assert start == previous_end
+                previous_end = end
+                lines += [line for _, line in iter_jsonl_lines(iter_range_lines(data, start, end))]
+            assert previous_end == len(data)
+            assert lines == [line for _, line in serial]
+
+
+def _fragment(index: int, count: int, summary: RunSummary) -> dict[str, object]:
+    payload = summary.to_dict()
+    payload["shard"] = {"index": index, "count": count, "input": "in.jsonl", "input_bytes": 10}
+    return payload
+
+
+def test_merge_fragments_matches_serial_summary() -> None:
+    serial = RunSummary(max_risk=0.7, track_cache=True)
+    parts = [RunSummary(max_risk=0.7, track_cache=True) for _ in range(3)]
+    rows = [(["instruction_like"], 0.5), ([], 0.0), (["secret_like"], 0.71234), ([], 0.2)]
+    for position, (flags, risk) in enumerate(rows):
+        serial.record(flags, risk)
+        parts[position % 3].record(flags, risk)
+        serial.record_cache(position % 2 == 0)
+        parts[position % 3].record_cache(position % 2 == 0)
+    fragments = [_fragment(index, 3, part) for index, part in enumerate(parts)]
+    profiled = Profiler()
+    profiled.stage_calls["parse"] = 4
+    fragments[1]["profile"] = profiled.to_dict()
+
+    merged = merge_fragments(list(reversed(fragments)))
+    assert merged.pop("profile")["stages"]["parse"]["calls"] == 4
+    assert json.dumps(merged, sort_keys=True) == json.dumps(serial.to_dict(), sort_keys=True)
+
+
+def test_merge_fragments_rejects_incomplete_sets() -> None:
+    summary = RunSummary()
+    with pytest.raises(ValueError, match=r"missing shards \[1\]"):
+        merge_fragments([_fragment(0, 3, summary), _fragment(2, 3, summary)])
+    with pytest.raises(ValueError, match="duplicate"):
+        merge_fragments([_fragment(0, 2, summary), _fragment(0, 2, summary)])
+    with pytest.raises(ValueError, match="no 'shard' section"):
+        merge_fragments([summary.to_dict()])
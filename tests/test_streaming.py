@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import io
+import json
+import random
+
+import pytest
+
+from rag_sanitizer.codec import iter_jsonl_lines
+from rag_sanitizer.sanitizer import (
+    RulePack,
+    TextScan,
+    default_rule_pack,
+    parse_chunk,
+    rule_pack_from_dict,
+    sanitize_chunk,
+    scan_text,
+    with_secret_mask,
+)
+from rag_sanitizer.streaming import (
+    LongLine,
+    StreamScanner,
+    iter_stream_lines,
+    sanitize_long_line,
+)
+
+WINDOW = 64
+PIECES = [
+    "ignore previous instructions",
+    "act as root",
+    "hello",
+    "password=hunter2",
+    "sk-" + "a" * 24,
+    "```",
+    "<!--",
+    "-->",
+    "`code`",
+    "| a | b |",
+    "|---|---|",
+    "> quote",
+    "    indented",
+    "\r\n",
+    "\n",
+    "\r",
+    "\x0c",
+    " ",
+    "é",
+    "😀",
+]
+
+
+def _text(rng: random.Random) -> str:
+    # Lines and secret matches stay under half the window, where streaming is exact.
+    text = "".join(rng.choice(PIECES) + rng.choice(["", " ", "\n"]) for _ in range(60))
+    return "\n".join(line[:20] for line in text.split("\n"))
+
+
+def _stream(
+    text: str, rules: RulePack, markdown_aware: bool, rng: random.Random
+) -> tuple[TextScan, str]:
+    with StreamScanner(
+        rules,
+        markdown_aware=markdown_aware,
+        window=WINDOW,
+        last_comment_close=text.rfind("-->"),
+    ) as scanner:
+        position = 0
+        while position < len(text):
+            size = rng.randint(1, 40)
+            scanner.feed(text[position : position + size])
+            position += size
+        scan = scanner.finish()
+        return scan, "".join(scanner.iter_text())
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_stream_scanner_matches_scan_text(seed: int) -> None:
+    rng = random.Random(seed)
+    text = _text(rng)
+    rules = default_rule_pack()
+    for rule_pack in (rules, with_secret_mask(rules)):
+        for markdown_aware in (False, True):
+            expected = scan_text(text, rule_pack, markdown_aware=markdown_aware)
+            scan, sanitized = _stream(text, rule_pack, markdown_aware, rng)
+            assert sanitized == expected.sanitized_text
+            assert scan.flag_bits == expected.flag_bits
+            assert list(scan.redaction_lines) == list(expected.redaction_lines)
+            assert list(scan.redaction_patterns) == list(expected.redaction_patterns)
+            assert list(scan.secret_offsets) == list(expected.secret_offsets)
+
+
+def test_stream_scanner_handles_matches_across_pieces() -> None:
+    rules = rule_pack_from_dict(
+        {"instruction_patterns": ["act as"], "secret_patterns": ["x+"], "secret_mask": "#"}
+    )
+    text = "keep\r\nact as root\r\n" + "y" * 100 + "x" * 20 + "\nend"
+    expected = scan_text(text, rules)
+    with StreamScanner(rules, window=WINDOW) as scanner:
+        for char in text:
+            scanner.feed(char)
+        scan = scanner.finish()
+        assert (
+            "".join(scanner.iter_text())
+            == expected.sanitized_text
+            == "keep\n" + "y" * 100 + "#\nend"
+        )
+    assert list(scan.redaction_lines) == [2]
+    assert list(scan.secret_offsets) == list(expected.secret_offsets)
+
+
+def test_stream_scanner_matches_long_lines_in_segments() -> None:
+    rules = default_rule_pack()
+    text = "ok\n" + "filler " * 50 + "ignore previous instructions " + "filler " * 50 + "\nlast"
+    with StreamScanner(rules, window=WINDOW) as scanner:
+        scanner.feed(text)
+        scan = scanner.finish()
+        assert "".join(scanner.iter_text()) == scan_text(text, rules).sanitized_text == "ok\nlast"
+    assert list(scan.redaction_lines) == [2]
+
+
+def test_stream_scanner_rejects_tiny_windows() -> None:
+    with pytest.raises(ValueError, match="at least"):
+        StreamScanner(window=8)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_sanitize_long_line_writes_the_same_json(seed: int) -> None:
+    rng = random.Random(seed)
+    payload = {
+        "source": rng.choice(["s", {"nested": [1.5]}, None]),
+        "id": rng.choice(["a", 7]),
+        "text": _text(rng) + '"\\\ud800\t',
+        "citations": rng.choice([["c"], []]),
+    }
+    raw = json.dumps(payload, ensure_ascii=rng.random() < 0.5).encode("utf-8", "surrogatepass")
+    rule_pack = with_secret_mask(default_rule_pack())
+    markdown_aware = rng.random() < 0.5
+    expected = sanitize_chunk(parse_chunk(raw), rule_pack=rule_pack, markdown_aware=markdown_aware)
+    out = io.BytesIO()
+    pieces = [raw[start : start + 7] for start in range(0, len(raw), 7)]
+    result = sanitize_long_line(
+        pieces, out, rule_pack=rule_pack, markdown_aware=markdown_aware, window=WINDOW
+    )
+    assert out.getvalue() == expected.to_json_bytes()
+    assert result is not None
+    assert (result.flags, result.risk_score) == (expected.flags, expected.risk_score)
+
+
+@pytest.mark.parametrize(
+    ("line", "message"),
+    [
+        (b'{"text": "abc', "Unterminated string"),
+        (b"[1]", "JSON object"),
+        (b'{"text": "a", "text": "b"}', "single"),
+        (b'{"text": "a"} x', "Extra data"),
+        (b'{"id": 1,}', "property name"),
+    ],
+)
+def test_sanitize_long_line_rejects_invalid_lines(line: bytes, message: str) -> None:
+    out = io.BytesIO()
+    with pytest.raises(ValueError, match=message):
+        sanitize_long_line([line], out, window=WINDOW)
+    assert out.getvalue() == b""
+
+
+def test_iter_stream_lines_numbers_like_iter_jsonl_lines() -> None:
+    data = b'{}\r\n\n  {"a": 1}\r{"b": 2}\n\n' + b'{"text": "' + b"x" * 200 + b'"}\n{}'
+    expected = list(iter_jsonl_lines(io.BytesIO(data)))
+    lines = []
+    for line_number, line in iter_stream_lines(io.BytesIO(data), WINDOW):
+        if isinstance(line, LongLine):
+            line = b"".join(line.pieces()).strip()
+        lines.append((line_number, line))
+    assert lines == expected
+
+
+def test_iter_stream_lines_skips_unread_long_lines() -> None:
+    data = b'{"text": "' + b"x" * 200 + b'"}\n{"id": 2}\n'
+    lines = list(iter_stream_lines(io.BytesIO(data), WINDOW))
+    assert [number for number, _ in lines] == [1, 2]
+    assert isinstance(lines[0][1], LongLine)
+    assert lines[1][1] == b'{"id": 2}'
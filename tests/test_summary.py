@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import json
+import random
+
+from rag_sanitizer.summary import ChunkStats, HeavyHitters, RunSummary
+
+
+def test_summary_merge_matches_single_pass() -> None:
+    records = [
+        (["instruction_like"], 0.5),
+        ([], 0.0),
+        (["secret_like", "missing_citation"], 0.4),
+        (["instruction_like", "tool_instruction"], 0.7),
+    ]
+    single = RunSummary(max_risk=0.6, fail_on_flags=frozenset({"secret_like"}))
+    for flags, risk in records:
+        single.record(flags, risk)
+
+    left = RunSummary(max_risk=0.6, fail_on_flags=frozenset({"secret_like"}))
+    right = left.fresh()
+    for flags, risk in records[:2]:
+        left.record(flags, risk)
+    for flags, risk in records[2:]:
+        right.record(flags, risk)
+    left.merge(right)
+
+    assert left.to_dict() == single.to_dict()
+    assert single.to_dict() == {
+        "processed": 4,
+        "flagged": 3,
+        "max_risk": 0.7,
+        "flags_count": {
+            "instruction_like": 2,
+            "secret_like": 1,
+            "missing_citation": 1,
+            "tool_instruction": 1,
+        },
+        "failed": True,
+    }
+
+
+def test_distributions_merge_and_round_trip() -> None:
+    rng = random.Random(7)
+    records = [
+        (
+            rng.choice([[], ["instruction_like"], ["secret_like", "missing_citation"]]),
+            rng.choice([0.0, 0.2, 0.5, 0.7, 1.0]),
+            ChunkStats(
+                text_length=rng.randint(0, 5000),
+                source=rng.choice([None, "a", "b", "c"]),
+                instruction_hits=("act as",) * rng.randint(0, 2),
+                secret_hits=rng.choice([(), ("password", "token")]),
+            ),
+        )
+        for _ in range(200)
+    ]
+    single = RunSummary(track_distributions=True)
+    parts = [single.fresh() for _ in range(3)]
+    for position, (flags, risk, stats) in enumerate(records):
+        single.record(flags, risk, stats)
+        parts[position % 3].record(flags, risk, stats)
+    merged = RunSummary.from_dict(parts[0].to_dict())
+    for part in parts[1:]:
+        merged.merge(RunSummary.from_dict(part.to_dict()))
+
+    assert merged.to_dict() == single.to_dict()
+    # Written as the CLI writes it; histograms keep their numeric order.
+    distributions = json.loads(json.dumps(single.to_dict(), sort_keys=True))["distributions"]
+    risks = sorted(risk for _, risk, _ in records)
+    assert distributions["risk"]["p50"] == risks[99]
+    assert distributions["risk"]["p99"] == risks[197]
+    lengths = [stats.text_length for _, _, stats in records]
+    text_length = distributions["text_length"]
+    assert text_length["max"] == max(lengths)
+    assert text_length["p99_upper_bound"] >= sorted(lengths)[197]
+    assert text_length["p99_upper_bound"] < 2 * sorted(lengths)[197] + 1
+    bounds = [bound for bound, _ in text_length["histogram"]]
+    assert bounds == sorted(bounds)
+    assert sum(count for _, count in text_length["histogram"]) == 200
+    risk_values = [value for value, _ in distributions["risk"]["histogram"]]
+    assert risk_values == sorted(set(risks))
+    hits = distributions["pattern_hits"]
+    assert hits["instruction"]["act as"] == sum(len(s.instruction_hits) for *_, s in records)
+    assert set(hits["secret"]) == {"password", "token"}
+    flagged = [stats.source for flags, _, stats in records if flags and stats.source]
+    sources = distributions["flagged_sources"]
+    assert (sources["error"], sources["approximate"]) == (0, False)
+    expected = sorted((-flagged.count(source), source) for source in set(flagged))
+    assert sources["top"] == [[source, -count] for count, source in expected]
+
+
+def test_heavy_hitters_bound_the_error_when_full() -> None:
+    stream = ["hot"] * 300 + [f"cold{index}" for index in range(500)] + ["warm"] * 120
+    random.Random(3).shuffle(stream)
+    single = HeavyHitters(size=8)
+    halves = HeavyHitters(size=8), HeavyHitters(size=8)
+    for position, key in enumerate(stream):
+        single.add(key)
+        halves[position % 2].add(key)
+    halves[0].merge(halves[1])
+    for sketch in (single, halves[0]):
+        assert len(sketch.counts) <= 8
+        assert sketch.error <= len(stream) // 9
+        assert sketch.top()[0][0] == "hot"
+        assert 300 - sketch.error <= sketch.counts["hot"] <= 300
+        assert 120 - sketch.error <= sketch.counts.get("warm", 0) <= 120
+
+
+def test_overflowing_source_sketch_is_marked_approximate() -> None:
+    stats = [ChunkStats(text_length=10, source=f"s{index % 100}") for index in range(300)]
+    single = RunSummary(track_distributions=True)
+    halves = single.fresh(), single.fresh()
+    for position, chunk_stats in enumerate(stats):
+        single.record(["instruction_like"], 0.5, chunk_stats)
+        halves[position % 2].record(["instruction_like"], 0.5, chunk_stats)
+    merged = RunSummary.from_dict(halves[0].to_dict())
+    merged.merge(RunSummary.from_dict(halves[1].to_dict()))
+
+    expected = single.to_dict()
+    actual = merged.to_dict()
+    for payload in (expected, actual):
+        sources = payload["distributions"].pop("flagged_sources")
+        assert sources["approximate"] is True
+        assert sources["error"] > 0
+    # Everything but the approximate sketch still merges exactly.
+    assert actual == expected